@@ -0,0 +1,143 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, Optional
+
+from metrics import ADMISSION_COST_IN_USE, ADMISSION_DECISIONS, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT
+
+def estimate_cost(trials: int, horizon: int, bars: int) -> int:
+    """Work estimate for an engine run: Monte Carlo trials x forecast horizon x historical bars."""
+    return max(int(trials), 1) * max(int(horizon), 1) * max(int(bars), 1)
+
+class AdmissionRejected(Exception):
+    """Raised when a run cannot be admitted; retry_after is None if retrying cannot help."""
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("user_id", "cost", "future")
+
+    def __init__(self, user_id: Hashable, cost: int, future: asyncio.Future):
+        self.user_id = user_id
+        self.cost = cost
+        self.future = future
+
+class AdmissionController:
+    """
+    Admits CPU-heavy engine runs against a global cost budget and a per-user concurrency limit.
+    Runs that do not fit right away wait in a FIFO queue: a waiter held back only by its user's
+    limit is skipped so others can proceed, but the budget is granted strictly in order so large
+    runs are not starved. Runs are rejected when the queue is full, when they wait longer than
+    max_queue_wait_seconds, or outright when a single run costs more than the whole budget.
+    A user_id of None holds budget only, for work whose callers each hold their own user's slot.
+
+    All methods must be called from the event loop thread.
+    """
+    def __init__(self, name: str, cost_budget: int, per_user_limit: int,
+                 max_queue_depth: int, max_queue_wait_seconds: float):
+        self.name = name
+        self.cost_budget = cost_budget
+        self.per_user_limit = per_user_limit
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+        self.cost_in_use = 0
+        self._running_by_user: Dict[Hashable, int] = {}
+        self._queue = deque()
+        self._average_run_seconds = 1.0 # Exponentially weighted; drives the Retry-After estimate
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _has_slot(self, user_id: Optional[Hashable]) -> bool:
+        return user_id is None or self._running_by_user.get(user_id, 0) < self.per_user_limit
+
+    def _fits(self, user_id: Optional[Hashable], cost: int) -> bool:
+        return self.cost_in_use + cost <= self.cost_budget and self._has_slot(user_id)
+
+    def _grant(self, user_id: Optional[Hashable], cost: int) -> None:
+        self.cost_in_use += cost
+        if user_id is not None:
+            self._running_by_user[user_id] = self._running_by_user.get(user_id, 0) + 1
+        ADMISSION_COST_IN_USE.set(self.cost_in_use, self.name)
+
+    def _release(self, user_id: Optional[Hashable], cost: int) -> None:
+        self.cost_in_use -= cost
+        if user_id is not None:
+            remaining = self._running_by_user[user_id] - 1
+            if remaining:
+                self._running_by_user[user_id] = remaining
+            else:
+                del self._running_by_user[user_id]
+        ADMISSION_COST_IN_USE.set(self.cost_in_use, self.name)
+        self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        for waiter in list(self._queue):
+            if waiter.future.done():
+                continue
+            if self.cost_in_use + waiter.cost > self.cost_budget:
+                break # Keep budget order so a large run at the head is not overtaken indefinitely
+            if self._has_slot(waiter.user_id):
+                self._queue.remove(waiter)
+                self._grant(waiter.user_id, waiter.cost)
+                waiter.future.set_result(None)
+        ADMISSION_QUEUE_DEPTH.set(len(self._queue), self.name)
+
+    def retry_after_seconds(self) -> int:
+        waits = 1 + len(self._queue) / max(sum(self._running_by_user.values()), 1)
+        return max(1, min(math.ceil(self._average_run_seconds * waits), 300))
+
+    def _reject(self, outcome: str, message: str, retryable: bool = True):
+        ADMISSION_DECISIONS.inc(self.name, outcome)
+        return AdmissionRejected(message, self.retry_after_seconds() if retryable else None)
+
+    def check_size(self, cost: int) -> None:
+        """Raises AdmissionRejected (not retryable) when a run of this cost could never be admitted."""
+        if cost > self.cost_budget:
+            raise self._reject("rejected_too_large", f"Estimated cost {cost:,} exceeds the maximum of {self.cost_budget:,}; "
+                                                     "reduce the number of trials, the horizon or the history length.", retryable=False)
+
+    async def _acquire(self, user_id: Optional[Hashable], cost: int) -> None:
+        self.check_size(cost)
+        if not self._queue and self._fits(user_id, cost):
+            self._grant(user_id, cost)
+            ADMISSION_DECISIONS.inc(self.name, "admitted")
+            ADMISSION_WAIT.observe(0.0, self.name)
+            return
+        if len(self._queue) >= self.max_queue_depth:
+            raise self._reject("rejected_queue_full", "The server is busy; too many simulations are queued.")
+
+        waiter = _Waiter(user_id, cost, asyncio.get_running_loop().create_future())
+        self._queue.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._queue), self.name)
+        self._admit_waiters() # Admits the new waiter at once if only head-of-line ordering held it back
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_queue_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(user_id, cost) # Admitted just as the wait ended; hand the slot back
+            else:
+                waiter.future.cancel()
+                self._queue.remove(waiter)
+                self._admit_waiters() # A large waiter leaving the head may unblock smaller ones
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject("rejected_timeout", "The server is busy; the simulation waited too long to start.")
+        ADMISSION_DECISIONS.inc(self.name, "admitted")
+        ADMISSION_WAIT.observe(time.perf_counter() - queued_at, self.name)
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[Hashable], cost: int):
+        """Holds a share of the budget and one of the user's slots (none for None) for the duration of the block."""
+        await self._acquire(user_id, cost)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._average_run_seconds = 0.8 * self._average_run_seconds + 0.2 * (time.perf_counter() - started)
+            self._release(user_id, cost)
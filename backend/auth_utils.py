@@ -1,9 +1,14 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 
 from jose import JWTError, jwt
 import bcrypt
 
+from ttl_cache import TTLCache
+
 # --- Password Hashing ---
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -27,13 +32,27 @@ print(f"DEBUG: Backend SECRET_KEY being used: {SECRET_KEY[:10]}...") # DEBUG: Lo
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# --- Async Password Hashing ---
+# bcrypt is CPU-bound; a small dedicated pool keeps login bursts off the event loop and
+# caps how many cores they can take from simulation traffic.
+BCRYPT_MAX_CONCURRENCY = int(os.environ.get("BCRYPT_MAX_CONCURRENCY", 4))
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_CONCURRENCY, thread_name_prefix="bcrypt")
+
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -44,3 +63,25 @@ def decode_access_token(token: str):
     except JWTError as e:
         print(f"DEBUG: JWTError in decode_access_token: {e}") # DEBUG: Log the specific JWTError
         return None
+
+# --- Verified User Cache ---
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", 60))
+_user_cache = TTLCache(ttl_seconds=USER_CACHE_TTL_SECONDS, name="verified_user")
+# When each user last changed; tokens issued before that must be re-checked against the DB
+_user_changed_at = TTLCache(ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def token_predates_user_change(user_id: int, issued_at: Optional[float]) -> bool:
+    changed_at = _user_changed_at.get(user_id)
+    if changed_at is None:
+        return False
+    return issued_at is None or issued_at <= changed_at
+
+def get_cached_user(user_id: int) -> Optional[Any]:
+    return _user_cache.get(user_id)
+
+def cache_user(user_id: int, user: Any) -> None:
+    _user_cache.set(user_id, user)
+
+def invalidate_cached_user(user_id: int) -> None:
+    _user_cache.invalidate(user_id)
+    _user_changed_at.set(user_id, time.time())
@@ -1,10 +1,29 @@
 
 import pandas as pd
 import numpy as np
-from scipy.stats import norm, uniform, lognorm, beta, multivariate_normal
-import yfinance as yf
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from scipy.stats import norm, uniform, lognorm, beta
+from typing import Dict, List, Optional
+import time
+
+from engine_core import ENTRY_LONG, ENTRY_SHORT, EVENT_NAMES, backtest_trades, column
+from convergence import ConvergenceMonitor, is_adaptive
+from factor_models import check_covariance_model, fit_covariance_factor
+from feature_store import FeatureWindow
+from memory_planner import ChunkPlan, plan_backtester
+from metrics import record_trials, stage_timer
+from random_streams import RandomStreams, SeedLike, as_generator
+from tracing import TRACE, DEBUG, get_tracer
+from variance_reduction import (TrialSampler, check_mode, percentile_estimates, precision_report,
+                                standard_error)
+
+_trace = get_tracer("backtester")
+
+# Per-bar indicator prices, in the column order of BacktesterSimulator.sip_indicators
+SIP_INDICATOR_COLUMNS = ("SIP_Entry_Long_Price", "SIP_Entry_Short_Price", "SIP_Exit_Long_Price", "SIP_Exit_Short_Price")
+# Bars, evenly spaced through the history, on which the indicators' standard errors are measured
+PRECISION_BARS = 64
+# Bars in the rolling Daily_Volatility window
+VOLATILITY_WINDOW = 20
 
 # Define a simple SIP class for clarity, though a numpy array can serve as a SIP
 class SIP:
@@ -66,7 +85,7 @@ class SLURP:
     def __repr__(self):
         return f"SLURP(num_trials={self.num_trials}, sips={list(self.sips.keys())})"
 
-def generate_sip_from_distribution(distribution_name: str, params: tuple, num_trials: int = 10000) -> SIP:
+def generate_sip_from_distribution(distribution_name: str, params: tuple, num_trials: int = 10000, seed: SeedLike = None) -> SIP:
     """Generates a SIP by sampling from a specified distribution."""
     DISTRIBUTIONS = {
         "Normal": norm,
@@ -78,20 +97,36 @@ def generate_sip_from_distribution(distribution_name: str, params: tuple, num_tr
         raise ValueError(f"Unsupported distribution: {distribution_name}")
     
     dist = DISTRIBUTIONS[distribution_name]
-    samples = dist.rvs(*params, size=num_trials)
+    samples = dist.rvs(*params, size=num_trials, random_state=as_generator(seed))
     return SIP(samples)
 
-def generate_empirical_sip(data_series: pd.Series, num_trials: int = 10000) -> SIP:
-    """Generates an empirical SIP by sampling with replacement from a given data series."""
+def generate_empirical_sip(data_series: pd.Series, num_trials: int = 10000, variance_reduction: str = "none",
+                           seed: SeedLike = None) -> SIP:
+    """
+    Generates an empirical SIP by sampling with replacement from a given data series.
+    Antithetic and Sobol sampling read the sorted data at uniform quantiles instead.
+    """
     if data_series.empty:
         raise ValueError("Data series for empirical SIP cannot be empty.")
-    samples = np.random.choice(data_series, size=num_trials, replace=True)
+    if check_mode(variance_reduction) in ("antithetic", "sobol"):
+        sorted_data = np.sort(np.asarray(data_series, dtype=float))
+        uniforms = TrialSampler(variance_reduction, num_trials, 1, seed).uniforms(0, num_trials)[:, 0]
+        samples = sorted_data[(uniforms * len(sorted_data)).astype(np.int64)]
+    else:
+        samples = as_generator(seed).choice(np.asarray(data_series), size=num_trials, replace=True)
     return SIP(samples)
 
-def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials: int = 10000) -> SLURP:
+def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials: int = 10000,
+                              variance_reduction: str = "none", normals: Optional[np.ndarray] = None,
+                              seed: SeedLike = None, covariance_model: str = "dense",
+                              num_factors: Optional[int] = None) -> SLURP:
     """
     Generates a SLURP for specified correlated columns from historical data.
-    Assumes data is stationary and can be modeled by a multivariate normal distribution.
+    Assumes data is stationary and can be modeled by a multivariate normal distribution, whose
+    covariance is factorised once per distinct data (see factor_models) under covariance_model.
+    normals, (num_trials x normal_dim) standard normals, overrides the variance_reduction draws;
+    normal_dim is len(columns) under the dense model. Callers that need coherent multi-day paths
+    pass rows from their own TrialSampler.
     """
     if not columns or len(columns) < 2:
         raise ValueError("At least two columns are required to generate a correlated SLURP.")
@@ -102,11 +137,12 @@ def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials
     if clean_data.empty:
         raise ValueError("Cleaned data for SLURP generation is empty. Check columns or NaNs.")
 
-    mean_vec = clean_data.mean().values
-    cov_mat = clean_data.cov().values
+    factor = fit_covariance_factor(clean_data.to_numpy(), covariance_model, num_factors)
 
     # Generate correlated samples
-    correlated_samples = multivariate_normal.rvs(mean=mean_vec, cov=cov_mat, size=num_trials)
+    if normals is None:
+        normals = TrialSampler(variance_reduction, num_trials, factor.normal_dim, seed).normals(0, num_trials)
+    correlated_samples = factor.sample(normals)
 
     sips = {}
     for i, col_name in enumerate(columns):
@@ -114,6 +150,26 @@ def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials
     
     return SLURP(sips)
 
+def simulate_growth(sampler: TrialSampler, sorted_returns: np.ndarray, plan: ChunkPlan, growth: np.ndarray,
+                    controls: Optional[np.ndarray] = None) -> None:
+    """
+    Fills growth with each trial's price multiple over the horizon, the product of 1 + r over the
+    sampler's next (trials x horizon) rows read as quantiles of sorted_returns, and controls (when
+    given) with each trial's summed return. Trials go a chunk at a time to stay within the memory
+    budget; row chunks draw the same random stream as one block.
+    """
+    for start, stop in plan.chunks():
+        uniforms = sampler.uniforms(start, stop)
+        uniforms *= len(sorted_returns)
+        indices = uniforms.astype(np.int64)
+        del uniforms
+        sampled_returns = sorted_returns[indices]
+        del indices
+        if controls is not None:
+            controls[start:stop] = sampled_returns.sum(axis=1)
+        growth[start:stop] = np.prod(1 + sampled_returns, axis=1)
+        del sampled_returns
+
 class BacktesterSimulator:
     def __init__(self, 
                  historical_data: pd.DataFrame, 
@@ -122,6 +178,8 @@ class BacktesterSimulator:
                  stop_loss_pct: float = None,    # e.g., 0.01 for 1%
                  use_slurp: bool = False, # New parameter to indicate SLURP usage
                  slurp_columns: Optional[List[str]] = None, # Columns to include in SLURP
+                 covariance_model: str = "dense", # SLURP covariance: "dense" or "factor" (see factor_models)
+                 num_factors: Optional[int] = None, # Factor model only
                  # SIP-based entry/exit parameters
                  forecast_horizon: int = 5, # Number of days to forecast for SIP-based rules
                  entry_long_percentile: float = 0.75, # e.g., 75th percentile of future price SIP
@@ -130,6 +188,15 @@ class BacktesterSimulator:
                  exit_short_percentile: float = 0.75, # e.g., 75th percentile of future price SIP
                  entry_threshold_factor: float = 1.005, # e.g., 0.5% above/below current price
                  exit_threshold_factor: float = 0.995, # e.g., 0.5% above/below current price
+                 memory_budget_bytes: Optional[int] = None, # Defaults to ENGINE_MEMORY_BUDGET_BYTES
+                 variance_reduction: str = "none", # "none", "antithetic", "control_variate" or "sobol"
+                 # Adaptive mode: the trials per bar are chosen to meet a relative tolerance on the indicators
+                 tolerance: Optional[float] = None,
+                 abs_tolerance: Optional[float] = None, # Absolute floor under tolerance, in price units
+                 time_budget_seconds: Optional[float] = None,
+                 max_trials: Optional[int] = None, # Adaptive mode trial cap, ADAPTIVE_MAX_TRIALS by default
+                 seed: SeedLike = None, # Int or np.random.Generator; a fresh seed is drawn (and reported) when None
+                 features: Optional[FeatureWindow] = None, # historical_data's bars from the feature store; derived from the prices when None
                  ):
         self.historical_data = historical_data.copy()
         self.num_trials = num_trials
@@ -137,6 +204,8 @@ class BacktesterSimulator:
         self.stop_loss_pct = stop_loss_pct
         self.use_slurp = use_slurp
         self.slurp_columns = slurp_columns
+        self.covariance_model = check_covariance_model(covariance_model)
+        self.num_factors = num_factors
         self.forecast_horizon = forecast_horizon
         self.entry_long_percentile = entry_long_percentile
         self.entry_short_percentile = entry_short_percentile
@@ -144,228 +213,215 @@ class BacktesterSimulator:
         self.exit_short_percentile = exit_short_percentile
         self.entry_threshold_factor = entry_threshold_factor
         self.exit_threshold_factor = exit_threshold_factor
+        self.variance_reduction = check_mode(variance_reduction)
+        self.tolerance = tolerance
+        self.abs_tolerance = abs_tolerance
+        self.time_budget_seconds = time_budget_seconds
+        self.max_trials = max_trials
+        self.memory_budget_bytes = memory_budget_bytes
+        # Every draw comes from a child stream of the run's seed, so the run replays from self.seed
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+        self._indicator_passes = 0
 
         # Ensure historical data has 'Close' prices
         if 'Close' not in self.historical_data.columns:
             raise ValueError("Historical data must contain a 'Close' column.")
         
         # Prepare data for SIP/SLURP generation
-        self.historical_data['Daily_Return'] = self.historical_data['Close'].pct_change()
-        self.historical_data['Daily_Volatility'] = self.historical_data['Daily_Return'].rolling(window=20).std() # Example volatility
+        if features is not None and len(features) == len(self.historical_data):
+            # The stored series start one and VOLATILITY_WINDOW bars in, where pct_change and rolling leave NaNs
+            daily_returns = np.full(len(features), np.nan)
+            daily_returns[1:] = features.returns
+            daily_volatility = np.full(len(features), np.nan)
+            daily_volatility[VOLATILITY_WINDOW:] = features.volatility(VOLATILITY_WINDOW)
+            self.historical_data['Daily_Return'] = daily_returns
+            self.historical_data['Daily_Volatility'] = daily_volatility
+        else:
+            self.historical_data['Daily_Return'] = self.historical_data['Close'].pct_change()
+            self.historical_data['Daily_Volatility'] = self.historical_data['Daily_Return'].rolling(window=VOLATILITY_WINDOW).std()
         
         # Drop NaN values created by rolling means and pct_change before SIP/SLURP generation
         self.historical_data.dropna(inplace=True)
-        print(f"DEBUG: BacktesterSimulator __init__ - historical_data length after dropna: {len(self.historical_data)}")
+        _trace.debug("historical_data length after dropna: %d", len(self.historical_data), bars=len(self.historical_data))
         if len(self.historical_data) <= self.forecast_horizon:
-            print(f"DEBUG: BacktesterSimulator __init__ - historical_data too short for forecast_horizon {self.forecast_horizon}")
-
-        if self.use_slurp and self.slurp_columns:
-            # Generate SLURP for specified columns
-            # Ensure slurp_columns are available in historical_data after dropping NaNs
-            valid_slurp_columns = [col for col in self.slurp_columns if col in self.historical_data.columns]
-            if len(valid_slurp_columns) < 2:
-                raise ValueError("Not enough valid columns for SLURP generation after data cleaning.")
-            self.slurp = generate_correlated_slurp(self.historical_data, valid_slurp_columns, num_trials=self.num_trials)
-            self.daily_returns_sip = self.slurp['Daily_Return'] # Still keep a reference for price simulation
-        else:
-            # Calculate daily returns SIP for future price uncertainty (default behavior)
-            self.daily_returns_sip = generate_empirical_sip(self.historical_data['Daily_Return'].dropna(), num_trials=self.num_trials)
-            self.slurp = None # No SLURP if not used
+            _trace.info("historical_data too short for forecast_horizon %d", self.forecast_horizon, forecast_horizon=self.forecast_horizon)
+
+        self.slurp_column_count = len(self.slurp_columns) if self.use_slurp and self.slurp_columns else 0
+        self.memory_plan = self._indicator_plan(self.num_trials)
+        _trace.debug("memory plan: %r", self.memory_plan, **self.memory_plan.as_dict())
+
+        with stage_timer("fit"):
+            if self.use_slurp and self.slurp_columns:
+                # Generate SLURP for specified columns
+                # Ensure slurp_columns are available in historical_data after dropping NaNs
+                valid_slurp_columns = [col for col in self.slurp_columns if col in self.historical_data.columns]
+                if len(valid_slurp_columns) < 2:
+                    raise ValueError("Not enough valid columns for SLURP generation after data cleaning.")
+                self.slurp = generate_correlated_slurp(self.historical_data, valid_slurp_columns, num_trials=self.num_trials,
+                                                       variance_reduction=self.variance_reduction,
+                                                       seed=self.streams.child("returns_sip"),
+                                                       covariance_model=self.covariance_model, num_factors=self.num_factors)
+                self.daily_returns_sip = self.slurp['Daily_Return'] # Still keep a reference for price simulation
+            else:
+                # Calculate daily returns SIP for future price uncertainty (default behavior)
+                self.daily_returns_sip = generate_empirical_sip(self.historical_data['Daily_Return'].dropna(), num_trials=self.num_trials,
+                                                                variance_reduction=self.variance_reduction,
+                                                                seed=self.streams.child("returns_sip"))
+                self.slurp = None # No SLURP if not used
 
         # Pre-calculate SIP-derived indicators
         self._calculate_sip_indicators()
 
+    @stage_timer("indicator_build")
     def _calculate_sip_indicators(self):
         """
         Pre-calculates SIP-derived indicators for entry/exit rules for each day in historical data.
-        This avoids generating SIPs within the main simulation loop.
+        This avoids generating SIPs within the main simulation loop. Also sets self.precision, the
+        indicators' standard errors under the variance reduction mode, as the root mean square over
+        up to PRECISION_BARS bars. In adaptive mode a pilot on those bars first picks the trials per
+        bar (self.indicator_trials), and self.adaptive reports how.
+        """
+        self.close_prices = column(self.historical_data, 'Close')
+        # Bars whose forecast horizon still fits in the history; later bars get no indicators
+        self.signal_end = max(len(self.close_prices) - self.forecast_horizon, 0)
+        # Columns follow SIP_INDICATOR_COLUMNS
+        self.sip_indicators = np.full((len(self.close_prices), len(SIP_INDICATOR_COLUMNS)), np.nan)
+        percentiles = [self.entry_long_percentile * 100, self.entry_short_percentile * 100,
+                       self.exit_long_percentile * 100, self.exit_short_percentile * 100]
+        precision_bars = range(0, self.signal_end, max(self.signal_end // PRECISION_BARS, 1))
+
+        self.indicator_trials = self.num_trials
+        self.adaptive = None
+        if is_adaptive(self.tolerance, self.time_budget_seconds) and len(precision_bars):
+            self.indicator_trials = self._pilot_indicator_trials(precision_bars, percentiles)
+            self.memory_plan = self._indicator_plan(self.indicator_trials)
+
+        indicators_start = time.perf_counter()
+        _, errors, plain_errors = self._indicator_pass(range(self.signal_end), precision_bars, self.indicator_trials, percentiles)
+        record_trials("backtester", self.indicator_trials * self.signal_end, time.perf_counter() - indicators_start)
+        self.precision = precision_report(self.variance_reduction, self.indicator_trials,
+                                          dict(zip(SIP_INDICATOR_COLUMNS, errors.tolist())),
+                                          dict(zip(SIP_INDICATOR_COLUMNS, plain_errors.tolist())))
+
+        # The frame gets the indicator columns once, for callers that inspect historical_data
+        for j, name in enumerate(SIP_INDICATOR_COLUMNS):
+            self.historical_data[name] = self.sip_indicators[:, j]
+
+        if _trace.is_enabled(DEBUG):
+            entry_long = self.sip_indicators[:, 0]
+            _trace.debug("SIP indicators built: %d NaN entry-long prices", int(np.isnan(entry_long).sum()),
+                         first=entry_long[:5].tolist(), last=entry_long[-5:].tolist())
+
+    def _indicator_plan(self, num_trials: int) -> ChunkPlan:
+        return plan_backtester(num_trials, self.forecast_horizon, len(self.historical_data),
+                               self.slurp_column_count, self.memory_budget_bytes)
+
+    def _indicator_pass(self, bars: range, precision_bars: range, num_trials: int, percentiles: List[float]):
         """
-        # Initialize columns for SIP-derived indicators
-        self.historical_data['SIP_Entry_Long_Price'] = np.nan
-        self.historical_data['SIP_Entry_Short_Price'] = np.nan
-        self.historical_data['SIP_Exit_Long_Price'] = np.nan
-        self.historical_data['SIP_Exit_Short_Price'] = np.nan
-
-        for i in range(len(self.historical_data) - self.forecast_horizon):
-            current_date_index = self.historical_data.index[i]
-            current_price = self.historical_data['Close'].iloc[i]
-            if isinstance(current_price, pd.Series):
-                current_price = current_price.iloc[0]
-            
+        Builds the SIP indicators of `bars` from num_trials future-price trials each. Returns the
+        indicators' mean prices, standard errors and plain Monte Carlo standard errors, each the
+        average (root mean square for errors) over the bars in precision_bars.
+        """
+        daily_returns = self.daily_returns_sip.trials
+        # Trials read the sorted SIP at uniform quantiles, so antithetic uniforms land on mirrored
+        # returns. The control variate is each trial's summed return, whose expectation is
+        # forecast_horizon times the SIP mean.
+        sampler = TrialSampler(self.variance_reduction, num_trials, self.forecast_horizon,
+                               self.streams.child("indicators", self._indicator_passes))
+        self._indicator_passes += 1
+        sorted_returns = np.sort(daily_returns)
+        controls = control_mean = None
+        if self.variance_reduction == "control_variate":
+            controls = np.empty(num_trials)
+            control_mean = self.forecast_horizon * float(np.mean(daily_returns))
+
+        plan = self._indicator_plan(num_trials)
+        future_returns_trials = np.empty(num_trials)
+        totals = np.zeros((3, len(percentiles))) # Estimates, squared errors, squared plain errors
+        for i in bars:
             # Generate a future price SIP for this specific point in time
-            future_returns_trials = np.prod(1 + np.random.choice(self.daily_returns_sip.trials, 
-                                                                size=(self.num_trials, self.forecast_horizon)), axis=1)
-            future_prices = current_price * future_returns_trials
-            future_price_sip = SIP(future_prices)
-
-            # Calculate percentiles for entry/exit and ensure scalar assignment
-            self.historical_data.loc[current_date_index, 'SIP_Entry_Long_Price'] = float(np.percentile(future_price_sip.trials, self.entry_long_percentile * 100))
-            self.historical_data.loc[current_date_index, 'SIP_Entry_Short_Price'] = float(np.percentile(future_price_sip.trials, self.entry_short_percentile * 100))
-            self.historical_data.loc[current_date_index, 'SIP_Exit_Long_Price'] = float(np.percentile(future_price_sip.trials, self.exit_long_percentile * 100))
-            self.historical_data.loc[current_date_index, 'SIP_Exit_Short_Price'] = float(np.percentile(future_price_sip.trials, self.exit_short_percentile * 100))
-
-        print(f"DEBUG: _calculate_sip_indicators - First few SIP_Entry_Long_Price: {self.historical_data['SIP_Entry_Long_Price'].head()}")
-        print(f"DEBUG: _calculate_sip_indicators - Last few SIP_Entry_Long_Price: {self.historical_data['SIP_Entry_Long_Price'].tail()}")
-        print(f"DEBUG: _calculate_sip_indicators - Number of NaNs in SIP_Entry_Long_Price: {self.historical_data['SIP_Entry_Long_Price'].isnull().sum()}")
-
-    def _apply_entry_rule(self, current_index: int) -> Optional[str]: # Returns 'long' or 'short' or None
-        print(f"DEBUG: _apply_entry_rule - Checking entry for index: {current_index}")
-        # SIP-based Entry Rule using pre-calculated indicators
-        if current_index >= len(self.historical_data) - self.forecast_horizon:
-            print(f"DEBUG: _apply_entry_rule - Not enough future data for SIP forecast at index {current_index}")
-            return None # Not enough future data for SIP forecast
-
-        current_price = self.historical_data['Close'].iloc[current_index]
-        if isinstance(current_price, pd.Series):
-            current_price = current_price.iloc[0]
-
-        sip_entry_long_price = self.historical_data['SIP_Entry_Long_Price'].iloc[current_index]
-        sip_entry_short_price = self.historical_data['SIP_Entry_Short_Price'].iloc[current_index]
-
-        # Ensure retrieved values are scalars
-        if isinstance(sip_entry_long_price, pd.Series):
-            sip_entry_long_price = sip_entry_long_price.iloc[0]
-        if isinstance(sip_entry_short_price, pd.Series):
-            sip_entry_short_price = sip_entry_short_price.iloc[0]
-
-        print(f"DEBUG: _apply_entry_rule - current_price: {current_price:.4f}, sip_entry_long_price: {sip_entry_long_price:.4f}, sip_entry_short_price: {sip_entry_short_price:.4f}")
-
-        # Check for long entry
-        if sip_entry_long_price > current_price * self.entry_threshold_factor:
-            print(f"DEBUG: _apply_entry_rule - Returning 'long' at index {current_index}")
-            return "long"
-        
-        # Check for short entry
-        if sip_entry_short_price < current_price * (2 - self.entry_threshold_factor): # (2 - factor) for inverse threshold
-            print(f"DEBUG: _apply_entry_rule - Returning 'short' at index {current_index}")
-            return "short"
-            
-        print(f"DEBUG: _apply_entry_rule - Returning None at index {current_index}")
-        return None
-
-    def _apply_exit_rule(self, current_index: int, position_type: str) -> bool:
-        # SIP-based Exit Rule using pre-calculated indicators
-        if current_index >= len(self.historical_data) - self.forecast_horizon:
-            return False # Not enough future data for SIP forecast
-
-        current_price = self.historical_data['Close'].iloc[current_index]
-        if isinstance(current_price, pd.Series):
-            current_price = current_price.iloc[0]
-
-        sip_exit_long_price = self.historical_data['SIP_Exit_Long_Price'].iloc[current_index]
-        sip_exit_short_price = self.historical_data['SIP_Exit_Short_Price'].iloc[current_index]
-
-        # Ensure retrieved values are scalars
-        if isinstance(sip_exit_long_price, pd.Series):
-            sip_exit_long_price = sip_exit_long_price.iloc[0]
-        if isinstance(sip_exit_short_price, pd.Series):
-            sip_exit_short_price = sip_exit_short_price.iloc[0]
-
-        if position_type == "long":
-            # Exit long if future price is likely to drop
-            if sip_exit_long_price < current_price * self.exit_threshold_factor:
-                return True
-        elif position_type == "short":
-            # Exit short if future price is likely to rise
-            if sip_exit_short_price > current_price * (2 - self.exit_threshold_factor):
-                return True
-        return False
-
+            simulate_growth(sampler, sorted_returns, plan, future_returns_trials, controls)
+            measured = i in precision_bars
+            estimates, block_estimates, plain_estimates = percentile_estimates(
+                self.close_prices[i] * future_returns_trials, percentiles, controls, control_mean, measured)
+            self.sip_indicators[i] = estimates
+            if measured:
+                totals += [estimates, standard_error(block_estimates) ** 2, standard_error(plain_estimates) ** 2]
+
+        totals /= len(precision_bars) or np.nan # No bars measured leaves the errors unknown
+        return totals[0], np.sqrt(totals[1]), np.sqrt(totals[2])
+
+    def _pilot_indicator_trials(self, precision_bars: range, percentiles: List[float]) -> int:
+        """
+        Adaptive mode: builds the precision bars' indicators with a doubling number of trials until
+        their confidence intervals meet the tolerance, the next round and full build would overrun the
+        time budget, or the trial cap is reached. Returns the trials per bar for the full build.
+        """
+        monitor = ConvergenceMonitor(self.tolerance, self.time_budget_seconds, self.max_trials,
+                                     abs_tolerance=self.abs_tolerance)
+        trials = monitor.batch_trials
+        while True:
+            pass_start = time.perf_counter()
+            estimates, errors, _ = self._indicator_pass(precision_bars, precision_bars, trials, percentiles)
+            seconds_per_trial = (time.perf_counter() - pass_start) / (trials * len(precision_bars))
+            next_trials = min(2 * trials, monitor.max_trials)
+            # Continuing costs another pilot round and then the full build, both at next_trials
+            next_seconds = seconds_per_trial * next_trials * (len(precision_bars) + self.signal_end)
+            if monitor.record(trials, dict(zip(SIP_INDICATOR_COLUMNS, estimates.tolist())),
+                              dict(zip(SIP_INDICATOR_COLUMNS, errors.tolist())), next_seconds):
+                break
+            trials = next_trials
+        _trace.debug("adaptive pilot chose %d trials per bar (%s)", trials, monitor.stop_reason,
+                     trials=trials, stop_reason=monitor.stop_reason, pilot_rounds=monitor.batches)
+        self.adaptive = monitor.report()
+        return trials
+
+    @stage_timer("strategy_evaluation")
     def simulate_trade(self, initial_capital: float = 100000) -> dict:
         """
         Simulates a single trade over the historical data using SIPs/SLURPs for future price movements.
         This is a simplified simulation for demonstration.
         """
-        portfolio_value = initial_capital
-        position_open = False
-        position_type = None # "long" or "short"
-        entry_price = 0
-        position_size = 0
-        
-        trade_log = []
-
         # Start simulation after enough data for SIP indicators to be calculated
         start_index = self.forecast_horizon # Ensure enough data for SIP indicators
-        print(f"DEBUG: simulate_trade - Starting simulation loop from index {start_index} to {len(self.historical_data) - 1}")
-
-        for i in range(start_index, len(self.historical_data) - 1):
-            current_date = self.historical_data.index[i]
-            current_price = self.historical_data['Close'].iloc[i]
-            # Ensure current_price is a scalar, not a Series
-            if isinstance(current_price, pd.Series):
-                current_price = current_price.iloc[0]
-
-            print(f"DEBUG: simulate_trade - Loop iteration {i}, current_date: {current_date}, current_price: {current_price:.4f}, position_open: {position_open}")
-
-            # If not in a position, check for entry
-            if not position_open:
-                signal = self._apply_entry_rule(i)
-                if signal:
-                    position_open = True
-                    position_type = signal
-                    entry_price = current_price
-                    # For simplicity, assume fixed capital allocation for position size
-                    position_size = (initial_capital / entry_price) # Can be refined
-                    trade_log.append({"date": current_date, "event": f"ENTRY_{position_type.upper()}", "price": entry_price, "position_size": position_size})
-                    print(f"DEBUG: simulate_trade - Position {position_type} opened at {entry_price:.4f} on {current_date}")
+        _trace.debug("simulation loop from index %d to %d", start_index, len(self.close_prices) - 1)
+
+        # One simulated next-bar return per bar, drawn up front in the order the loop consumes them.
+        # With a SLURP, daily_returns_sip is its correlated Daily_Return SIP.
+        trial_indices = self.streams.generator("trades").integers(0, self.num_trials, size=max(len(self.close_prices) - 1 - start_index, 0))
+        sampled_returns = self.daily_returns_sip.trials[trial_indices]
+
+        run = backtest_trades(self.close_prices, self.sip_indicators, sampled_returns, start_index, self.signal_end,
+                              initial_capital, self.take_profit_pct, self.stop_loss_pct,
+                              self.entry_threshold_factor, self.exit_threshold_factor)
+
+        dates = self.historical_data.index
+        trade_log = []
+        for bar, code, price, value in zip(run.event_bars.tolist(), run.event_codes.tolist(),
+                                           run.event_prices.tolist(), run.event_values.tolist()):
+            event = EVENT_NAMES[code]
+            if code in (ENTRY_LONG, ENTRY_SHORT):
+                trade_log.append({"date": dates[bar], "event": event, "price": price, "position_size": value})
+                _trace.debug("position %s opened at %.4f on %s", event[6:].lower(), price, dates[bar])
             else:
-                # If in a position, check for exit, TP, or SL
-                trial_index = np.random.randint(0, self.num_trials)
-
-                if self.use_slurp and self.slurp:
-                    simulated_next_return = self.slurp['Daily_Return'].trials[trial_index]
-                    # Access other correlated SIPs if needed, e.g., simulated_next_volatility = self.slurp['Daily_Volatility'].trials[trial_index]
-                else:
-                    simulated_next_return = self.daily_returns_sip.trials[trial_index]
-
-                simulated_next_price = current_price * (1 + simulated_next_return)
-
-                trade_closed = False
-                pnl_reason = ""
-
-                # Check Take Profit
-                if position_type == "long" and self.take_profit_pct and simulated_next_price >= entry_price * (1 + self.take_profit_pct):
-                    trade_pnl = (simulated_next_price - entry_price) * position_size
-                    pnl_reason = "TAKE_PROFIT"
-                    trade_closed = True
-                elif position_type == "short" and self.take_profit_pct and simulated_next_price <= entry_price * (1 - self.take_profit_pct):
-                    trade_pnl = (entry_price - simulated_next_price) * position_size # For short, profit when price drops
-                    pnl_reason = "TAKE_PROFIT"
-                    trade_closed = True
-                # Check Stop Loss
-                elif position_type == "long" and self.stop_loss_pct and simulated_next_price <= entry_price * (1 - self.stop_loss_pct):
-                    trade_pnl = (simulated_next_price - entry_price) * position_size
-                    pnl_reason = "STOP_LOSS"
-                    trade_closed = True
-                elif position_type == "short" and self.stop_loss_pct and simulated_next_price >= entry_price * (1 + self.stop_loss_pct):
-                    trade_pnl = (entry_price - simulated_next_price) * position_size # For short, loss when price rises
-                    pnl_reason = "STOP_LOSS"
-                    trade_closed = True
-                # Check Exit Rule (SIP-based)
-                elif self._apply_exit_rule(i, position_type):
-                    trade_pnl = (simulated_next_price - entry_price) * position_size if position_type == "long" else (entry_price - simulated_next_price) * position_size
-                    pnl_reason = "EXIT_RULE"
-                    trade_closed = True
-                
-                if trade_closed:
-                    portfolio_value += trade_pnl
-                    position_open = False
-                    position_type = None
-                    trade_log.append({"date": current_date, "event": pnl_reason, "price": simulated_next_price, "pnl": trade_pnl})
-                    print(f"DEBUG: simulate_trade - Position closed ({pnl_reason}) at {simulated_next_price:.4f} on {current_date}, PnL: {trade_pnl:.2f}")
-                else:
-                    # If still in position, update portfolio value based on simulated next price
-                    # This assumes the PnL is realized daily, which is a simplification
-                    if position_type == "long":
-                        portfolio_value = initial_capital + (simulated_next_price - entry_price) * position_size
-                    elif position_type == "short":
-                        portfolio_value = initial_capital + (entry_price - simulated_next_price) * position_size
-                    print(f"DEBUG: simulate_trade - Position still open, current simulated portfolio value: {portfolio_value:.2f}")
+                trade_log.append({"date": dates[bar], "event": event, "price": price, "pnl": value})
+                _trace.debug("position closed (%s) at %.4f on %s, PnL: %.2f", event, price, dates[bar], value)
+
+        # Checked once: the per-bar events below cost nothing unless TRACE is on for this module or run
+        if _trace.is_enabled(TRACE):
+            for i in range(start_index, len(self.close_prices) - 1):
+                _trace.trace("bar", index=i, date=str(dates[i]), price=float(self.close_prices[i]),
+                             position_open=bool(run.positions[i]), portfolio_value=float(run.portfolio_values[i]),
+                             **dict(zip(SIP_INDICATOR_COLUMNS, self.sip_indicators[i].tolist())))
 
         return {
-            "final_portfolio_value": portfolio_value,
-            "total_pnl": portfolio_value - initial_capital,
-            "trade_log": trade_log
+            "final_portfolio_value": run.final_portfolio_value,
+            "total_pnl": run.final_portfolio_value - initial_capital,
+            "trade_log": trade_log,
+            "precision": self.precision,
+            "seed": self.seed,
+            **({"adaptive": self.adaptive} if self.adaptive is not None else {})
         }
 
     def run_strategy_optimization(self, 
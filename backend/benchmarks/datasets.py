@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+# Bundled market data: dataset name -> file in backend/uploads
+BUNDLED_DATASETS = {
+    "audnok": "AUDNOK=X.csv",
+    "apple_5yr": "apple_5yr_one.csv",
+}
+
+SYNTHETIC_PREFIX = "synthetic_"
+
+def synthetic_name(bars: int) -> str:
+    return f"{SYNTHETIC_PREFIX}{bars}"
+
+def dataset_path(name: str) -> str:
+    return os.path.join(UPLOADS_DIR, BUNDLED_DATASETS[name])
+
+def synthetic_ohlcv(bars: int, seed: int = 0, initial_price: float = 100.0,
+                    annual_drift: float = 0.05, annual_volatility: float = 0.2) -> pd.DataFrame:
+    """
+    Geometric Brownian motion bars with the same columns as a yfinance download.
+    Minute timestamps keep 10^6 bars inside pandas' datetime range.
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1 / 252
+    log_returns = rng.normal((annual_drift - 0.5 * annual_volatility ** 2) * dt, annual_volatility * np.sqrt(dt), bars)
+    close = initial_price * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate(([initial_price], close[:-1]))
+    spread = np.abs(rng.normal(0, annual_volatility * np.sqrt(dt) / 2, bars)) * close
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Adj Close": close,
+        "Volume": rng.integers(1e5, 1e7, bars),
+    }, index=pd.date_range("2000-01-03", periods=bars, freq="min", name="Date"))
+
+def load_dataset(name: str, seed: int = 0) -> pd.DataFrame:
+    """Loads a bundled CSV or builds a synthetic series named synthetic_<bars>."""
+    if name.startswith(SYNTHETIC_PREFIX):
+        return synthetic_ohlcv(int(name[len(SYNTHETIC_PREFIX):]), seed=seed)
+    df = pd.read_csv(dataset_path(name), index_col=0)
+    return df[pd.to_numeric(df["Close"], errors="coerce").notna()]
@@ -0,0 +1,350 @@
+"""
+Engine benchmark suite for run_sip_simulation, BacktesterSimulator and StrategyOptimiser,
+plus cold-import times of the app and engine modules.
+
+    cd backend
+    python -m benchmarks.engines                      # quick profile, compared with the stored baseline
+    python -m benchmarks.engines --profile full       # adds the 10^5 and 10^6 bar synthetic series
+    python -m benchmarks.engines --engine backtester --dataset apple_5yr
+    python -m benchmarks.engines --engine imports      # import-time budgets only
+    python -m benchmarks.engines --update-baseline    # store this run as the new baseline
+
+Every run is appended to the JSON history. The command exits with status 1 when a case is
+slower (median wall time) or uses more memory (peak RSS) than its baseline by more than the
+configured threshold, when a case that passed in the baseline now fails, or when a module
+takes longer to import than its budget.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.environ.get("BENCHMARK_HISTORY_PATH", os.path.join(BENCHMARK_DIR, "history.json"))
+BASELINE_PATH = os.environ.get("BENCHMARK_BASELINE_PATH", os.path.join(BENCHMARK_DIR, "baseline.json"))
+TIME_THRESHOLD = float(os.environ.get("BENCHMARK_TIME_THRESHOLD", 0.25)) # Allowed wall-time increase (fraction)
+RSS_THRESHOLD = float(os.environ.get("BENCHMARK_RSS_THRESHOLD", 0.20)) # Allowed peak-RSS increase (fraction)
+CASE_TIMEOUT_SECONDS = float(os.environ.get("BENCHMARK_CASE_TIMEOUT_SECONDS", 1800))
+
+# Engine name -> the engine label it reports to metrics.record_trials
+ENGINE_TRIAL_METRICS = {
+    "sip": "sip",
+    "backtester": "backtester",
+    "strategy_optimiser": "strategy_optimiser",
+}
+
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+
+# Cold-import budgets in seconds, each measured in a fresh interpreter. main must stay light so
+# workers start serving quickly; the engines pull in pandas and scipy and are loaded lazily.
+IMPORT_BUDGETS_SECONDS = {
+    "main": 1.0,
+    "sip_backtester": 2.0,
+    "backtester": 2.0,
+    "strategy_optimiser": 2.0,
+}
+IMPORTS_GROUP = "imports"
+
+_IMPORT_PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+# StrategyOptimiserRequest's default; the generated strategy rules look these percentiles up
+OPTIMISER_PERCENTILES = [0.05, 0.1, 0.25, 0.75, 0.9, 0.95]
+
+# Trial counts and horizons swept per engine. The SIP engine has no horizon.
+PROFILES = {
+    "quick": {
+        "datasets": ["audnok", "apple_5yr", "synthetic_1000", "synthetic_10000"],
+        "sip": {"trials": [1000, 10000, 100000], "horizons": [None]},
+        "backtester": {"trials": [100, 1000], "horizons": [5, 20]},
+        "strategy_optimiser": {"trials": [1000, 10000], "horizons": [20, 60]},
+    },
+    "full": {
+        "datasets": ["audnok", "apple_5yr", "synthetic_1000", "synthetic_10000", "synthetic_100000", "synthetic_1000000"],
+        "sip": {"trials": [1000, 10000, 100000, 1000000], "horizons": [None]},
+        "backtester": {"trials": [100, 1000, 10000], "horizons": [5, 20, 60]},
+        "strategy_optimiser": {"trials": [1000, 10000, 100000], "horizons": [5, 20, 60]},
+    },
+}
+
+def case_key(case: dict) -> str:
+    key = f"{case['engine']}/{case['dataset']}/trials={case['trials']}"
+    if case["horizon"] is not None:
+        key += f"/horizon={case['horizon']}"
+    return key
+
+def build_cases(profile: str, engines: Optional[List[str]] = None, datasets: Optional[List[str]] = None) -> List[dict]:
+    settings = PROFILES[profile]
+    cases = []
+    for engine in ENGINE_TRIAL_METRICS:
+        if engines and engine not in engines:
+            continue
+        sweep = settings[engine]
+        for dataset, trials, horizon in itertools.product(settings["datasets"], sweep["trials"], sweep["horizons"]):
+            if datasets and dataset not in datasets:
+                continue
+            cases.append({"engine": engine, "dataset": dataset, "trials": trials, "horizon": horizon})
+    return cases
+
+def _maxrss_to_mb(maxrss: int) -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+def _peak_rss_mb() -> float:
+    return _maxrss_to_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def measure_import(module: str, repeat: int, timeout: float) -> dict:
+    """Median time to import `module` in a fresh interpreter, checked against its budget."""
+    import_times, peak_rss = [], []
+    for _ in range(repeat):
+        try:
+            completed = subprocess.run([sys.executable, "-c", _IMPORT_PROBE, module], cwd=BACKEND_DIR,
+                                       capture_output=True, text=True, timeout=timeout, check=True)
+        except subprocess.TimeoutExpired:
+            return {"engine": IMPORTS_GROUP, "module": module, "error": f"timed out after {timeout:.0f}s"}
+        except subprocess.CalledProcessError as e:
+            last_line = e.stderr.strip().splitlines()[-1] if e.stderr.strip() else f"exit status {e.returncode}"
+            return {"engine": IMPORTS_GROUP, "module": module, "error": last_line}
+        # The probe's own line is last; modules may print while importing
+        seconds, maxrss = completed.stdout.strip().splitlines()[-1].split()
+        import_times.append(float(seconds))
+        peak_rss.append(_maxrss_to_mb(int(maxrss)))
+    return {
+        "engine": IMPORTS_GROUP,
+        "module": module,
+        "repeat": repeat,
+        "wall_time_seconds": statistics.median(import_times),
+        "wall_time_min_seconds": min(import_times),
+        "wall_time_max_seconds": max(import_times),
+        "peak_rss_mb": max(peak_rss),
+        "budget_seconds": IMPORT_BUDGETS_SECONDS[module],
+        "error": None,
+    }
+
+def _run_case(case: dict, seed: int) -> dict:
+    """Runs one case; called in a fresh process so peak RSS belongs to this case alone."""
+    from metrics import ENGINE_TRIALS
+    from benchmarks.datasets import load_dataset
+
+    data = load_dataset(case["dataset"], seed=seed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if case["engine"] == "sip":
+            # run_sip_simulation reads a file, so parsing is part of what is measured
+            csv_path = os.path.join(tmp_dir, "series.csv")
+            data[["Close"]].to_csv(csv_path)
+            from sip_backtester import run_sip_simulation
+            run = lambda: run_sip_simulation(csv_path, column_name="Close", num_trials=case["trials"], seed=seed)
+        elif case["engine"] == "backtester":
+            from backtester import BacktesterSimulator
+            data["Close"] = data["Close"].astype(float)
+            run = lambda: BacktesterSimulator(historical_data=data, num_trials=case["trials"],
+                                              forecast_horizon=case["horizon"], seed=seed).simulate_trade()
+        else:
+            from strategy_optimiser import StrategyOptimiser
+            data["Close"] = data["Close"].astype(float)
+            run = lambda: StrategyOptimiser(historical_data=data, num_simulations=case["trials"],
+                                            volatility_lookback_days=case["horizon"],
+                                            return_distribution_percentiles=OPTIMISER_PERCENTILES,
+                                            strategy_count=5, seed=seed).run_optimization()
+
+        setup_rss_mb = _peak_rss_mb()
+        metric_name = ENGINE_TRIAL_METRICS[case["engine"]]
+        trials_before = ENGINE_TRIALS.get(metric_name)
+        start = time.perf_counter()
+        result = run()
+        wall_time = time.perf_counter() - start
+
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(result["error"].splitlines()[0])
+    trials = ENGINE_TRIALS.get(metric_name) - trials_before
+    return {
+        "wall_time_seconds": wall_time,
+        "setup_rss_mb": setup_rss_mb,
+        "peak_rss_mb": _peak_rss_mb(),
+        "bars": len(data),
+        "trials_evaluated": trials,
+        "trials_per_second": trials / wall_time if wall_time > 0 else None,
+    }
+
+def _run_isolated(case: dict, seed: int, timeout: float) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool: # Leaving the block terminates a timed-out case
+        return pool.apply_async(_run_case, (case, seed)).get(timeout)
+
+def run_benchmark(case: dict, repeat: int, seed: int, timeout: float) -> dict:
+    runs = []
+    for _ in range(repeat):
+        try:
+            runs.append(_run_isolated(case, seed, timeout))
+        except multiprocessing.TimeoutError:
+            return {**case, "error": f"timed out after {timeout:.0f}s"}
+        except Exception as e:
+            return {**case, "error": f"{type(e).__name__}: {e}"}
+    wall_times = [run["wall_time_seconds"] for run in runs]
+    median_wall_time = statistics.median(wall_times)
+    trials = runs[0]["trials_evaluated"]
+    return {
+        **case,
+        "bars": runs[0]["bars"],
+        "repeat": repeat,
+        "wall_time_seconds": median_wall_time,
+        "wall_time_min_seconds": min(wall_times),
+        "wall_time_max_seconds": max(wall_times),
+        "setup_rss_mb": max(run["setup_rss_mb"] for run in runs),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "trials_evaluated": trials,
+        "trials_per_second": trials / median_wall_time if median_wall_time > 0 else None,
+        "error": None,
+    }
+
+def find_regressions(results: Dict[str, dict], baseline: Dict[str, dict],
+                     time_threshold: float, rss_threshold: float) -> List[str]:
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if result.get("budget_seconds") is not None and not result.get("error") \
+                and result["wall_time_seconds"] > result["budget_seconds"]:
+            regressions.append(f"{key}: import took {result['wall_time_seconds']:.3f}s, "
+                               f"over its {result['budget_seconds']:.2f}s budget")
+        if base is None or base.get("error"):
+            continue
+        if result.get("error"):
+            regressions.append(f"{key}: failed ({result['error']}); passed in the baseline")
+            continue
+        time_ratio = result["wall_time_seconds"] / base["wall_time_seconds"]
+        if time_ratio > 1 + time_threshold:
+            regressions.append(f"{key}: wall time {result['wall_time_seconds']:.3f}s vs baseline "
+                               f"{base['wall_time_seconds']:.3f}s (+{(time_ratio - 1) * 100:.0f}%)")
+        rss_ratio = result["peak_rss_mb"] / base["peak_rss_mb"]
+        if rss_ratio > 1 + rss_threshold:
+            regressions.append(f"{key}: peak RSS {result['peak_rss_mb']:.0f}MB vs baseline "
+                               f"{base['peak_rss_mb']:.0f}MB (+{(rss_ratio - 1) * 100:.0f}%)")
+    return regressions
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _environment() -> dict:
+    import numpy as np
+    import pandas as pd
+    import scipy
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def _load_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+def _write_json(path: str, data) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _format_result(key: str, result: dict) -> str:
+    if result.get("error"):
+        return f"{key:<60} ERROR {result['error']}"
+    if result["engine"] == IMPORTS_GROUP:
+        return (f"{key:<60} {result['wall_time_seconds']:>9.3f}s {result['peak_rss_mb']:>8.0f}MB "
+                f"{'budget ' + format(result['budget_seconds'], '.2f') + 's':>14}")
+    throughput = result["trials_per_second"]
+    return (f"{key:<60} {result['wall_time_seconds']:>9.3f}s {result['peak_rss_mb']:>8.0f}MB "
+            f"{throughput if throughput is not None else float('nan'):>14,.0f} trials/s")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engines and check for regressions.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--engine", action="append", choices=sorted([*ENGINE_TRIAL_METRICS, IMPORTS_GROUP]),
+                        help="Only run this engine, or 'imports' for the import-time budgets (repeatable).")
+    parser.add_argument("--dataset", action="append", help="Only run this dataset, e.g. apple_5yr or synthetic_10000 (repeatable).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median wall time is reported.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=CASE_TIMEOUT_SECONDS, help="Seconds before a single run is abandoned.")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--rss-threshold", type=float, default=RSS_THRESHOLD)
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run's results as the baseline.")
+    parser.add_argument("--list", action="store_true", help="List the selected cases and exit.")
+    args = parser.parse_args(argv)
+
+    cases = build_cases(args.profile, args.engine, args.dataset)
+    import_modules = list(IMPORT_BUDGETS_SECONDS) if not args.engine or IMPORTS_GROUP in args.engine else []
+    if args.list:
+        for module in import_modules:
+            print(f"{IMPORTS_GROUP}/{module}")
+        for case in cases:
+            print(case_key(case))
+        return 0
+    if not cases and not import_modules:
+        parser.error("No benchmark cases match the given filters.")
+
+    results = {}
+    for module in import_modules:
+        key = f"{IMPORTS_GROUP}/{module}"
+        results[key] = measure_import(module, args.repeat, args.timeout)
+        print(_format_result(key, results[key]), flush=True)
+    for case in cases:
+        key = case_key(case)
+        results[key] = run_benchmark(case, args.repeat, args.seed, args.timeout)
+        print(_format_result(key, results[key]), flush=True)
+
+    run_record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "profile": args.profile,
+        "seed": args.seed,
+        "environment": _environment(),
+        "results": results,
+    }
+    history = _load_json(args.history, [])
+    history.append(run_record)
+    _write_json(args.history, history)
+
+    if args.update_baseline:
+        baseline = _load_json(args.baseline, {"results": {}})
+        baseline.update({key: run_record[key] for key in ("timestamp", "git_commit", "environment")})
+        baseline["results"].update(results) # Cases not run this time keep their previous baseline
+        _write_json(args.baseline, baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    baseline = _load_json(args.baseline, None)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+    regressions = find_regressions(results, baseline["results"], args.time_threshold, args.rss_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Local stand-ins for the external services the API calls, used by the load-test harness:
+a fake yfinance download that serves canned OHLCV, and a stub OpenRouter chat-completions server.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Request
+
+from benchmarks.datasets import UPLOADS_DIR, synthetic_ohlcv
+
+# Tickers answered from the bundled files; other tickers use <market_data_dir>/<ticker>.csv or synthetic bars
+CANNED_TICKERS = {
+    "AAPL": "apple_5yr_one.csv",
+    "AUDNOK=X": "AUDNOK=X.csv",
+}
+
+class FakeMarketData:
+    """
+    Drop-in replacement for yf.download. Returns the last N bars of the canned series,
+    where N is the number of business days between start and end, after an optional delay.
+    """
+    def __init__(self, data_dir: str = UPLOADS_DIR, latency_seconds: float = 0.0):
+        self.data_dir = data_dir
+        self.latency_seconds = latency_seconds
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, ticker: str) -> pd.DataFrame:
+        with self._lock:
+            frame = self._frames.get(ticker)
+            if frame is None:
+                path = os.path.join(self.data_dir, CANNED_TICKERS.get(ticker, f"{ticker}.csv"))
+                if os.path.exists(path):
+                    frame = pd.read_csv(path, index_col=0)
+                    # Match yf.download: a unique, sorted DatetimeIndex without empty rows
+                    frame.index = pd.to_datetime(frame.index, format="mixed", dayfirst=True)
+                    frame = frame[~frame.index.duplicated(keep="last")].dropna(how="all").sort_index()
+                else:
+                    # Unknown tickers get a stable synthetic series seeded by the symbol
+                    frame = synthetic_ohlcv(5000, seed=zlib.crc32(ticker.encode("utf-8")))
+                    frame.index = pd.bdate_range(end=datetime.now().date(), periods=len(frame), name="Date")
+                self._frames[ticker] = frame
+            return frame
+
+    def download(self, tickers, start=None, end=None, **kwargs) -> pd.DataFrame:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds) # yf.download blocks its caller, and so does the fake
+        frame = self._load(tickers if isinstance(tickers, str) else tickers[0])
+        if start is not None and end is not None:
+            bars = max(int(np.busday_count(pd.Timestamp(start).date(), pd.Timestamp(end).date())), 1)
+            frame = frame.tail(bars)
+        return frame.copy()
+
+def create_stub_openrouter_app(latency_seconds: float = 1.0, jitter_seconds: float = 0.0,
+                               seed: Optional[int] = None) -> FastAPI:
+    """A minimal OpenAI-compatible /chat/completions endpoint that answers after a configurable delay."""
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        delay = max(latency_seconds + rng.uniform(-jitter_seconds, jitter_seconds), 0.0)
+        await asyncio.sleep(delay)
+        return {
+            "id": "stub-completion",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Stub recommendation for load testing."},
+                "finish_reason": "stop",
+            }],
+        }
+
+    return app
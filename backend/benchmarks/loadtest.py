@@ -0,0 +1,223 @@
+"""
+End-to-end load test of the API against local stand-ins for yfinance and OpenRouter.
+
+    cd backend
+    python -m benchmarks.loadtest                                   # concurrency 1, 4, 16 for 30s each
+    python -m benchmarks.loadtest --concurrency 8 --concurrency 32 --duration 60 \\
+        --mix simple_ticker=2,backtester=1,optimiser=1 --llm-latency 1.5 --llm-jitter 0.5
+
+The app runs in its own process with yf.download replaced by benchmarks.fakes.FakeMarketData,
+OPENROUTER_API_BASE pointed at a stub server, and a throwaway SQLite database. Throughput and
+p50/p95/p99 latency are reported per endpoint and concurrency level.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+HOST = "127.0.0.1"
+REGISTRATION_CODE = "VANTAGE2025"
+
+# Endpoint name -> (path, needs auth, request body builder)
+ENDPOINTS = {
+    "simple_ticker": ("/api/simple_ticker_simulation", False,
+                      lambda ticker, args: {"ticker": ticker, "years": args.years}),
+    "backtester": ("/api/run_backtester_simulation/", True,
+                   lambda ticker, args: {"ticker": ticker, "years": args.years, "num_trials": args.backtester_trials}),
+    "optimiser": ("/api/optimise_strategy/", True,
+                  lambda ticker, args: {"ticker": ticker, "years": args.years, "num_simulations": args.optimiser_simulations}),
+}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+def _serve_stub_openrouter(port: int, latency_seconds: float, jitter_seconds: float, seed: int) -> None:
+    import uvicorn
+    from benchmarks.fakes import create_stub_openrouter_app
+    uvicorn.run(create_stub_openrouter_app(latency_seconds, jitter_seconds, seed), host=HOST, port=port, log_level="warning")
+
+def _serve_app(port: int, openrouter_port: int, database_path: str, market_data_dir: str, market_data_latency: float) -> None:
+    # Configure the environment before main (and database) are imported
+    os.environ["OPENROUTER_API_BASE"] = f"http://{HOST}:{openrouter_port}"
+    os.environ["OPENROUTER_API_KEY"] = "load-test"
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database_path}"
+    sys.stdout = open(os.devnull, "w") # The app prints per request; keep the report readable
+
+    import uvicorn
+    import main
+    from benchmarks.fakes import FakeMarketData
+    main.yf.download = FakeMarketData(market_data_dir, market_data_latency).download
+    uvicorn.run(main.app, host=HOST, port=port, log_level="warning")
+
+async def _wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not start within {timeout:.0f}s")
+                await asyncio.sleep(0.2)
+
+async def _login(client: httpx.AsyncClient) -> str:
+    email, password = "loadtest@example.com", "load-test-password"
+    await client.post("/register", json={"email": email, "password": password, "registration_code": REGISTRATION_CODE})
+    response = await client.post("/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def _send(client: httpx.AsyncClient, endpoint: str, ticker: str, headers: dict, args) -> tuple:
+    path, needs_auth, build_body = ENDPOINTS[endpoint]
+    start = time.perf_counter()
+    try:
+        response = await client.post(path, json=build_body(ticker, args), headers=headers if needs_auth else None)
+        # Several endpoints report failures as {"error": ...} with a 200 status
+        ok = response.status_code == 200 and not response.json().get("error")
+    except (httpx.HTTPError, ValueError):
+        ok = False
+    return endpoint, time.perf_counter() - start, ok
+
+async def _run_level(base_url: str, token: str, concurrency: int, args, rng: random.Random) -> dict:
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    headers = {"Authorization": f"Bearer {token}"}
+    samples: List[tuple] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        deadline = time.perf_counter() + args.duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                endpoint = rng.choices(names, weights)[0]
+                samples.append(await _send(client, endpoint, rng.choice(args.tickers), headers, args))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"concurrency": concurrency, "elapsed_seconds": elapsed, **summarise(samples, elapsed)}
+
+def summarise(samples: List[tuple], elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint in sorted({sample[0] for sample in samples}):
+        latencies = np.array([latency for name, latency, _ in samples if name == endpoint])
+        errors = sum(1 for name, _, ok in samples if name == endpoint and not ok)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": len(latencies) / elapsed,
+            "p50_seconds": float(p50),
+            "p95_seconds": float(p95),
+            "p99_seconds": float(p99),
+            "max_seconds": float(latencies.max()),
+        }
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "throughput_rps": len(samples) / elapsed if elapsed > 0 else 0.0,
+        "endpoints": endpoints,
+    }
+
+def _format_level(level: dict) -> str:
+    lines = [f"concurrency={level['concurrency']}: {level['requests']} requests, {level['errors']} errors, "
+             f"{level['throughput_rps']:.2f} req/s over {level['elapsed_seconds']:.1f}s"]
+    for endpoint, stats in level["endpoints"].items():
+        lines.append(f"  {endpoint:<15} n={stats['requests']:<6} err={stats['errors']:<4} {stats['throughput_rps']:>7.2f} req/s  "
+                     f"p50={stats['p50_seconds'] * 1000:>8.1f}ms p95={stats['p95_seconds'] * 1000:>8.1f}ms "
+                     f"p99={stats['p99_seconds'] * 1000:>8.1f}ms")
+    return "\n".join(lines)
+
+def _parse_mix(raw: str) -> Dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'; choose from {', '.join(ENDPOINTS)}.")
+        mix[name] = float(weight or 1)
+    return mix
+
+async def run_load_test(args) -> List[dict]:
+    context = multiprocessing.get_context("spawn")
+    openrouter_port, app_port = _free_port(), _free_port()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processes = [
+            context.Process(target=_serve_stub_openrouter, args=(openrouter_port, args.llm_latency, args.llm_jitter, args.seed), daemon=True),
+            context.Process(target=_serve_app, args=(app_port, openrouter_port, os.path.join(tmp_dir, "loadtest.db"),
+                                                     args.market_data_dir, args.market_data_latency), daemon=True),
+        ]
+        for process in processes:
+            process.start()
+        try:
+            base_url = f"http://{HOST}:{app_port}"
+            await _wait_until_ready(f"http://{HOST}:{openrouter_port}/docs")
+            await _wait_until_ready(f"{base_url}/")
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout) as client:
+                token = await _login(client)
+                for endpoint in args.mix: # Warm caches and lazy imports before measuring
+                    await _send(client, endpoint, args.tickers[0], {"Authorization": f"Bearer {token}"}, args)
+
+            rng = random.Random(args.seed)
+            levels = []
+            for concurrency in args.concurrency:
+                level = await _run_level(base_url, token, concurrency, args, rng)
+                print(_format_level(level), flush=True)
+                levels.append(level)
+            return levels
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join(timeout=10)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API against fake market data and a stub LLM.")
+    parser.add_argument("--concurrency", type=int, action="append", help="Concurrent clients (repeatable). Default: 1, 4, 16.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic per concurrency level.")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("simple_ticker=1,backtester=1,optimiser=1"),
+                        help="Endpoint weights, e.g. simple_ticker=2,backtester=1,optimiser=1.")
+    parser.add_argument("--ticker", dest="tickers", action="append", help="Tickers to request (repeatable). Default: AAPL, AUDNOK=X.")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--backtester-trials", type=int, default=1000)
+    parser.add_argument("--optimiser-simulations", type=int, default=1000)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stub OpenRouter response time in seconds.")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Uniform +/- jitter added to the stub latency.")
+    parser.add_argument("--market-data-dir", default=None, help="Directory of <TICKER>.csv files (default: backend/uploads).")
+    parser.add_argument("--market-data-latency", type=float, default=0.0, help="Simulated download time in seconds.")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the report as JSON to this path.")
+    args = parser.parse_args(argv)
+    args.concurrency = args.concurrency or [1, 4, 16]
+    args.tickers = args.tickers or ["AAPL", "AUDNOK=X"]
+    if args.market_data_dir is None:
+        from benchmarks.datasets import UPLOADS_DIR
+        args.market_data_dir = UPLOADS_DIR
+
+    levels = asyncio.run(run_load_test(args))
+    if args.output:
+        report = {
+            "settings": {key: value for key, value in vars(args).items() if key != "output"},
+            "levels": levels,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
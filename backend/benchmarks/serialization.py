@@ -0,0 +1,142 @@
+"""
+Response encoding benchmark: for a representative payload of each simulation endpoint, compares
+encode time of FastAPI's default path (jsonable_encoder + json.dumps) with responses.dumps, and
+the bytes on the wire for each content encoding.
+
+    cd backend
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --endpoint /api/run_backtester_simulation/ --repeat 20
+    python -m benchmarks.serialization --output serialization.json
+
+Payloads are built by the same engine helpers the handlers call, on canned market data.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+import main as api
+import responses
+from benchmarks.datasets import dataset_path, synthetic_ohlcv
+from benchmarks.fakes import FakeMarketData
+
+AI_RECOMMENDATION = "Stub recommendation for load testing."
+BATCH_TICKERS = 50
+
+def _ticker_history(ticker: str, years: int):
+    end_date = datetime.now()
+    return FakeMarketData().download(ticker, start=end_date - timedelta(days=365 * years), end=end_date)
+
+def _sip_ticker_payload(seed: int) -> dict:
+    series = api._close_series(_ticker_history("AAPL", 5))
+    return {**api._simulate_price_series("AAPL", series, "Normal", seed=seed), "ai_recommendation": AI_RECOMMENDATION}
+
+def _sip_file_payload(seed: int) -> dict:
+    results = api.sip_engine.run_sip_simulation(dataset_path("apple_5yr"), "Close", "Normal", seed=seed)
+    return {**results, "ai_recommendation": AI_RECOMMENDATION}
+
+def _batch_payload(seed: int) -> list:
+    series_by_ticker = {f"SYN{i}": api._close_series(synthetic_ohlcv(1250, seed=i)) for i in range(BATCH_TICKERS)}
+    batch_results = api.sip_engine.run_sip_simulation_batch(series_by_ticker, "Normal", seed=seed)
+    return [{"ticker": ticker, **result} for ticker, result in batch_results.items()]
+
+def _backtester_payload(seed: int) -> dict:
+    request = api.BacktesterSimulationRequest(ticker="AAPL", years=5, num_trials=1000, seed=seed)
+    return {**api._run_backtester(_ticker_history("AAPL", 5), request), "ai_recommendation": AI_RECOMMENDATION}
+
+def _optimiser_payload(seed: int) -> dict:
+    request = api.StrategyOptimiserRequest(ticker="AAPL", years=5, seed=seed)
+    results = api._run_optimiser(_ticker_history("AAPL", 5), request)
+    return {**results, "ai_recommendation": AI_RECOMMENDATION}
+
+# Endpoint -> payload builder; the batch endpoint streams one NDJSON line per list item
+ENDPOINT_PAYLOADS: Dict[str, Callable] = {
+    "/api/run_simulation/": _sip_file_payload,
+    "/api/simple_file_simulation/": _sip_file_payload,
+    "/api/run_ticker_simulation/": _sip_ticker_payload,
+    "/api/simple_ticker_simulation": _sip_ticker_payload,
+    "/api/batch_ticker_simulation": _batch_payload,
+    "/api/run_backtester_simulation/": _backtester_payload,
+    "/api/optimise_strategy/": _optimiser_payload,
+}
+NDJSON_ENDPOINTS = {"/api/batch_ticker_simulation"}
+
+def _default_encode(payload) -> bytes:
+    """What FastAPI does for a returned dict: jsonable_encoder, then Starlette's JSONResponse.render."""
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+def _encode(encoder: Callable, payload, ndjson: bool) -> bytes:
+    if ndjson:
+        return b"".join(encoder(line) + b"\n" for line in payload)
+    return encoder(payload)
+
+def _median_seconds(func: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def _wire_sizes(body: bytes, ndjson: bool, repeat: int) -> Dict[str, dict]:
+    """Bytes sent and compression time per encoding, compressing NDJSON line by line as the middleware does."""
+    sizes = {"identity": {"bytes": len(body), "compress_seconds": 0.0}}
+    chunks = body.splitlines(keepends=True) if ndjson else [body]
+    for encoding in ("gzip", "br") if responses.brotli is not None else ("gzip",):
+        def compress():
+            compressor = responses._Compressor(encoding)
+            return b"".join(compressor.compress(chunk, final=i == len(chunks) - 1) for i, chunk in enumerate(chunks))
+        sizes[encoding] = {"bytes": len(compress()), "compress_seconds": _median_seconds(compress, repeat)}
+    return sizes
+
+def measure(endpoint: str, repeat: int, seed: int) -> dict:
+    payload = ENDPOINT_PAYLOADS[endpoint](seed)
+    ndjson = endpoint in NDJSON_ENDPOINTS
+    result = {"endpoint": endpoint}
+    try:
+        _encode(_default_encode, payload, ndjson)
+        result["default_encode_seconds"] = _median_seconds(lambda: _encode(_default_encode, payload, ndjson), repeat)
+    except ValueError as e: # NaN or infinity, which the default path cannot encode
+        result["default_encode_seconds"] = None
+        result["default_encode_error"] = str(e)
+    body = _encode(responses.dumps, payload, ndjson)
+    result["fast_encode_seconds"] = _median_seconds(lambda: _encode(responses.dumps, payload, ndjson), repeat)
+    result["wire"] = _wire_sizes(body, ndjson, repeat)
+    return result
+
+def _format_result(result: dict) -> str:
+    default = result["default_encode_seconds"]
+    fast = result["fast_encode_seconds"]
+    speedup = f"{default / fast:5.1f}x" if default and fast else "    -"
+    default_text = f"{default * 1000:8.2f} ms" if default is not None else "   failed  "
+    wire = "  ".join(f"{name} {sizes['bytes']:>9,} B ({sizes['compress_seconds'] * 1000:.2f} ms)"
+                     for name, sizes in result["wire"].items())
+    return (f"{result['endpoint']:<34} default {default_text}  fast {fast * 1000:8.2f} ms  {speedup}  {wire}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure response encode time and bytes on the wire per simulation endpoint.")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINT_PAYLOADS),
+                        help="Only measure this endpoint (repeatable).")
+    parser.add_argument("--repeat", type=int, default=10, help="Encodes per measurement; the median is reported.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    api.yf.download = FakeMarketData().download
+    results = []
+    for endpoint in args.endpoint or list(ENDPOINT_PAYLOADS):
+        result = measure(endpoint, args.repeat, args.seed)
+        results.append(result)
+        print(_format_result(result), flush=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"brotli_available": responses.brotli is not None, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+"""
+Adaptive trial counts. An engine adds trials a batch at a time and hands a ConvergenceMonitor
+the estimates and standard errors of its target metrics after each batch; the monitor says when
+to stop: once every metric's 95% confidence interval is within the relative tolerance, when the
+next batch would overrun the time budget, or at the trial cap.
+
+A metric whose estimate sits near zero, like the P&L of a strategy that rarely trades, has no
+meaningful relative error. abs_tolerance is a floor under the relative test, in the metric's own
+units: a metric also converges once its half-width is within abs_tolerance, which only decides
+the matter when tolerance x |estimate| is smaller.
+"""
+import math
+import os
+import time
+from typing import Dict, Optional
+
+# Batches are rounded to a multiple of this, so each of variance_reduction's 32 replicate blocks
+# gets whole antithetic pairs from every batch (and stays its own Sobol sequence)
+BATCH_UNIT = 64
+ADAPTIVE_BATCH_TRIALS = int(os.environ.get("ADAPTIVE_BATCH_TRIALS", 2048))
+ADAPTIVE_MAX_TRIALS = int(os.environ.get("ADAPTIVE_MAX_TRIALS", 100_000))
+CONFIDENCE_Z = 1.959963984540054 # Two-sided 95% normal quantile
+
+def batch_size(batch_trials: Optional[int] = None) -> int:
+    """Trials per batch: batch_trials (ADAPTIVE_BATCH_TRIALS by default) rounded down to whole BATCH_UNITs."""
+    batch_trials = ADAPTIVE_BATCH_TRIALS if batch_trials is None else int(batch_trials)
+    return max(batch_trials - batch_trials % BATCH_UNIT, BATCH_UNIT)
+
+def is_adaptive(tolerance: Optional[float], time_budget_seconds: Optional[float]) -> bool:
+    return tolerance is not None or time_budget_seconds is not None
+
+class ConvergenceMonitor:
+    """Tracks the confidence intervals of a run's target metrics batch by batch."""
+
+    def __init__(self, tolerance: Optional[float] = None, time_budget_seconds: Optional[float] = None,
+                 max_trials: Optional[int] = None, batch_trials: Optional[int] = None,
+                 abs_tolerance: Optional[float] = None):
+        if tolerance is not None and tolerance <= 0:
+            raise ValueError("tolerance must be positive.")
+        if abs_tolerance is not None and abs_tolerance <= 0:
+            raise ValueError("abs_tolerance must be positive.")
+        if time_budget_seconds is not None and time_budget_seconds <= 0:
+            raise ValueError("time_budget_seconds must be positive.")
+        self.batch_trials = batch_size(batch_trials)
+        self.max_trials = ADAPTIVE_MAX_TRIALS if max_trials is None else int(max_trials)
+        if self.max_trials < self.batch_trials:
+            raise ValueError(f"max_trials must be at least the batch size of {self.batch_trials} trials.")
+        self.tolerance = tolerance
+        self.abs_tolerance = abs_tolerance
+        self.time_budget_seconds = time_budget_seconds
+        self.started = time.perf_counter()
+        self.trials = 0
+        self.batches = 0
+        self.estimates: Dict[str, float] = {}
+        self.half_widths: Dict[str, float] = {}
+        self.stop_reason = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def next_batch(self) -> int:
+        """Trials to add in the next batch."""
+        return min(self.batch_trials, self.max_trials - self.trials)
+
+    def converged(self) -> bool:
+        if self.tolerance is None or not self.estimates:
+            return False
+        return all(math.isfinite(self.half_widths[name])
+                   and self.half_widths[name] <= max(self.tolerance * abs(estimate), self.abs_tolerance or 0.0)
+                   for name, estimate in self.estimates.items())
+
+    def record(self, trials: int, estimates: Dict[str, float], standard_errors: Dict[str, float],
+               next_seconds: Optional[float] = None) -> bool:
+        """
+        Records the metrics after `trials` trials; returns True when the run should stop.
+        next_seconds is what continuing would cost, when the engine knows better than the
+        average time per trial so far times the next batch.
+        """
+        self.trials = trials
+        self.batches += 1
+        self.estimates = {name: float(value) for name, value in estimates.items()}
+        self.half_widths = {name: CONFIDENCE_Z * float(error) for name, error in standard_errors.items()}
+        if next_seconds is None:
+            next_seconds = self.elapsed_seconds / max(trials, 1) * self.next_batch()
+        if self.converged():
+            self.stop_reason = "tolerance"
+        elif self.trials >= self.max_trials:
+            self.stop_reason = "max_trials"
+        elif self.time_budget_seconds is not None and self.elapsed_seconds + next_seconds > self.time_budget_seconds:
+            self.stop_reason = "time_budget"
+        return self.stop_reason is not None
+
+    def report(self) -> dict:
+        """Run metadata: trials used, why the run stopped, and each metric's 95% confidence interval."""
+        return {
+            "trials_used": self.trials,
+            "batches": self.batches,
+            "converged": self.converged(),
+            "stop_reason": self.stop_reason,
+            "tolerance": self.tolerance,
+            "abs_tolerance": self.abs_tolerance,
+            "time_budget_seconds": self.time_budget_seconds,
+            "elapsed_seconds": self.elapsed_seconds,
+            "confidence_intervals": {
+                name: [estimate - self.half_widths[name], estimate + self.half_widths[name]]
+                if math.isfinite(self.half_widths[name]) else None
+                for name, estimate in self.estimates.items()
+            },
+            "relative_half_widths": {
+                name: self.half_widths[name] / abs(estimate)
+                if estimate != 0 and math.isfinite(self.half_widths[name]) else None
+                for name, estimate in self.estimates.items()
+            },
+        }
@@ -0,0 +1,563 @@
+"""
+Array core for the engines: their per-bar and per-path loops run on contiguous float64 arrays
+extracted from the input frame once, and frames are only rebuilt for the output. When numba is
+installed (pip install numba) the scalar kernels below are JIT-compiled; without it they run as
+plain Python, and path evaluation uses a NumPy version vectorised across paths instead.
+"""
+import os
+
+import numpy as np
+from scipy.signal import lfilter
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Set ENGINE_JIT=0 to use the plain Python/NumPy kernels even when numba is installed
+JIT_ENABLED = numba is not None and os.environ.get("ENGINE_JIT", "1") != "0"
+
+def jit(func):
+    """Compiles func in nopython mode when JIT is enabled; otherwise returns it unchanged."""
+    if JIT_ENABLED:
+        return numba.njit(cache=True, nogil=True)(func)
+    return func
+
+def column(frame, name: str) -> np.ndarray:
+    """A frame column as a contiguous float64 array (the first one when yfinance repeats the name)."""
+    values = frame[name]
+    if values.ndim > 1:
+        values = values.iloc[:, 0]
+    return np.ascontiguousarray(values.to_numpy(dtype=np.float64))
+
+# --- Backtester trade loop ---
+
+EVENT_NAMES = ("ENTRY_LONG", "ENTRY_SHORT", "TAKE_PROFIT", "STOP_LOSS", "EXIT_RULE")
+ENTRY_LONG, ENTRY_SHORT, TAKE_PROFIT, STOP_LOSS, EXIT_RULE = range(len(EVENT_NAMES))
+
+@jit
+def trade_step(current_price, has_signal, entry_long, entry_short, exit_long, exit_short, sampled_return,
+               position, entry_price, position_size, portfolio_value, initial_capital, take_profit_pct,
+               stop_loss_pct, entry_threshold_factor, exit_threshold_factor):
+    """
+    One bar of the single-position SIP strategy. has_signal says whether the bar's indicator prices
+    are valid; sampled_return, the simulated next-bar return, is only read while in a position
+    (1 long, -1 short, 0 flat). Returns the new position, entry price, position size and portfolio
+    value, then the bar's event code (-1 for none) with its price and value.
+    """
+    code = -1
+    event_price = 0.0
+    event_value = 0.0
+    if position == 0:
+        # Indicators exist only while the forecast horizon fits in the history
+        if has_signal:
+            if entry_long > current_price * entry_threshold_factor:
+                position = 1
+            elif entry_short < current_price * (2 - entry_threshold_factor): # (2 - factor) for inverse threshold
+                position = -1
+        if position != 0:
+            entry_price = current_price
+            position_size = initial_capital / entry_price
+            code = ENTRY_LONG if position == 1 else ENTRY_SHORT
+            event_price = entry_price
+            event_value = position_size
+    else:
+        simulated_next_price = current_price * (1 + sampled_return)
+        if position == 1:
+            trade_pnl = (simulated_next_price - entry_price) * position_size
+        else:
+            trade_pnl = (entry_price - simulated_next_price) * position_size
+        if position == 1 and take_profit_pct != 0 and simulated_next_price >= entry_price * (1 + take_profit_pct):
+            code = TAKE_PROFIT
+        elif position == -1 and take_profit_pct != 0 and simulated_next_price <= entry_price * (1 - take_profit_pct):
+            code = TAKE_PROFIT
+        elif position == 1 and stop_loss_pct != 0 and simulated_next_price <= entry_price * (1 - stop_loss_pct):
+            code = STOP_LOSS
+        elif position == -1 and stop_loss_pct != 0 and simulated_next_price >= entry_price * (1 + stop_loss_pct):
+            code = STOP_LOSS
+        elif has_signal and ((position == 1 and exit_long < current_price * exit_threshold_factor)
+                             or (position == -1 and exit_short > current_price * (2 - exit_threshold_factor))):
+            code = EXIT_RULE
+        if code >= 0:
+            portfolio_value += trade_pnl
+            position = 0
+            event_price = simulated_next_price
+            event_value = trade_pnl
+        else:
+            # Still in the position: mark it to the simulated next price
+            portfolio_value = initial_capital + trade_pnl
+    return position, entry_price, position_size, portfolio_value, code, event_price, event_value
+
+@jit
+def _backtest_trades_kernel(close, entry_long, entry_short, exit_long, exit_short, sampled_returns,
+                            start, signal_end, initial_capital, take_profit_pct, stop_loss_pct,
+                            entry_threshold_factor, exit_threshold_factor,
+                            event_bars, event_codes, event_prices, event_values, positions, portfolio_values):
+    portfolio_value = initial_capital
+    position = 0 # 1 long, -1 short
+    entry_price = 0.0
+    position_size = 0.0
+    num_events = 0
+    num_draws = 0
+    for i in range(start, len(close) - 1):
+        positions[i] = position
+        # Draws are consumed in order, one per bar spent in a position
+        sampled_return = 0.0
+        if position != 0:
+            sampled_return = sampled_returns[num_draws]
+            num_draws += 1
+        position, entry_price, position_size, portfolio_value, code, event_price, event_value = trade_step(
+            close[i], i < signal_end, entry_long[i], entry_short[i], exit_long[i], exit_short[i], sampled_return,
+            position, entry_price, position_size, portfolio_value, initial_capital, take_profit_pct, stop_loss_pct,
+            entry_threshold_factor, exit_threshold_factor)
+        if code >= 0:
+            event_bars[num_events] = i
+            event_codes[num_events] = code
+            event_prices[num_events] = event_price
+            event_values[num_events] = event_value
+            num_events += 1
+        portfolio_values[i] = portfolio_value
+    return num_events, portfolio_value
+
+class TradeRun:
+    """
+    Output of backtest_trades. Events are parallel arrays in bar order: the bar index, an index
+    into EVENT_NAMES, the price, and the position size for entries or the PnL for exits.
+    positions and portfolio_values hold the state at each bar (before / after it is processed).
+    """
+    __slots__ = ("event_bars", "event_codes", "event_prices", "event_values",
+                 "positions", "portfolio_values", "final_portfolio_value")
+
+    def __init__(self, event_bars, event_codes, event_prices, event_values, positions, portfolio_values, final_portfolio_value):
+        self.event_bars = event_bars
+        self.event_codes = event_codes
+        self.event_prices = event_prices
+        self.event_values = event_values
+        self.positions = positions
+        self.portfolio_values = portfolio_values
+        self.final_portfolio_value = final_portfolio_value
+
+def backtest_trades(close: np.ndarray, indicators: np.ndarray, sampled_returns: np.ndarray, start: int, signal_end: int,
+                    initial_capital: float, take_profit_pct: float = None, stop_loss_pct: float = None,
+                    entry_threshold_factor: float = 1.005, exit_threshold_factor: float = 0.995) -> TradeRun:
+    """
+    Runs the single-position SIP strategy over the bars start..len(close) - 2. indicators is the
+    (bars x 4) array of entry-long, entry-short, exit-long and exit-short prices, valid below
+    signal_end; sampled_returns needs one simulated next-bar return per bar (only bars spent in a
+    position consume one). A take profit or stop loss of None or 0 is off.
+    """
+    bars = len(close)
+    max_events = max(bars - start, 0)
+    event_bars = np.empty(max_events, dtype=np.int64)
+    event_codes = np.empty(max_events, dtype=np.int8)
+    event_prices = np.empty(max_events)
+    event_values = np.empty(max_events)
+    positions = np.zeros(bars, dtype=np.int8)
+    portfolio_values = np.full(bars, np.nan)
+    num_events, final_value = _backtest_trades_kernel(
+        close, np.ascontiguousarray(indicators[:, 0]), np.ascontiguousarray(indicators[:, 1]),
+        np.ascontiguousarray(indicators[:, 2]), np.ascontiguousarray(indicators[:, 3]), sampled_returns,
+        start, signal_end, float(initial_capital), float(take_profit_pct or 0.0), float(stop_loss_pct or 0.0),
+        float(entry_threshold_factor), float(exit_threshold_factor),
+        event_bars, event_codes, event_prices, event_values, positions, portfolio_values)
+    return TradeRun(event_bars[:num_events], event_codes[:num_events], event_prices[:num_events],
+                    event_values[:num_events], positions, portfolio_values, float(final_value))
+
+# --- Optimiser path evaluation ---
+
+def max_trades_per_path(horizon: int) -> int:
+    """Each trade spans at least two bars, plus one left open at the end of the horizon."""
+    return horizon // 2 + 1
+
+@jit
+def _evaluate_paths_kernel(price_paths, direction, entry_threshold, exit_threshold, stop_threshold, entry_allowed,
+                           pnls, trade_counts, wins):
+    num_paths, columns = price_paths.shape
+    for i in range(num_paths):
+        in_position = False
+        entry_price = 0.0
+        count = 0
+        for t in range(columns - 1):
+            daily_return = (price_paths[i, t + 1] - price_paths[i, t]) / price_paths[i, t]
+            if not in_position:
+                if entry_allowed and ((direction == 1 and daily_return > entry_threshold)
+                                      or (direction == -1 and daily_return < entry_threshold)):
+                    in_position = True
+                    entry_price = price_paths[i, t + 1]
+            else:
+                current_price = price_paths[i, t + 1]
+                if direction == 1:
+                    pnl_pct = (current_price - entry_price) / entry_price
+                else:
+                    pnl_pct = (entry_price - current_price) / entry_price
+                if (direction == 1 and daily_return < exit_threshold) or (direction == -1 and daily_return > exit_threshold):
+                    in_position = False
+                    pnls[i, count] = pnl_pct
+                    count += 1
+                    if pnl_pct > 0:
+                        wins[i] += 1
+                elif (direction == 1 and daily_return < stop_threshold) or (direction == -1 and daily_return > stop_threshold):
+                    in_position = False # A stop is never counted as a win
+                    pnls[i, count] = pnl_pct
+                    count += 1
+        if in_position:
+            if direction == 1:
+                pnl_pct = (price_paths[i, columns - 1] - entry_price) / entry_price
+            else:
+                pnl_pct = (entry_price - price_paths[i, columns - 1]) / entry_price
+            pnls[i, count] = pnl_pct
+            count += 1
+            if pnl_pct > 0:
+                wins[i] += 1
+        trade_counts[i] = count
+
+def _evaluate_paths_numpy(price_paths, direction, entry_threshold, exit_threshold, stop_threshold, entry_allowed,
+                          pnls, trade_counts, wins):
+    """_evaluate_paths_kernel vectorised across paths, looping over bars only."""
+    num_paths, columns = price_paths.shape
+    rows = np.arange(num_paths)
+    returns = np.diff(price_paths, axis=1) / price_paths[:, :-1]
+    in_position = np.zeros(num_paths, dtype=bool)
+    entry_price = np.ones(num_paths) # Only read where in_position
+
+    def record(closed, pnl_pct):
+        pnls[rows[closed], trade_counts[closed]] = pnl_pct[closed]
+        trade_counts[closed] += 1
+
+    for t in range(columns - 1):
+        daily_return = returns[:, t]
+        current_price = price_paths[:, t + 1]
+        pnl_pct = direction * (current_price - entry_price) / entry_price
+        if direction == 1:
+            exits = in_position & (daily_return < exit_threshold)
+            stops = in_position & ~exits & (daily_return < stop_threshold)
+            entries = ~in_position & (daily_return > entry_threshold)
+        else:
+            exits = in_position & (daily_return > exit_threshold)
+            stops = in_position & ~exits & (daily_return > stop_threshold)
+            entries = ~in_position & (daily_return < entry_threshold)
+        if not entry_allowed:
+            entries[:] = False
+        closed = exits | stops
+        record(closed, pnl_pct)
+        wins += exits & (pnl_pct > 0)
+        in_position = (in_position & ~closed) | entries
+        entry_price = np.where(entries, current_price, entry_price)
+    pnl_pct = direction * (price_paths[:, -1] - entry_price) / entry_price
+    record(in_position, pnl_pct)
+    wins += in_position & (pnl_pct > 0)
+
+def evaluate_paths(price_paths: np.ndarray, direction: int, entry_threshold: float, exit_threshold: float,
+                   stop_threshold: float, entry_allowed: bool = True):
+    """
+    Applies the optimiser's threshold strategy to every price path: enter when a bar's return
+    crosses entry_threshold (above it for direction 1, long; below it for -1, short), then close
+    on the exit or stop threshold or at the end of the path. Returns the trade PnL percentages as
+    a (paths x max_trades_per_path) array with the per-path trade counts, and per-path win counts.
+    """
+    price_paths = np.ascontiguousarray(price_paths, dtype=np.float64)
+    num_paths, columns = price_paths.shape
+    pnls = np.zeros((num_paths, max_trades_per_path(columns - 1)))
+    trade_counts = np.zeros(num_paths, dtype=np.int64)
+    wins = np.zeros(num_paths, dtype=np.int64)
+    if direction in (1, -1):
+        evaluate = _evaluate_paths_kernel if JIT_ENABLED else _evaluate_paths_numpy
+        evaluate(price_paths, direction, float(entry_threshold), float(exit_threshold), float(stop_threshold),
+                 bool(entry_allowed), pnls, trade_counts, wins)
+    return pnls, trade_counts, wins
+
+def flatten_trades(pnls: np.ndarray, trade_counts: np.ndarray) -> np.ndarray:
+    """The trades from evaluate_paths in path order, then bar order within each path."""
+    return pnls[np.arange(pnls.shape[1]) < trade_counts[:, None]]
+
+def max_drawdowns(price_paths: np.ndarray, initial_price: float) -> np.ndarray:
+    """Per-path drawdown from the path's highest value, relative to initial_price."""
+    drawdowns = price_paths / initial_price # Cumulative returns, turned into drawdowns in place
+    peak_values = drawdowns.max(axis=1, keepdims=True)
+    np.subtract(peak_values, drawdowns, out=drawdowns)
+    drawdowns /= peak_values
+    return drawdowns.max(axis=1)
+
+# --- Donchian channels and ATR ---
+
+@jit
+def _rolling_max_kernel(values, window, out):
+    # Monotonic deque of indices whose values decrease from head to tail; the head is the window max
+    deque = np.empty(len(values), dtype=np.int64)
+    head = 0
+    tail = 0
+    for i in range(len(values)):
+        while tail > head and values[deque[tail - 1]] <= values[i]:
+            tail -= 1
+        deque[tail] = i
+        tail += 1
+        if deque[head] <= i - window:
+            head += 1
+        if i >= window - 1:
+            out[i] = values[deque[head]]
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Maximum of each trailing window of values in O(n); NaN until the first full window."""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    _rolling_max_kernel(values if JIT_ENABLED else values.tolist(), int(window), out)
+    return out
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    return -rolling_max(-np.asarray(values, dtype=np.float64), window)
+
+def donchian_channel(high: np.ndarray, low: np.ndarray, window: int):
+    """Highest high and lowest low of the `window` bars before each bar (excluding the bar itself)."""
+    upper = np.full(len(high), np.nan)
+    lower = np.full(len(low), np.nan)
+    upper[1:] = rolling_max(high, window)[:-1]
+    lower[1:] = rolling_min(low, window)[:-1]
+    return upper, lower
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """Greatest of high - low and the gaps from the previous close; the first bar has no previous close."""
+    true_ranges = high - low
+    previous_close = close[:-1]
+    np.maximum(true_ranges[1:], np.abs(high[1:] - previous_close), out=true_ranges[1:])
+    np.maximum(true_ranges[1:], np.abs(low[1:] - previous_close), out=true_ranges[1:])
+    return true_ranges
+
+def wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 20) -> np.ndarray:
+    """
+    Average true range with Wilder's smoothing, the Turtles' N: seeded with the mean of the first
+    `window` true ranges, then N = ((window - 1) * previous N + TR) / window, run as a linear filter
+    rather than a Python loop. NaN before the seed.
+    """
+    true_ranges = true_range(high, low, close)
+    atr = np.full(len(true_ranges), np.nan)
+    if len(true_ranges) < window:
+        return atr
+    alpha = 1.0 / window
+    atr[window - 1] = true_ranges[:window].mean()
+    if len(true_ranges) > window:
+        atr[window:], _ = lfilter([alpha], [1.0, alpha - 1.0], true_ranges[window:], zi=[(1.0 - alpha) * atr[window - 1]])
+    return atr
+
+# --- Turtle trading system ---
+
+EXIT_REASONS = ("STOP", "CHANNEL_EXIT", "END_OF_DATA")
+STOP, CHANNEL_EXIT, END_OF_DATA = range(len(EXIT_REASONS))
+
+@jit
+def _turtle_kernel(open_, high, low, close, atr, entry_upper, entry_lower, exit_upper, exit_lower,
+                   failsafe_upper, failsafe_lower, use_filter, allow_short, initial_capital, risk_per_unit,
+                   stop_n, add_interval_n, max_units,
+                   entry_bars, exit_bars, directions, units_held, entry_prices, exit_prices, pnls,
+                   equity_at_entry, exit_reasons, equity_curve):
+    equity = initial_capital # Closed-trade equity; positions are sized from it
+    direction = 0 # 1 long, -1 short
+    units = 0
+    unit_shares = 0.0
+    cost_basis = 0.0 # Sum of fill price x shares over the units held
+    stop_price = 0.0
+    next_add_price = 0.0
+    position_n = 0.0 # N when the position was opened; sets the add spacing and stops
+    entry_bar = 0
+    entry_equity = 0.0
+    num_trades = 0
+    # System 1 filter: skip a breakout when the previous one would have won. Skipped breakouts
+    # are followed as one-unit shadow trades so their outcome is known.
+    last_breakout_won = False
+    shadow_direction = 0
+    shadow_entry = 0.0
+    shadow_stop = 0.0
+    for i in range(1, len(close)):
+        exited = False
+        if direction != 0:
+            # Price reaches the nearer of the stop and the exit channel first; gaps fill at the open
+            reason = -1
+            if direction == 1:
+                level = -np.inf
+                if low[i] <= stop_price:
+                    level = stop_price
+                    reason = STOP
+                if low[i] < exit_lower[i] and exit_lower[i] > level:
+                    level = exit_lower[i]
+                    reason = CHANNEL_EXIT
+                fill = min(open_[i], level)
+            else:
+                level = np.inf
+                if high[i] >= stop_price:
+                    level = stop_price
+                    reason = STOP
+                if high[i] > exit_upper[i] and exit_upper[i] < level:
+                    level = exit_upper[i]
+                    reason = CHANNEL_EXIT
+                fill = max(open_[i], level)
+            if reason >= 0:
+                shares = units * unit_shares
+                pnl = direction * (fill * shares - cost_basis)
+                equity += pnl
+                entry_bars[num_trades] = entry_bar
+                exit_bars[num_trades] = i
+                directions[num_trades] = direction
+                units_held[num_trades] = units
+                entry_prices[num_trades] = cost_basis / shares
+                exit_prices[num_trades] = fill
+                pnls[num_trades] = pnl
+                equity_at_entry[num_trades] = entry_equity
+                exit_reasons[num_trades] = reason
+                num_trades += 1
+                last_breakout_won = pnl > 0
+                direction = 0
+                units = 0
+                exited = True
+            else:
+                # Pyramid: one more unit every add_interval_n x N beyond the last fill, stops trailing it
+                while units < max_units and ((direction == 1 and high[i] >= next_add_price)
+                                             or (direction == -1 and low[i] <= next_add_price)):
+                    fill = max(open_[i], next_add_price) if direction == 1 else min(open_[i], next_add_price)
+                    units += 1
+                    cost_basis += fill * unit_shares
+                    stop_price = fill - direction * stop_n * position_n
+                    next_add_price = fill + direction * add_interval_n * position_n
+
+        if use_filter and shadow_direction != 0:
+            # Resolve the skipped breakout with the same stop and exit channel a real trade would use
+            if shadow_direction == 1 and (low[i] <= shadow_stop or low[i] < exit_lower[i]):
+                last_breakout_won = min(open_[i], max(shadow_stop, exit_lower[i])) > shadow_entry
+                shadow_direction = 0
+            elif shadow_direction == -1 and (high[i] >= shadow_stop or high[i] > exit_upper[i]):
+                last_breakout_won = max(open_[i], min(shadow_stop, exit_upper[i])) < shadow_entry
+                shadow_direction = 0
+
+        if direction == 0 and not exited:
+            n = atr[i - 1] # N as of the previous close
+            signal = 0
+            level = 0.0
+            long_breakout = high[i] > entry_upper[i]
+            short_breakout = allow_short and low[i] < entry_lower[i]
+            if long_breakout and not short_breakout:
+                signal = 1
+                level = entry_upper[i]
+            elif short_breakout and not long_breakout:
+                signal = -1
+                level = entry_lower[i]
+            if signal != 0 and use_filter and last_breakout_won:
+                if shadow_direction == 0:
+                    shadow_direction = signal
+                    shadow_entry = max(open_[i], level) if signal == 1 else min(open_[i], level)
+                    shadow_stop = shadow_entry - signal * stop_n * n
+                # The failsafe breakout is always taken
+                if signal == 1 and high[i] > failsafe_upper[i]:
+                    level = failsafe_upper[i]
+                elif signal == -1 and low[i] < failsafe_lower[i]:
+                    level = failsafe_lower[i]
+                else:
+                    signal = 0
+            if signal != 0 and n > 0:
+                unit_shares = np.floor(equity * risk_per_unit / (stop_n * n))
+                if unit_shares >= 1:
+                    if use_filter and shadow_direction == signal:
+                        shadow_direction = 0 # Now followed as a real trade
+                    fill = max(open_[i], level) if signal == 1 else min(open_[i], level)
+                    direction = signal
+                    units = 1
+                    cost_basis = fill * unit_shares
+                    position_n = n
+                    stop_price = fill - direction * stop_n * position_n
+                    next_add_price = fill + direction * add_interval_n * position_n
+                    entry_bar = i
+                    entry_equity = equity
+                    while units < max_units and ((direction == 1 and high[i] >= next_add_price)
+                                                 or (direction == -1 and low[i] <= next_add_price)):
+                        fill = next_add_price
+                        units += 1
+                        cost_basis += fill * unit_shares
+                        stop_price = fill - direction * stop_n * position_n
+                        next_add_price = fill + direction * add_interval_n * position_n
+
+        if direction != 0:
+            equity_curve[i] = equity + direction * (close[i] * units * unit_shares - cost_basis)
+        else:
+            equity_curve[i] = equity
+
+    last = len(close) - 1
+    if direction != 0:
+        shares = units * unit_shares
+        pnl = direction * (close[last] * shares - cost_basis)
+        equity += pnl
+        entry_bars[num_trades] = entry_bar
+        exit_bars[num_trades] = last
+        directions[num_trades] = direction
+        units_held[num_trades] = units
+        entry_prices[num_trades] = cost_basis / shares
+        exit_prices[num_trades] = close[last]
+        pnls[num_trades] = pnl
+        equity_at_entry[num_trades] = entry_equity
+        exit_reasons[num_trades] = END_OF_DATA
+        num_trades += 1
+    return num_trades, equity
+
+class TurtleRun:
+    """
+    Output of turtle_trades. Trades are parallel arrays in entry order: entry and exit bar,
+    direction (1 long, -1 short), units held at exit, average entry and exit price, PnL, the
+    closed-trade equity the position was sized from, and an index into EXIT_REASONS.
+    equity_curve is marked to the close of every bar.
+    """
+    __slots__ = ("entry_bars", "exit_bars", "directions", "units", "entry_prices", "exit_prices",
+                 "pnls", "equity_at_entry", "exit_reasons", "equity_curve", "final_equity")
+
+    def __init__(self, entry_bars, exit_bars, directions, units, entry_prices, exit_prices, pnls,
+                 equity_at_entry, exit_reasons, equity_curve, final_equity):
+        self.entry_bars = entry_bars
+        self.exit_bars = exit_bars
+        self.directions = directions
+        self.units = units
+        self.entry_prices = entry_prices
+        self.exit_prices = exit_prices
+        self.pnls = pnls
+        self.equity_at_entry = equity_at_entry
+        self.exit_reasons = exit_reasons
+        self.equity_curve = equity_curve
+        self.final_equity = final_equity
+
+    @property
+    def trade_returns(self) -> np.ndarray:
+        """Each trade's PnL as a fraction of the equity it was sized from."""
+        return self.pnls / self.equity_at_entry
+
+def turtle_trades(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, atr: np.ndarray,
+                  entry_channel, exit_channel, failsafe_channel=None, allow_short: bool = True,
+                  initial_capital: float = 100000, risk_per_unit: float = 0.02, stop_n: float = 2.0,
+                  add_interval_n: float = 0.5, max_units: int = 4) -> TurtleRun:
+    """
+    Runs a Turtle breakout system over OHLC bars. Channels are (upper, lower) pairs from
+    donchian_channel: enter on a break of the entry channel, exit on a break of the opposite
+    side of the exit channel or at a stop stop_n x N from the last unit's fill, and add a unit
+    every add_interval_n x N in the trade's favour up to max_units. A unit is sized so hitting
+    its stop loses risk_per_unit of equity. Passing failsafe_channel turns on the System 1 filter:
+    a breakout after a winning one is skipped unless it also breaks the failsafe channel.
+    """
+    bars = len(close)
+    use_filter = failsafe_channel is not None
+    if failsafe_channel is None:
+        failsafe_channel = entry_channel
+    entry_bars = np.empty(bars, dtype=np.int64)
+    exit_bars = np.empty(bars, dtype=np.int64)
+    directions = np.empty(bars, dtype=np.int8)
+    units = np.empty(bars, dtype=np.int64)
+    entry_prices = np.empty(bars)
+    exit_prices = np.empty(bars)
+    pnls = np.empty(bars)
+    equity_at_entry = np.empty(bars)
+    exit_reasons = np.empty(bars, dtype=np.int8)
+    equity_curve = np.full(bars, float(initial_capital))
+    inputs = [open_, high, low, close, atr, entry_channel[0], entry_channel[1], exit_channel[0], exit_channel[1],
+              failsafe_channel[0], failsafe_channel[1]]
+    # Plain Python indexes lists several times faster than NumPy arrays
+    inputs = [np.ascontiguousarray(values, dtype=np.float64) if JIT_ENABLED else np.asarray(values, dtype=np.float64).tolist()
+              for values in inputs]
+    num_trades, final_equity = _turtle_kernel(
+        *inputs, use_filter, allow_short, float(initial_capital), float(risk_per_unit), float(stop_n),
+        float(add_interval_n), int(max_units), entry_bars, exit_bars, directions, units, entry_prices,
+        exit_prices, pnls, equity_at_entry, exit_reasons, equity_curve)
+    return TurtleRun(entry_bars[:num_trades], exit_bars[:num_trades], directions[:num_trades], units[:num_trades],
+                     entry_prices[:num_trades], exit_prices[:num_trades], pnls[:num_trades],
+                     equity_at_entry[:num_trades], exit_reasons[:num_trades], equity_curve, float(final_equity))
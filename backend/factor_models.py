@@ -0,0 +1,139 @@
+"""
+Factorised covariance for the SLURP generators. Correlated draws are mean + normals @ factor,
+so a fitted factor can be reused by every chunk, strategy and request that samples the same data.
+Fits are cached under a fingerprint of the data they came from.
+
+- "dense": the Cholesky factor of the sample covariance; exact, but each draw costs assets² and
+  the fit assets³.
+- "factor": a principal-component factor model, covariance ≈ loadings @ loadings.T + diag(specific
+  variance). Each draw takes num_factors common normals plus one idiosyncratic normal per asset,
+  so it costs assets x factors; every asset's variance is kept exactly.
+"""
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+COVARIANCE_MODELS = ("dense", "factor")
+DEFAULT_NUM_FACTORS = int(os.environ.get("SLURP_DEFAULT_NUM_FACTORS", 5))
+FACTOR_CACHE_TTL_SECONDS = float(os.environ.get("FACTOR_CACHE_TTL_SECONDS", 3600))
+FACTOR_CACHE_SIZE = int(os.environ.get("FACTOR_CACHE_SIZE", 256))
+
+_factor_cache = TTLCache(ttl_seconds=FACTOR_CACHE_TTL_SECONDS, max_size=FACTOR_CACHE_SIZE, name="covariance_factor")
+
+def check_covariance_model(model: str) -> str:
+    if model not in COVARIANCE_MODELS:
+        raise ValueError(f"Unsupported covariance model: {model}. "
+                         f"Available models are: {', '.join(COVARIANCE_MODELS)}")
+    return model
+
+def data_fingerprint(values: np.ndarray) -> str:
+    """A digest of an array's shape, dtype and contents."""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((values.shape, values.dtype.str)).encode("ascii"))
+    digest.update(memoryview(values).cast("B"))
+    return digest.hexdigest()
+
+def cholesky_factor(cov: np.ndarray) -> np.ndarray:
+    """
+    Cholesky factor of a covariance matrix. A matrix that is only positive semi-definite
+    (collinear series, or fewer bars than series) gets a growing diagonal jitter until it factors.
+    """
+    scale = float(np.mean(np.diag(cov))) or 1.0
+    jitter = 0.0
+    for attempt in range(6):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 10.0 ** (attempt - 10)
+    raise ValueError("The covariance matrix of the series is not positive definite.")
+
+class CovarianceFactor:
+    """
+    A fitted covariance model: draws are mean + common @ loadings.T + specific * specific_volatility,
+    where a row of normals holds num_factors common normals followed, for the factor model, by
+    one specific normal per series.
+    """
+    __slots__ = ("model", "mean", "loadings", "specific_volatility", "fingerprint")
+
+    def __init__(self, model: str, mean: np.ndarray, loadings: np.ndarray,
+                 specific_volatility: Optional[np.ndarray] = None, fingerprint: Optional[str] = None):
+        self.model = model
+        self.mean = mean
+        self.loadings = loadings
+        self.specific_volatility = specific_volatility
+        self.fingerprint = fingerprint
+
+    @property
+    def num_series(self) -> int:
+        return self.loadings.shape[0]
+
+    @property
+    def num_factors(self) -> int:
+        return self.loadings.shape[1]
+
+    @property
+    def normal_dim(self) -> int:
+        """Standard normals per draw."""
+        return self.num_factors + (0 if self.specific_volatility is None else self.num_series)
+
+    def sample(self, normals: np.ndarray) -> np.ndarray:
+        """Maps (..., normal_dim) standard normals onto (..., num_series) correlated draws."""
+        correlated = normals[..., :self.num_factors] @ self.loadings.T
+        if self.specific_volatility is not None:
+            correlated += normals[..., self.num_factors:] * self.specific_volatility
+        correlated += self.mean
+        return correlated
+
+    def covariance(self) -> np.ndarray:
+        """The covariance the draws have."""
+        cov = self.loadings @ self.loadings.T
+        if self.specific_volatility is not None:
+            cov[np.diag_indices_from(cov)] += self.specific_volatility ** 2
+        return cov
+
+def _fit(values: np.ndarray, model: str, num_factors: int) -> CovarianceFactor:
+    mean = values.mean(axis=0)
+    if model == "dense":
+        return CovarianceFactor(model, mean, cholesky_factor(np.atleast_2d(np.cov(values, rowvar=False))))
+    # Principal components of the centred data: the leading right singular vectors, scaled by their
+    # volatility, are the loadings; what they leave of each series' variance is its specific variance
+    centred = values - mean
+    _, singular_values, components = np.linalg.svd(centred, full_matrices=False)
+    num_factors = min(num_factors, len(singular_values))
+    loadings = components[:num_factors].T * (singular_values[:num_factors] / np.sqrt(len(values) - 1))
+    variance = centred.var(axis=0, ddof=1)
+    specific_variance = np.clip(variance - np.einsum("ij,ij->i", loadings, loadings), 0.0, None)
+    return CovarianceFactor(model, mean, loadings, np.sqrt(specific_variance))
+
+def fit_covariance_factor(values: np.ndarray, model: str = "dense", num_factors: Optional[int] = None) -> CovarianceFactor:
+    """
+    The covariance factor of (observations x series) values, from the cache when the same data
+    was fitted the same way before. num_factors (factor model only) defaults to DEFAULT_NUM_FACTORS.
+    """
+    check_covariance_model(model)
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or len(values) < 2 or values.shape[1] < 1:
+        raise ValueError("At least two observations of at least one series are required to fit a covariance model.")
+    if model == "factor":
+        num_factors = DEFAULT_NUM_FACTORS if num_factors is None else int(num_factors)
+        if num_factors < 1:
+            raise ValueError("num_factors must be at least 1.")
+    else:
+        num_factors = None
+    fingerprint = data_fingerprint(values)
+    key = (fingerprint, model, num_factors)
+    factor = _factor_cache.get(key)
+    if factor is None:
+        factor = _fit(values, model, num_factors)
+        factor.fingerprint = fingerprint
+        # Shared between threads and runs, so nothing may write to it
+        for array in (factor.mean, factor.loadings, factor.specific_volatility):
+            if array is not None:
+                array.flags.writeable = False
+        _factor_cache.set(key, factor)
+    return factor
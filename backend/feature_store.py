@@ -0,0 +1,217 @@
+"""
+Per-ticker features kept next to the raw bars: closes, simple and log returns, and rolling
+volatility for the standard windows. The engines read them as read-only arrays instead of
+recomputing pct_change and rolling().std() from the prices on every request.
+
+A ticker's store covers the bars of every history it has been updated with. An update appends the
+bars after the last stored one and computes features only for those; a history that disagrees
+with the stored bars it overlaps (a revised adjusted close, a missing bar) or that does not touch
+them replaces the store. Stores are saved as .npz files under FEATURE_STORE_DIR, named by ticker,
+so only tickers matching TICKER_PATTERN are stored. The FEATURE_STORE_MAX_TICKERS most recently
+updated tickers are also held in memory, for up to FEATURE_STORE_TTL_SECONDS; an evicted ticker is
+read back from its file. Arrays are never modified once built, so a window handed to an engine
+stays valid while later updates land.
+"""
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from engine_core import column
+from metrics import stage_timer
+from rolling_stats import rolling_statistics
+from tracing import get_tracer
+from ttl_cache import TTLCache
+
+_trace = get_tracer("feature_store")
+
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", "feature_store")
+VOLATILITY_WINDOWS = tuple(sorted({int(window) for window in
+                                   os.environ.get("FEATURE_VOLATILITY_WINDOWS", "5,10,20,60,120,250").split(",")}))
+FEATURE_STORE_MAX_TICKERS = int(os.environ.get("FEATURE_STORE_MAX_TICKERS", 256))
+FEATURE_STORE_TTL_SECONDS = float(os.environ.get("FEATURE_STORE_TTL_SECONDS", 3600))
+# Exchange symbols as yfinance spells them (BRK-B, ^GSPC, EURUSD=X, 7203.T); never a path
+TICKER_PATTERN = re.compile(r"^[A-Z0-9^=-][A-Z0-9^=.-]{0,19}$")
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    values.flags.writeable = False
+    return values
+
+def rolling_std(returns: np.ndarray, window: int) -> np.ndarray:
+    """Sample standard deviation of each run of `window` consecutive returns (len(returns) - window + 1 values)."""
+    if window < 2:
+        raise ValueError("Rolling volatility needs a window of at least 2 bars.")
+    if len(returns) < window:
+        return np.empty(0)
+    # Each window's own two-pass deviation, so a value does not depend on where the computation started
+    return np.lib.stride_tricks.sliding_window_view(returns, window).std(axis=1, ddof=1)
+
+def _returns(close: np.ndarray, previous_close: float = np.nan) -> Tuple[np.ndarray, np.ndarray]:
+    """Simple and log returns of close, the first one against previous_close (NaN for none)."""
+    previous = np.concatenate(([previous_close], close[:-1]))
+    ratio = close / previous
+    return ratio - 1.0, np.log(ratio)
+
+class FeatureWindow:
+    """
+    Read-only features of a ticker over a run of consecutive bars. Each series starts at the first
+    bar it can be computed from this run's own bars, so it matches a fresh computation over them:
+    returns has len(close) - 1 values and volatility(window) len(close) - window.
+    """
+    __slots__ = ("ticker", "dates", "close", "returns", "log_returns", "_volatility")
+
+    def __init__(self, ticker: str, dates: np.ndarray, close: np.ndarray, returns: np.ndarray,
+                 log_returns: np.ndarray, volatility: Dict[int, np.ndarray]):
+        self.ticker = ticker
+        self.dates = dates
+        self.close = close
+        self.returns = returns
+        self.log_returns = log_returns
+        self._volatility = volatility
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def volatility(self, window: int) -> np.ndarray:
+        """Rolling volatility of returns over `window` bars; windows outside the store's are computed on the fly."""
+        window = int(window)
+        if window not in self._volatility:
+            self._volatility[window] = _read_only(rolling_std(self.returns, window))
+        return self._volatility[window]
+
+    def volatilities(self, windows) -> Dict[int, np.ndarray]:
+        """volatility(window) for each window; those outside the store's are computed together in one pass."""
+        windows = sorted({int(window) for window in windows})
+        missing = [window for window in windows if window not in self._volatility]
+        if missing:
+            if min(missing) < 2:
+                raise ValueError("Rolling volatility needs a window of at least 2 bars.")
+            statistics = rolling_statistics(self.returns, [window for window in missing if window <= len(self.returns)], ("std",))
+            for window in missing:
+                values = statistics.full("std", window) if window <= len(self.returns) else np.empty(0)
+                self._volatility[window] = _read_only(np.array(values))
+        return {window: self._volatility[window] for window in windows}
+
+class _TickerFeatures:
+    """A ticker's stored arrays, aligned on its bars; returns[0] and volatility[w][:w] are NaN."""
+    __slots__ = ("dates", "close", "returns", "log_returns", "volatility")
+
+    def __init__(self, dates: np.ndarray, close: np.ndarray, returns: np.ndarray, log_returns: np.ndarray,
+                 volatility: Dict[int, np.ndarray]):
+        self.dates = _read_only(dates)
+        self.close = _read_only(close)
+        self.returns = _read_only(returns)
+        self.log_returns = _read_only(log_returns)
+        self.volatility = {window: _read_only(values) for window, values in volatility.items()}
+
+    @classmethod
+    def build(cls, dates: np.ndarray, close: np.ndarray) -> "_TickerFeatures":
+        returns, log_returns = _returns(close)
+        volatility = {window: np.concatenate((np.full(min(window, len(close)), np.nan), rolling_std(returns[1:], window)))
+                      for window in VOLATILITY_WINDOWS}
+        return cls(dates, close, returns, log_returns, volatility)
+
+    def append(self, dates: np.ndarray, close: np.ndarray) -> "_TickerFeatures":
+        """The store with bars after its last one appended; only the new bars' features are computed."""
+        returns, log_returns = _returns(close, self.close[-1])
+        all_returns = np.concatenate((self.returns, returns))
+        volatility = {}
+        for window, values in self.volatility.items():
+            # The new bars' windows reach back window - 1 returns into the stored ones
+            first = len(self.close)
+            tail = all_returns[max(first - window + 1, 1):]
+            new_values = rolling_std(tail, window)
+            padding = len(close) - len(new_values)
+            volatility[window] = np.concatenate((values, np.full(padding, np.nan), new_values))
+        return _TickerFeatures(np.concatenate((self.dates, dates)), np.concatenate((self.close, close)),
+                               all_returns, np.concatenate((self.log_returns, log_returns)), volatility)
+
+    def window(self, ticker: str, start: int, stop: int) -> FeatureWindow:
+        volatility = {window: values[start + window:stop] for window, values in self.volatility.items()}
+        return FeatureWindow(ticker, self.dates[start:stop], self.close[start:stop], self.returns[start + 1:stop],
+                             self.log_returns[start + 1:stop], volatility)
+
+class FeatureStore:
+    """Per-ticker features, held in memory and saved under directory (not saved when it is None)."""
+
+    def __init__(self, directory: Optional[str] = FEATURE_STORE_DIR):
+        self.directory = directory
+        self._tickers = TTLCache(ttl_seconds=FEATURE_STORE_TTL_SECONDS, max_size=FEATURE_STORE_MAX_TICKERS,
+                                 name="feature_store")
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.directory, f"{ticker}.npz")
+
+    def _load(self, ticker: str) -> Optional[_TickerFeatures]:
+        if self.directory is None or not os.path.exists(self._path(ticker)):
+            return None
+        with np.load(self._path(ticker)) as stored:
+            dates, close = stored["dates"], stored["close"]
+            if any(f"volatility_{window}" not in stored for window in VOLATILITY_WINDOWS):
+                return _TickerFeatures.build(dates, close) # Saved under other standard windows
+            return _TickerFeatures(dates, close, stored["returns"], stored["log_returns"],
+                                   {window: stored[f"volatility_{window}"] for window in VOLATILITY_WINDOWS})
+
+    def _save(self, ticker: str, features: _TickerFeatures) -> None:
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self._path(ticker) + ".tmp.npz"
+        np.savez(temp_path, dates=features.dates, close=features.close, returns=features.returns,
+                 log_returns=features.log_returns,
+                 **{f"volatility_{window}": values for window, values in features.volatility.items()})
+        os.replace(temp_path, self._path(ticker)) # Readers never see a half-written store
+
+    def update(self, ticker: str, history: pd.DataFrame) -> Optional[FeatureWindow]:
+        """
+        Brings the ticker's store up to date with a downloaded history (a frame with a Close column
+        and a date index) and returns the features of the history's bars. Returns None for a ticker
+        that does not match TICKER_PATTERN or a history with missing closes or unordered dates, which
+        the engines then handle themselves.
+        """
+        ticker = ticker.strip().upper()
+        if not TICKER_PATTERN.match(ticker):
+            return None
+        if history.empty or "Close" not in history.columns:
+            return None
+        close = column(history, "Close")
+        dates = pd.DatetimeIndex(history.index).as_unit("ns").asi8
+        if not np.isfinite(close).all() or np.any(np.diff(dates) <= 0):
+            return None
+        with stage_timer("features"), self._lock:
+            stored = self._tickers.get(ticker) or self._load(ticker)
+            features = self._merge(stored, dates, close)
+            if features is not stored:
+                try:
+                    self._save(ticker, features)
+                except OSError as e:
+                    # The in-memory store still serves this process
+                    _trace.info("could not save the features of %s: %s", ticker, e, ticker=ticker)
+            self._tickers.set(ticker, features)
+        start, stop = np.searchsorted(features.dates, [dates[0], dates[-1]])
+        return features.window(ticker, int(start), int(stop) + 1)
+
+    @staticmethod
+    def _merge(stored: Optional[_TickerFeatures], dates: np.ndarray, close: np.ndarray) -> _TickerFeatures:
+        if stored is None or dates[0] > stored.dates[-1] or dates[-1] < stored.dates[0]:
+            return _TickerFeatures.build(dates, close)
+        # The history's bars from first to last fall within the stored range, where they must be
+        # exactly the stored bars: same dates, same closes, none missing on either side
+        first = int(np.searchsorted(dates, stored.dates[0]))
+        last = int(np.searchsorted(dates, stored.dates[-1], side="right"))
+        start = int(np.searchsorted(stored.dates, dates[first]))
+        stop = start + last - first
+        if ((first > 0 and start > 0) or stop != int(np.searchsorted(stored.dates, dates[-1], side="right"))
+                or not np.array_equal(stored.dates[start:stop], dates[first:last])
+                or not np.array_equal(stored.close[start:stop], close[first:last])):
+            return _TickerFeatures.build(dates, close)
+        if first > 0:
+            # The history reaches further back: rebuild over it and the stored bars after it
+            return _TickerFeatures.build(np.concatenate((dates, stored.dates[stop:])), np.concatenate((close, stored.close[stop:])))
+        return stored.append(dates[last:], close[last:]) if last < len(dates) else stored
+
+store = FeatureStore()
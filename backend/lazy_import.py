@@ -0,0 +1,36 @@
+import importlib
+from types import ModuleType
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so heavy
+    dependencies (pandas, scipy, yfinance, the engines) are not paid for at startup.
+    Attribute assignment is forwarded to the real module, so monkeypatching still works.
+    """
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def load(self) -> ModuleType:
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name) # The import lock makes concurrent first use safe
+            object.__setattr__(self, "_module", module)
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self.load(), attr, value)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
@@ -0,0 +1,236 @@
+"""
+Live mode for the SIP backtester. LiveBacktester keeps the engine's state between bars: the
+empirical return pool, the rolling volatility window and the open position. For each bar a
+BarSource delivers, it updates only what that bar changes. The pool and the volatility take the
+bar's return, SIP indicators are built for the newest close alone, and the entry/exit decision is
+made on them. A bar costs O(trials x horizon), plus O(pool) to keep the pool sorted, however long
+the session runs; BacktesterSimulator instead rebuilds every bar's indicators from the full history.
+
+Decisions follow BacktesterSimulator's trade rules (engine_core.trade_step), with two differences
+that come with running live. Every bar has indicators, since its forecast horizon lies in the
+future rather than in bars already in the history. And indicators and simulated next-bar returns
+sample the pool directly, rather than a SIP resampled from it once, so they take in each new return.
+"""
+import abc
+import math
+import time
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtester import SIP_INDICATOR_COLUMNS, VOLATILITY_WINDOW, simulate_growth
+from engine_core import ENTRY_LONG, ENTRY_SHORT, EVENT_NAMES, column, trade_step
+from memory_planner import plan_backtester
+from metrics import record_trials, stage_timer
+from random_streams import RandomStreams, SeedLike
+from tracing import get_tracer
+from variance_reduction import TrialSampler, check_mode, percentile_estimates
+
+_trace = get_tracer("live_backtester")
+
+POSITION_NAMES = {1: "LONG", -1: "SHORT", 0: None}
+
+class Bar:
+    """A bar's timestamp and closing price."""
+    __slots__ = ("date", "close")
+
+    def __init__(self, date, close: float):
+        self.date = pd.Timestamp(date)
+        self.close = float(close)
+
+    def __repr__(self):
+        return f"Bar({self.date}, {self.close})"
+
+class BarSource(abc.ABC):
+    """
+    A feed of bars in time order. LiveBacktester.run takes any iterable of Bars; a subclass
+    wrapping a market-data or broker stream yields each bar from __iter__ as it arrives.
+    """
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[Bar]:
+        ...
+
+class FileReplaySource(BarSource):
+    """
+    Replays a CSV of bars (dates in the first column, as the uploads and yf.download write them)
+    from bar `start` on, pausing delay_seconds before each bar to stand in for a live feed.
+    history() holds the bars before start, for warming the engine up.
+    """
+    def __init__(self, path: str, column_name: str = "Close", start: int = 0, delay_seconds: float = 0.0,
+                 dayfirst: bool = False):
+        frame = pd.read_csv(path, index_col=0)
+        if column_name not in frame.columns:
+            raise ValueError(f"Column '{column_name}' not found in {path}.")
+        frame.index = pd.to_datetime(frame.index, format="mixed", dayfirst=dayfirst)
+        frame = frame[~frame.index.duplicated(keep="last")].dropna(subset=[column_name]).sort_index()
+        self.frame = frame.rename(columns={column_name: "Close"}) if column_name != "Close" else frame
+        self.start = start
+        self.delay_seconds = delay_seconds
+
+    def history(self) -> pd.DataFrame:
+        return self.frame.iloc[:self.start]
+
+    def __iter__(self) -> Iterator[Bar]:
+        closes = column(self.frame, "Close")
+        for date, close in zip(self.frame.index[self.start:], closes[self.start:].tolist()):
+            if self.delay_seconds:
+                time.sleep(self.delay_seconds)
+            yield Bar(date, close)
+
+class LiveBacktester:
+    """
+    The SIP backtester run a bar at a time. history (a frame with a Close column and a date index)
+    fills the return pool and volatility window; trading starts flat with the first appended bar.
+    return_window keeps only the latest returns in the pool (all of them when None).
+    """
+    def __init__(self,
+                 history: pd.DataFrame,
+                 num_trials: int = 10000,
+                 take_profit_pct: float = None,
+                 stop_loss_pct: float = None,
+                 forecast_horizon: int = 5,
+                 entry_long_percentile: float = 0.75,
+                 entry_short_percentile: float = 0.25,
+                 exit_long_percentile: float = 0.25,
+                 exit_short_percentile: float = 0.75,
+                 entry_threshold_factor: float = 1.005,
+                 exit_threshold_factor: float = 0.995,
+                 return_window: Optional[int] = None,
+                 initial_capital: float = 100000,
+                 memory_budget_bytes: Optional[int] = None,
+                 variance_reduction: str = "none", # "none", "antithetic", "control_variate" or "sobol"
+                 seed: SeedLike = None,
+                 ):
+        if 'Close' not in history.columns:
+            raise ValueError("Historical data must contain a 'Close' column.")
+        close = column(history, 'Close')
+        if len(close) < 2 or not np.isfinite(close).all():
+            raise ValueError("Warming up needs at least two bars of finite closing prices.")
+        if return_window is not None and return_window < 1:
+            raise ValueError("return_window must be at least 1.")
+        self.num_trials = num_trials
+        self.take_profit_pct = take_profit_pct
+        self.stop_loss_pct = stop_loss_pct
+        self.forecast_horizon = forecast_horizon
+        self.percentiles = [entry_long_percentile * 100, entry_short_percentile * 100,
+                            exit_long_percentile * 100, exit_short_percentile * 100]
+        self.entry_threshold_factor = entry_threshold_factor
+        self.exit_threshold_factor = exit_threshold_factor
+        self.initial_capital = initial_capital
+        self.variance_reduction = check_mode(variance_reduction)
+        # The session's draws continue from bar to bar, so replaying the same bars reproduces it
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+        self._sampler = TrialSampler(self.variance_reduction, num_trials, forecast_horizon, self.streams.child("indicators"))
+        self._trade_draws = self.streams.generator("trades")
+
+        # The return pool in arrival order, for dropping the oldest, and sorted, for sampling quantiles
+        returns = close[1:] / close[:-1] - 1.0
+        self.returns = deque(returns.tolist(), maxlen=return_window)
+        self.sorted_returns = np.sort(np.fromiter(self.returns, dtype=float, count=len(self.returns)))
+        self.volatility_window = deque(returns[-VOLATILITY_WINDOW:].tolist(), maxlen=VOLATILITY_WINDOW)
+        self.last_date = pd.Timestamp(history.index[-1])
+        self.last_close = float(close[-1])
+
+        self.memory_plan = plan_backtester(num_trials, forecast_horizon, len(self.returns), 0, memory_budget_bytes)
+        self._growth = np.empty(num_trials)
+        self._controls = np.empty(num_trials) if self.variance_reduction == "control_variate" else None
+
+        self.position = 0 # 1 long, -1 short
+        self.entry_price = 0.0
+        self.position_size = 0.0
+        self.portfolio_value = float(initial_capital)
+        self.bars = 0
+        self.trade_log = []
+
+    @property
+    def volatility(self) -> float:
+        """Standard deviation of the last VOLATILITY_WINDOW returns; NaN until there are that many."""
+        if len(self.volatility_window) < VOLATILITY_WINDOW:
+            return math.nan
+        return float(np.std(np.fromiter(self.volatility_window, dtype=float, count=VOLATILITY_WINDOW), ddof=1))
+
+    def _add_return(self, daily_return: float) -> None:
+        if len(self.returns) == self.returns.maxlen:
+            oldest = self.returns[0]
+            self.sorted_returns = np.delete(self.sorted_returns, np.searchsorted(self.sorted_returns, oldest))
+        self.returns.append(daily_return)
+        self.sorted_returns = np.insert(self.sorted_returns, np.searchsorted(self.sorted_returns, daily_return), daily_return)
+        self.volatility_window.append(daily_return)
+
+    def _indicators(self, close: float) -> np.ndarray:
+        """The SIP indicator prices (in SIP_INDICATOR_COLUMNS order) of a bar closing at close."""
+        control_mean = None
+        if self._controls is not None:
+            # Uniform quantiles of the sorted pool have its mean as their expectation
+            control_mean = self.forecast_horizon * float(self.sorted_returns.mean())
+        simulate_growth(self._sampler, self.sorted_returns, self.memory_plan, self._growth, self._controls)
+        estimates, _, _ = percentile_estimates(close * self._growth, self.percentiles, self._controls, control_mean,
+                                               with_blocks=False)
+        return estimates
+
+    def update(self, bar: Bar) -> dict:
+        """
+        Appends a bar and returns its signal: the bar, the rolling volatility, its SIP indicator
+        prices, the position held after it, the event it triggered (None for none) and the
+        portfolio value.
+        """
+        if not math.isfinite(bar.close) or bar.close <= 0:
+            raise ValueError(f"Bar {bar.date} has an invalid closing price: {bar.close}.")
+        if bar.date <= self.last_date:
+            raise ValueError(f"Bars must arrive in time order: {bar.date} is not after {self.last_date}.")
+        update_start = time.perf_counter()
+        with stage_timer("live_update"):
+            self._add_return(bar.close / self.last_close - 1.0)
+            self.last_date, self.last_close = bar.date, bar.close
+            indicators = self._indicators(bar.close)
+            # A bar spent in a position marks it to one simulated next-bar return
+            sampled_return = 0.0
+            if self.position != 0:
+                uniform = self._trade_draws.random()
+                sampled_return = float(self.sorted_returns[int(uniform * len(self.sorted_returns))])
+            (self.position, self.entry_price, self.position_size, self.portfolio_value,
+             code, event_price, event_value) = trade_step(
+                bar.close, True, *indicators.tolist(), sampled_return, self.position, self.entry_price,
+                self.position_size, self.portfolio_value, float(self.initial_capital),
+                float(self.take_profit_pct or 0.0), float(self.stop_loss_pct or 0.0),
+                float(self.entry_threshold_factor), float(self.exit_threshold_factor))
+        record_trials("live_backtester", self.num_trials, time.perf_counter() - update_start)
+        self.bars += 1
+
+        event = None
+        if code >= 0:
+            event = EVENT_NAMES[code]
+            if code in (ENTRY_LONG, ENTRY_SHORT):
+                self.trade_log.append({"date": bar.date, "event": event, "price": event_price, "position_size": event_value})
+            else:
+                self.trade_log.append({"date": bar.date, "event": event, "price": event_price, "pnl": event_value})
+            _trace.debug("%s at %.4f on %s", event, event_price, bar.date, event=event, price=event_price)
+        volatility = self.volatility
+        return {
+            "date": bar.date,
+            "close": bar.close,
+            "volatility": volatility if math.isfinite(volatility) else None,
+            **dict(zip(SIP_INDICATOR_COLUMNS, indicators.tolist())),
+            "position": POSITION_NAMES[self.position],
+            "event": event,
+            "portfolio_value": self.portfolio_value,
+        }
+
+    def run(self, source: Iterable[Bar]) -> Iterator[dict]:
+        """Feeds the source's bars through update, yielding each bar's signal as it is made."""
+        for bar in source:
+            yield self.update(bar)
+
+    def results(self) -> dict:
+        """The session so far, in BacktesterSimulator.simulate_trade's shape."""
+        return {
+            "final_portfolio_value": self.portfolio_value,
+            "total_pnl": self.portfolio_value - self.initial_capital,
+            "trade_log": self.trade_log,
+            "position": POSITION_NAMES[self.position],
+            "bars": self.bars,
+            "seed": self.seed,
+        }
@@ -1,14 +1,19 @@
-import httpx
+import asyncio
+import base64
+import json
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
 from fastapi import FastAPI, File, UploadFile, Request, HTTPException, Depends, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm # New import
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 
-import numpy as np
-import pandas as pd
-import yfinance as yf
 import os
 import shutil
 from datetime import datetime, timedelta
@@ -17,25 +22,69 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from sip_backtester import run_sip_simulation, DISTRIBUTIONS
-from backtester import BacktesterSimulator, SIP, SLURP # Renamed import
-from strategy_optimiser import StrategyOptimiser
-
-
-
-from scipy.stats import norm, uniform, lognorm, beta
-from database import SessionLocal, engine # New import
+from lazy_import import LazyModule
+from symbol_index import get_symbol_index
+from ttl_cache import TTLCache
+from single_flight import SingleFlight
+from admission import AdmissionController, AdmissionRejected, estimate_cost
+from convergence import ADAPTIVE_MAX_TRIALS, batch_size, is_adaptive
+from memory_planner import track_peak
+from responses import CompressionMiddleware, FastJSONResponse, dumps as dumps_json
+import metrics
+import profiling
+from metrics import stage_timer
+from tracing import get_tracer, trace_run
+from starlette.routing import Match
+from database import SessionLocal # New import
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError # New import
 import models, auth_utils # New import
+from migrate import run_migrations
+
+# Heavy dependencies are imported on first use (or by the optional warm-up) rather than at startup
+pd = LazyModule("pandas")
+yf = LazyModule("yfinance")
+httpx = LazyModule("httpx")
+sip_engine = LazyModule("sip_backtester")
+backtest_engine = LazyModule("backtester")
+optimiser_engine = LazyModule("strategy_optimiser")
+portfolio_engine = LazyModule("portfolio_backtester")
+turtle_engine = LazyModule("turtle_backtester")
+random_streams = LazyModule("random_streams")
+feature_store = LazyModule("feature_store")
+
+# Local development creates the schema on startup; deployments run `python migrate.py` instead
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "1") == "1"
+# Pre-load the engines in a background thread shortly after startup
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "0") == "1"
+WARMUP_DELAY_SECONDS = float(os.environ.get("WARMUP_DELAY_SECONDS", 1.0))
 
 # Create uploads directory if it doesn't exist
 UPLOADS_DIR = "uploads"
 if not os.path.exists(UPLOADS_DIR):
     os.makedirs(UPLOADS_DIR)
 
-models.Base.metadata.create_all(bind=engine) # New line
-
-app = FastAPI()
+# Handlers for large simulation payloads return FastJSONResponse directly to skip jsonable_encoder
+app = FastAPI(default_response_class=FastJSONResponse)
+# Added before the @app.middleware hooks below, so it runs innermost and sees the endpoint label
+app.add_middleware(CompressionMiddleware)
+
+def _warm_up():
+    """Imports the engines and runs a tiny fit so the first real request does not pay for them."""
+    with stage_timer("warmup", endpoint="startup"):
+        for module in (pd, yf, httpx, sip_engine, backtest_engine, optimiser_engine, portfolio_engine, turtle_engine):
+            module.load()
+        sip_engine.run_sip_simulation_batch({"warmup": pd.Series([float(i) for i in range(1, 31)])}, num_trials=100)
+
+@app.on_event("startup")
+async def on_startup():
+    if RUN_MIGRATIONS_ON_STARTUP:
+        await run_migrations()
+    if WARMUP_ON_STARTUP:
+        # Started after a delay so the server binds its port and serves requests meanwhile
+        warmup_thread = threading.Thread(target=_warm_up, name="warmup", daemon=True)
+        asyncio.get_running_loop().call_later(WARMUP_DELAY_SECONDS, warmup_thread.start)
 
 @app.middleware("http")
 async def add_cors_header(request: Request, call_next):
@@ -49,6 +98,71 @@ async def add_cors_header(request: Request, call_next):
         response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
     return response
 
+@lru_cache(maxsize=1024)
+def _route_template(method: str, path: str) -> str:
+    """Maps a concrete request path to its route template so metric labels stay low-cardinality."""
+    scope = {"type": "http", "method": method, "path": path}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    endpoint = _route_template(request.method, request.url.path)
+    token = metrics.current_endpoint.set(endpoint)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, endpoint, request.method, str(status_code))
+        metrics.current_endpoint.reset(token)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+async def profile_request(request: Request, call_next):
+    # Header only: a query parameter would leave the admin token in access logs and proxies
+    token = request.headers.get(profiling.PROFILE_HEADER)
+    if not profiling.is_authorized(token):
+        return await call_next(request)
+    with profiling.RequestProfile(label=f"{request.method} {request.url.path}") as profile:
+        response = await call_next(request)
+    if profile.active:
+        response.headers["X-Profile-Id"] = profile.request_id
+    return response
+
+# Only installed when an admin token is configured, so requests pay nothing when profiling is off
+if profiling.PROFILING_ADMIN_TOKEN:
+    app.middleware("http")(profile_request)
+
+def _profile_file(request_id: str, suffix: str, token: Optional[str]) -> str:
+    if not profiling.is_authorized(token):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the admin token is invalid.")
+    path = profiling.profile_path(request_id, suffix)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return path
+
+@app.get("/api/profiles/{request_id}")
+async def get_profile_summary(request: Request, request_id: str):
+    """Call-count and timing summary of a profiled request, including SIP/SLURP and engine functions."""
+    path = _profile_file(request_id, "json", request.headers.get(profiling.PROFILE_HEADER))
+    with open(path) as f:
+        return json.load(f)
+
+@app.get("/api/profiles/{request_id}/collapsed")
+async def get_profile_collapsed_stacks(request: Request, request_id: str):
+    """Collapsed stacks of a profiled request, ready for flamegraph.pl or speedscope."""
+    path = _profile_file(request_id, "collapsed", request.headers.get(profiling.PROFILE_HEADER))
+    with open(path) as f:
+        return PlainTextResponse(f.read())
+
 
 
 
@@ -56,22 +170,39 @@ async def add_cors_header(request: Request, call_next):
 class TickerValidationRequest(BaseModel):
     ticker: str
 
+# Validation results are cached; negative results expire sooner so newly listed symbols are picked up
+VALID_TICKER_TTL_SECONDS = 24 * 3600
+INVALID_TICKER_TTL_SECONDS = 3600
+ticker_validation_cache = TTLCache(ttl_seconds=VALID_TICKER_TTL_SECONDS, name="ticker_validation")
+
+def _validate_ticker_online(ticker_symbol: str) -> bool:
+    ticker = yf.Ticker(ticker_symbol)
+    # Check if the ticker has info
+    if ticker.info:
+        return True
+    # If no info, try to download a small amount of data
+    hist = ticker.history(period="1d")
+    return not hist.empty
+
 @app.post("/validate_ticker")
 async def validate_ticker(request: TickerValidationRequest):
+    ticker_symbol = request.ticker.strip().upper()
+    if not ticker_symbol:
+        return {"is_valid": False}
+    if ticker_symbol in get_symbol_index():
+        return {"is_valid": True}
+
+    cached = ticker_validation_cache.get(ticker_symbol)
+    if cached is not None:
+        return {"is_valid": cached}
+
+    # Symbols outside the local index fall back to a single yfinance lookup
     try:
-        ticker = yf.Ticker(request.ticker)
-        # Check if the ticker has info
-        if ticker.info:
-            return {"is_valid": True}
-        else:
-            # If no info, try to download a small amount of data
-            hist = ticker.history(period="1d")
-            if not hist.empty:
-                return {"is_valid": True}
-            else:
-                return {"is_valid": False}
+        is_valid = await asyncio.to_thread(profiling.run_profiled, _validate_ticker_online, ticker_symbol)
     except Exception as e:
-        return {"is_valid": False}
+        is_valid = False
+    ticker_validation_cache.set(ticker_symbol, is_valid, ttl_seconds=VALID_TICKER_TTL_SECONDS if is_valid else INVALID_TICKER_TTL_SECONDS)
+    return {"is_valid": is_valid}
 
 @app.post("/uploadfile/")
 async def create_upload_file(file: UploadFile = File(...)):
@@ -90,7 +221,7 @@ async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
-        headers={"Access-Control-Allow-Origin": "*"},
+        headers={**(exc.headers or {}), "Access-Control-Allow-Origin": "*"},
     )
 
 @app.options("/{full_path:path}")
@@ -103,10 +234,13 @@ class UserCreate(BaseModel):
     password: str
     registration_code: str
 
-class UserInDB(UserCreate):
+class UserInDB(BaseModel):
     id: int
+    email: str
     is_active: bool
 
+    model_config = {"from_attributes": True}
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -117,19 +251,41 @@ class SimulationParams(BaseModel):
     mode: str
     distribution_name: str = "Normal" # New field
 
-class SimulationRequest(BaseModel):
+class AdaptiveParams(BaseModel):
+    """
+    Adaptive mode for the Monte Carlo engines: trials are added until the results are within
+    `tolerance` (relative 95% CI half-width) or the time budget runs out, up to max_trials.
+    Results near zero have no meaningful relative error; they also count as converged once their
+    half-width is within abs_tolerance, in the result's own units.
+    """
+    tolerance: Optional[float] = None
+    abs_tolerance: Optional[float] = None
+    time_budget_seconds: Optional[float] = None
+    max_trials: Optional[int] = None
+
+class SimulationRequest(AdaptiveParams):
     file_path: str
     column_name: Optional[str] = None
     distribution_name: str = "Normal" # New field
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
 
-class TickerSimulationRequest(BaseModel):
+class TickerSimulationRequest(AdaptiveParams):
     ticker: str
     years: int = 5
     distribution_name: str = "Normal" # New field
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
+
+class BatchTickerSimulationRequest(BaseModel):
+    tickers: List[str]
+    years: int = 5
+    distribution_name: str = "Normal"
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
 
 class TickerSearchRequest(BaseModel):
     query: str
 
+TICKER_SEARCH_LIMIT = 10
+
 class TickerSearchResult(BaseModel):
     ticker: str
     name: str
@@ -137,7 +293,7 @@ class TickerSearchResult(BaseModel):
 class ChatRequest(BaseModel):
     prompt: str
 
-class BacktesterSimulationRequest(BaseModel):
+class BacktesterSimulationRequest(AdaptiveParams):
     ticker: str
     years: int = 5
     take_profit_pct: Optional[float] = None
@@ -152,27 +308,84 @@ class BacktesterSimulationRequest(BaseModel):
     exit_short_percentile: float = 0.75
     entry_threshold_factor: float = 1.005
     exit_threshold_factor: float = 0.995
+    variance_reduction: str = "none" # "none", "antithetic", "control_variate" or "sobol"
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
+    debug_trace: bool = False # Attach the engine's trace events to the response
 
 
-class StrategyOptimiserRequest(BaseModel):
+class StrategyOptimiserRequest(AdaptiveParams):
     ticker: str
     years: int = 5
     num_simulations: int = 1000 # User can pick number of simulations from 1000 upwards
-    volatility_lookback_days: int = 20
+    # One lookback, or a list swept together: every lookback's strategies are simulated on the same
+    # paths over forecast_horizon days and ranked against each other
+    volatility_lookback_days: Union[int, List[int]] = 20
+    forecast_horizon: Optional[int] = None # Days simulated per path; the (first listed) lookback when omitted
     return_distribution_percentiles: List[float] = [0.05, 0.1, 0.25, 0.75, 0.9, 0.95] # Added 0.1 and 0.9
     strategy_count: int = 5 # Number of strategies to generate and rank
+    variance_reduction: str = "none" # "none", "antithetic", "control_variate" or "sobol"
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
+    debug_trace: bool = False # Attach the engine's trace events to the response
+
+class PortfolioSimulationRequest(BaseModel):
+    tickers: List[str]
+    years: int = 5
+    num_trials: int = 10000
+    forecast_horizon: int = 20
+    initial_capital: float = 100000
+    allocation: str = "equal" # "equal" or "inverse_volatility"
+    allow_short: bool = True
+    take_profit_pct: Optional[float] = None
+    stop_loss_pct: Optional[float] = None
+    entry_long_percentile: float = 0.75
+    entry_short_percentile: float = 0.25
+    exit_long_percentile: float = 0.25
+    exit_short_percentile: float = 0.75
+    transaction_cost_bps: float = 0.0
+    # "dense" correlates the assets through the full covariance; "factor" through num_factors principal
+    # components plus each asset's own risk, which draws far faster for portfolios of hundreds of tickers
+    covariance_model: str = "dense"
+    num_factors: Optional[int] = None # Factor model only; SLURP_DEFAULT_NUM_FACTORS by default
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
+    debug_trace: bool = False # Attach the engine's trace events to the response
+
+class TurtleSimulationRequest(BaseModel):
+    ticker: str
+    years: int = 5
+    system: int = 1 # 1: 20-day breakouts with the winner filter, 10-day exits; 2: 55-day breakouts, 20-day exits
+    entry_window: Optional[int] = None # Overrides the system's breakout windows
+    exit_window: Optional[int] = None
+    initial_capital: float = 100000
+    risk_per_unit_pct: float = 0.02 # Equity lost when a unit's 2N stop is hit
+    max_units: int = 4
+    allow_short: bool = True
+    num_trials: int = 10000 # Monte Carlo resamples of the trade sequence
+    seed: Optional[int] = None # Reproduces an earlier run; a fresh seed is drawn, and returned, when omitted
+    debug_trace: bool = False # Attach the engine's trace events to the response
+
+class TurtleSweepRequest(BaseModel):
+    tickers: List[str]
+    years: int = 5
+    system: int = 1
+    entry_windows: List[int] = [20, 40, 55]
+    exit_windows: List[int] = [10, 20] # Pairs run where the exit window is shorter than the entry window
+    initial_capital: float = 100000
+    risk_per_unit_pct: float = 0.02
+    max_units: int = 4
+    allow_short: bool = True
 
 
 
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# OpenRouter API endpoint and model; the base URL can point at a local stub for load testing
+OPENROUTER_API_BASE = os.environ.get("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
+OPENROUTER_MODEL = os.environ.get("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct")
 
 # --- Helper Functions ---
 async def get_ai_recommendation(prompt: str) -> str:
@@ -181,10 +394,6 @@ async def get_ai_recommendation(prompt: str) -> str:
     if not api_key:
         raise HTTPException(status_code=500, detail="OPENROUTER_API_KEY environment variable not set.")
 
-    # OpenRouter API endpoint and model (can be configured)
-    OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
-    OPENROUTER_MODEL = "mistralai/mistral-7b-instruct" # Example model, can be changed
-
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
@@ -199,12 +408,13 @@ async def get_ai_recommendation(prompt: str) -> str:
 
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{OPENROUTER_API_BASE}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60.0 # Add a timeout for the request
-            )
+            with stage_timer("llm_call"):
+                response = await client.post(
+                    f"{OPENROUTER_API_BASE}/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=60.0 # Add a timeout for the request
+                )
             response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
             
             llm_response = response.json()
@@ -222,10 +432,212 @@ async def get_ai_recommendation(prompt: str) -> str:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
+_trace = get_tracer("api")
+
+# Identical concurrent provider downloads and engine runs share one in-flight computation
+download_flight = SingleFlight("download")
+engine_flight = SingleFlight("engine")
+
+# Backtester and optimiser runs are admitted against a global cost budget (trials x horizon x bars)
+# and a per-user concurrency limit; excess runs queue briefly, then get 429 with Retry-After
+engine_admission = AdmissionController(
+    "engine",
+    cost_budget=int(float(os.environ.get("ADMISSION_COST_BUDGET", 2.5e8))),
+    per_user_limit=int(os.environ.get("ADMISSION_PER_USER_CONCURRENCY", 2)),
+    max_queue_depth=int(os.environ.get("ADMISSION_MAX_QUEUE_DEPTH", 32)),
+    max_queue_wait_seconds=float(os.environ.get("ADMISSION_MAX_QUEUE_WAIT_SECONDS", 30)),
+)
+
+def _history_key(ticker: str, start_date: datetime, end_date: datetime) -> tuple:
+    """Normalizes a download request; daily bars only depend on the dates, not the times."""
+    return (ticker.strip().upper(), start_date.date().isoformat(), end_date.date().isoformat())
+
+def _engine_key(engine_name: str, history_key: tuple, request: BaseModel, exclude: set) -> tuple:
+    params = request.model_dump(exclude={"ticker", "years", *exclude})
+    return (engine_name, history_key, json.dumps(params, sort_keys=True))
+
+def _download_history(ticker: str, start_date: datetime, end_date: datetime) -> "pd.DataFrame":
+    with stage_timer("download"):
+        return yf.download(ticker, start=start_date, end=end_date, progress=False)
+
+async def fetch_history(ticker: str, start_date: datetime, end_date: datetime) -> "pd.DataFrame":
+    """Downloads price history in the worker pool, sharing the download with identical concurrent requests."""
+    history_key = _history_key(ticker, start_date, end_date)
+    data = await download_flight.run(history_key, profiling.run_profiled, _download_history, history_key[0], start_date, end_date)
+    return data.copy() # Each caller gets its own frame to slice and modify
+
+def _adaptive_params(request: AdaptiveParams) -> dict:
+    return {"tolerance": request.tolerance, "abs_tolerance": request.abs_tolerance,
+            "time_budget_seconds": request.time_budget_seconds, "max_trials": request.max_trials}
+
+def _admitted_request(request: AdaptiveParams, horizon: int, bars: int):
+    """
+    Returns the request and the trials to admit it for. Adaptive runs are admitted at their trial
+    cap (max_trials, or ADAPTIVE_MAX_TRIALS), lowered to what fits the engine cost budget. A run
+    whose first batch alone would not fit is rejected as too large, like a fixed-count run would be.
+    """
+    if not is_adaptive(request.tolerance, request.time_budget_seconds):
+        return request, None
+    trial_cost = estimate_cost(1, horizon, bars)
+    try:
+        engine_admission.check_size(batch_size() * trial_cost)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    max_trials = min(request.max_trials or ADAPTIVE_MAX_TRIALS, engine_admission.cost_budget // trial_cost)
+    return request.model_copy(update={"max_trials": max_trials}), max_trials
+
+@contextmanager
+def _track_engine_peak(engine: LazyModule):
+    """track_peak around an engine run, with the engine imported first so its import is not measured."""
+    engine.load()
+    with track_peak() as usage:
+        yield usage
+
+def _simulate_price_series(ticker: str, data: "pd.Series", distribution_name: str, adaptive_params: Optional[dict] = None,
+                           seed: Optional[int] = None) -> dict:
+    """Runs the SIP engine on a downloaded price series via a temporary CSV."""
+    temp_file_path = os.path.join(UPLOADS_DIR, f"{ticker}_{uuid.uuid4().hex}_temp_data.csv")
+    data.to_csv(temp_file_path)
+    try:
+        column_to_use = data.name if hasattr(data, 'name') else data.columns[0]
+        return sip_engine.run_sip_simulation(temp_file_path, column_to_use, distribution_name, **(adaptive_params or {}), seed=seed)
+    finally:
+        os.remove(temp_file_path)
+
+def _run_backtester(historical_data: "pd.DataFrame", request: BacktesterSimulationRequest) -> dict:
+    features = feature_store.store.update(request.ticker, historical_data)
+    # The indicator build runs in the constructor, so measure construction too
+    with _track_engine_peak(backtest_engine) as usage:
+        simulator = backtest_engine.BacktesterSimulator(
+            historical_data=historical_data,
+            num_trials=request.num_trials,
+            take_profit_pct=request.take_profit_pct,
+            stop_loss_pct=request.stop_loss_pct,
+            use_slurp=request.use_slurp,
+            slurp_columns=request.slurp_columns,
+            forecast_horizon=request.forecast_horizon,
+            entry_long_percentile=request.entry_long_percentile,
+            entry_short_percentile=request.entry_short_percentile,
+            exit_long_percentile=request.exit_long_percentile,
+            exit_short_percentile=request.exit_short_percentile,
+            entry_threshold_factor=request.entry_threshold_factor,
+            exit_threshold_factor=request.exit_threshold_factor,
+            variance_reduction=request.variance_reduction,
+            **_adaptive_params(request),
+            seed=request.seed,
+            features=features,
+        )
+        results = simulator.simulate_trade()
+    results["memory"] = usage.report(simulator.memory_plan)
+    return results
+
+def _run_optimiser(historical_data: "pd.DataFrame", request: StrategyOptimiserRequest) -> dict:
+    features = feature_store.store.update(request.ticker, historical_data)
+    with _track_engine_peak(optimiser_engine) as usage:
+        optimiser = optimiser_engine.StrategyOptimiser(
+            historical_data=historical_data,
+            num_simulations=request.num_simulations,
+            volatility_lookback_days=request.volatility_lookback_days,
+            forecast_horizon=request.forecast_horizon,
+            return_distribution_percentiles=request.return_distribution_percentiles,
+            strategy_count=request.strategy_count,
+            variance_reduction=request.variance_reduction,
+            **_adaptive_params(request),
+            seed=request.seed,
+            features=features,
+        )
+        results = optimiser.run_optimization()
+    results["memory"] = usage.report(optimiser.memory_plan)
+    return results
+
+def _run_portfolio(prices: "pd.DataFrame", request: PortfolioSimulationRequest) -> dict:
+    with _track_engine_peak(portfolio_engine) as usage:
+        backtester = portfolio_engine.PortfolioBacktester(
+            prices=prices,
+            num_trials=request.num_trials,
+            forecast_horizon=request.forecast_horizon,
+            initial_capital=request.initial_capital,
+            allocation=request.allocation,
+            allow_short=request.allow_short,
+            take_profit_pct=request.take_profit_pct,
+            stop_loss_pct=request.stop_loss_pct,
+            entry_long_percentile=request.entry_long_percentile,
+            entry_short_percentile=request.entry_short_percentile,
+            exit_long_percentile=request.exit_long_percentile,
+            exit_short_percentile=request.exit_short_percentile,
+            transaction_cost_bps=request.transaction_cost_bps,
+            covariance_model=request.covariance_model,
+            num_factors=request.num_factors,
+            seed=request.seed,
+        )
+        results = backtester.simulate()
+    results["memory"] = usage.report(backtester.memory_plan)
+    return results
+
+def _run_turtle(historical_data: "pd.DataFrame", request: TurtleSimulationRequest) -> dict:
+    with _track_engine_peak(turtle_engine) as usage:
+        backtester = turtle_engine.TurtleBacktester(
+            historical_data=historical_data,
+            system=request.system,
+            entry_window=request.entry_window,
+            exit_window=request.exit_window,
+            initial_capital=request.initial_capital,
+            risk_per_unit_pct=request.risk_per_unit_pct,
+            max_units=request.max_units,
+            allow_short=request.allow_short,
+            num_trials=request.num_trials,
+            seed=request.seed,
+        )
+        results = backtester.simulate()
+    results["memory"] = usage.report(backtester.memory_plan)
+    return results
+
+def _run_turtle_sweep(histories: dict, request: TurtleSweepRequest) -> dict:
+    rows = turtle_engine.sweep_windows(
+        histories, request.entry_windows, request.exit_windows,
+        system=request.system,
+        initial_capital=request.initial_capital,
+        risk_per_unit_pct=request.risk_per_unit_pct,
+        max_units=request.max_units,
+        allow_short=request.allow_short,
+    )
+    return {"windows": turtle_engine.summarise_sweep(rows), "results": rows}
+
+async def run_admitted(engine_key: Optional[tuple], user_id: int, cost: int, func, *args):
+    """
+    Runs an engine in the worker pool once admitted. Every caller takes one of its own user's
+    slots before joining a run, so one user's limit never turns away another user's request.
+    Requests joining an identical run already in flight (same engine_key) are not charged its
+    cost again: the run holds the budget once, whoever starts it. Pass engine_key=None to never share.
+    """
+    async def charged_run():
+        async with engine_admission.admit(None, cost):
+            return await asyncio.to_thread(profiling.run_profiled, func, *args)
+
+    try:
+        if engine_key is None:
+            async with engine_admission.admit(user_id, cost):
+                return await asyncio.to_thread(profiling.run_profiled, func, *args)
+        async with engine_admission.admit(user_id, 0):
+            return await engine_flight.run_coroutine(engine_key, charged_run)
+    except AdmissionRejected as e:
+        if e.retry_after is None:
+            raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: SessionLocal = Depends(get_db)):
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    auth_utils.invalidate_cached_user(target.id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UserInDB:
+    """
+    Resolves the bearer token to a user, avoiding the database where possible:
+    a recently verified user is served from the in-process cache, and tokens carrying
+    email/active claims are trusted as-is unless the user has changed since they were issued.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -237,14 +649,29 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: SessionLocal
         payload = auth_utils.decode_access_token(token)
         if payload is None:
             raise credentials_exception
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if user is None:
+        user_id = int(user_id)
+
+        # The cache is cleared whenever the user changes, so cached entries are always current
+        cached_user = auth_utils.get_cached_user(user_id)
+        if cached_user is not None:
+            return cached_user
+        if not auth_utils.token_predates_user_change(user_id, payload.get("iat")):
+            if "email" in payload and "active" in payload:
+                user = UserInDB(id=user_id, email=payload["email"], is_active=payload["active"])
+                auth_utils.cache_user(user_id, user)
+                return user
+
+        # Tokens without claims, or issued before the user last changed
+        db_user = await db.get(models.User, user_id)
+        if db_user is None:
             raise credentials_exception
+        user = UserInDB.model_validate(db_user)
+        auth_utils.cache_user(user_id, user)
         return user
-    except JWTError:
+    except (JWTError, ValueError):
         raise credentials_exception
 
 # --- API Endpoints ---
@@ -254,18 +681,20 @@ async def root():
     return {"message": "Vantage Backend"}
 
 @app.post("/register", response_model=UserInDB)
-async def register_user(user: UserCreate, db: SessionLocal = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     if user.registration_code != "VANTAGE2025":
         raise HTTPException(status_code=400, detail="Invalid registration code")
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    result = await db.execute(select(models.User).where(models.User.email == user.email))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth_utils.get_password_hash(user.password)
+    hashed_password = await auth_utils.get_password_hash_async(user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    with stage_timer("db_write"):
+        await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/chat")
@@ -274,10 +703,6 @@ async def chat_completion(request: ChatRequest):
     if not api_key:
         raise HTTPException(status_code=500, detail="OPENROUTER_API_KEY environment variable not set.")
 
-    # OpenRouter API endpoint and model (can be configured)
-    OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
-    OPENROUTER_MODEL = "mistralai/mistral-7b-instruct" # Example model, can be changed
-
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
@@ -292,12 +717,13 @@ async def chat_completion(request: ChatRequest):
 
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{OPENROUTER_API_BASE}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60.0 # Add a timeout for the request
-            )
+            with stage_timer("llm_call"):
+                response = await client.post(
+                    f"{OPENROUTER_API_BASE}/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=60.0 # Add a timeout for the request
+                )
             response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
             
             llm_response = response.json()
@@ -316,9 +742,10 @@ async def chat_completion(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: SessionLocal = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth_utils.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(models.User).where(models.User.email == form_data.username))
+    user = result.scalars().first()
+    if not user or not await auth_utils.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -326,7 +753,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
     access_token_expires = timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth_utils.create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data={"sub": str(user.id), "email": user.email, "active": user.is_active}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -351,8 +778,9 @@ async def create_upload_file(file: UploadFile = File(...)):
     return {"file_path": file_path, "filename": file.filename}
 
 @app.post("/api/run_simulation/")
-async def run_simulation_from_file(request: SimulationRequest, db: SessionLocal = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    results = run_sip_simulation(request.file_path, request.column_name, request.distribution_name)
+async def run_simulation_from_file(request: SimulationRequest, db: AsyncSession = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
+    results = sip_engine.run_sip_simulation(request.file_path, request.column_name, request.distribution_name,
+                                            **_adaptive_params(request), seed=request.seed)
     
     prompt = f"""Based on the following Monte Carlo simulation results, provide a comprehensive investment recommendation for a user with a moderate risk tolerance.
 
@@ -379,23 +807,25 @@ Keep the response practical and actionable for an investor."""
         user_id=current_user.id,
         simulation_mode="file",
         simulation_params=request.dict(),
+        seed=results.get('seed'),
         summary_stats=results['summary_stats'],
         ai_recommendation=ai_recommendation,
     )
     db.add(db_simulation)
-    db.commit()
+    with stage_timer("db_write"):
+        await db.commit()
 
     results['ai_recommendation'] = ai_recommendation
-    return results
+    return FastJSONResponse(results)
 
 @app.post("/api/run_ticker_simulation/")
-async def run_ticker_simulation(request: TickerSimulationRequest, db: SessionLocal = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def run_ticker_simulation(request: TickerSimulationRequest, db: AsyncSession = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
     try:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365 * request.years)
         
         # Download data
-        data = yf.download(request.ticker, start=start_date, end=end_date)
+        data = await fetch_history(request.ticker, start_date, end_date)
         if 'Adj Close' in data.columns:
             data = data['Adj Close']
         elif 'Close' in data.columns:
@@ -405,16 +835,12 @@ async def run_ticker_simulation(request: TickerSimulationRequest, db: SessionLoc
         if data.empty:
             return {"error": f"Could not fetch historical data for ticker {request.ticker}."}
         
-        # Save to a temporary file
-        temp_file_path = os.path.join(UPLOADS_DIR, f"{request.ticker}_temp_data.csv")
-        data.to_csv(temp_file_path)
-        
-        # Run simulation
-        column_to_use = data.name if hasattr(data, 'name') else data.columns[0]
-        results = run_sip_simulation(temp_file_path, column_to_use, request.distribution_name)
-        
-        # Clean up temp file
-        os.remove(temp_file_path)
+        # Run simulation (shared with identical requests in flight)
+        adaptive_params = _adaptive_params(request)
+        engine_key = ("sip", _history_key(request.ticker, start_date, end_date), request.distribution_name,
+                      json.dumps(adaptive_params, sort_keys=True), request.seed)
+        results = dict(await engine_flight.run(engine_key, profiling.run_profiled, _simulate_price_series, request.ticker, data,
+                                               request.distribution_name, adaptive_params, request.seed))
 
         prompt = f"""Based on the following Monte Carlo simulation results, provide a comprehensive investment recommendation for a user with a moderate risk tolerance.
 
@@ -442,36 +868,33 @@ Keep the response practical and actionable for an investor considering {request.
             user_id=current_user.id,
             simulation_mode="ticker",
             simulation_params=request.dict(),
+            seed=results.get('seed'),
             summary_stats=results['summary_stats'],
             ai_recommendation=ai_recommendation,
         )
         db.add(db_simulation)
-        db.commit()
+        with stage_timer("db_write"):
+            await db.commit()
 
         results['ai_recommendation'] = ai_recommendation
         
-        return results
+        return FastJSONResponse(results)
     except Exception as e:
         return {"error": f"An error occurred: {str(e)}"}
 
 
 
 @app.post("/users/me/", response_model=UserInDB)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
     return current_user
 
 @app.post("/api/search_tickers/", response_model=List[TickerSearchResult])
 async def search_tickers(request: TickerSearchRequest):
+    """Ranked ticker completions from the local symbol index; no network access."""
     try:
-        # Attempt to get ticker info. This is a basic validation/search.
-        # For a more comprehensive search, a dedicated API would be better.
-        ticker_info = yf.Ticker(request.query).info
-        if ticker_info and 'longName' in ticker_info and 'symbol' in ticker_info:
-            return [{"ticker": ticker_info['symbol'], "name": ticker_info['longName']}]
-        else:
-            return []
+        matches = get_symbol_index().search(request.query, limit=TICKER_SEARCH_LIMIT)
+        return [{"ticker": match["ticker"], "name": match["name"]} for match in matches]
     except Exception as e:
-        # If yfinance can't find it, it's likely not a valid ticker or there's an issue.
         print(f"Ticker search failed for {request.query}: {e}")
         return []
 
@@ -482,7 +905,8 @@ async def search_tickers(request: TickerSearchRequest):
 async def simple_file_simulation(request: SimulationRequest):
     """Simplified file simulation without authentication but with AI recommendations"""
     try:
-        results = run_sip_simulation(request.file_path, request.column_name, request.distribution_name)
+        results = sip_engine.run_sip_simulation(request.file_path, request.column_name, request.distribution_name,
+                                                **_adaptive_params(request), seed=request.seed)
         
         prompt = f"""Based on the following Monte Carlo simulation results, provide a comprehensive investment recommendation for a user with a moderate risk tolerance.
 
@@ -507,7 +931,7 @@ Keep the response practical and actionable for an investor."""
         ai_recommendation = await get_ai_recommendation(prompt)
         results['ai_recommendation'] = ai_recommendation
         
-        return results
+        return FastJSONResponse(results)
     except Exception as e:
         return {"error": f"An error occurred: {str(e)}"}
 
@@ -519,7 +943,7 @@ async def simple_ticker_simulation(request: TickerSimulationRequest):
         start_date = end_date - timedelta(days=365 * request.years)
         
         # Download data
-        data = yf.download(request.ticker, start=start_date, end=end_date)
+        data = await fetch_history(request.ticker, start_date, end_date)
         if 'Adj Close' in data.columns:
             data = data['Adj Close']
         elif 'Close' in data.columns:
@@ -529,16 +953,12 @@ async def simple_ticker_simulation(request: TickerSimulationRequest):
         if data.empty:
             return {"error": f"Could not fetch historical data for ticker {request.ticker}."}
         
-        # Save to a temporary file
-        temp_file_path = os.path.join(UPLOADS_DIR, f"{request.ticker}_temp_data.csv")
-        data.to_csv(temp_file_path)
-        
-        # Run simulation
-        column_to_use = data.name if hasattr(data, 'name') else data.columns[0]
-        results = run_sip_simulation(temp_file_path, column_to_use, request.distribution_name)
-        
-        # Clean up temp file
-        os.remove(temp_file_path)
+        # Run simulation (shared with identical requests in flight)
+        adaptive_params = _adaptive_params(request)
+        engine_key = ("sip", _history_key(request.ticker, start_date, end_date), request.distribution_name,
+                      json.dumps(adaptive_params, sort_keys=True), request.seed)
+        results = dict(await engine_flight.run(engine_key, profiling.run_profiled, _simulate_price_series, request.ticker, data,
+                                               request.distribution_name, adaptive_params, request.seed))
         
         prompt = f"""Based on the following Monte Carlo simulation results, provide a comprehensive investment recommendation for a user with a moderate risk tolerance.
 
@@ -564,18 +984,96 @@ Keep the response practical and actionable for an investor considering {request.
         ai_recommendation = await get_ai_recommendation(prompt)
         results['ai_recommendation'] = ai_recommendation
         
-        return results
+        return FastJSONResponse(results)
     except Exception as e:
         return {"error": f"An error occurred: {str(e)}"}
 
+# Upper bound on tickers per batch request and on concurrent yfinance downloads per batch
+BATCH_MAX_TICKERS = 500
+BATCH_DOWNLOAD_CONCURRENCY = 8
+
+def _close_series(data: "pd.DataFrame") -> "pd.Series":
+    """Returns the Adj Close (or Close) series of a download, empty if neither is present."""
+    if 'Adj Close' in data.columns:
+        data = data['Adj Close']
+    elif 'Close' in data.columns:
+        data = data['Close']
+    else:
+        return pd.Series(dtype=float)
+    if isinstance(data, pd.DataFrame):
+        data = data.squeeze(axis=1)
+    return data.dropna()
+
+@app.post("/api/batch_ticker_simulation")
+async def batch_ticker_simulation(request: BatchTickerSimulationRequest):
+    """
+    Runs the ticker simulation for a list of tickers and streams one NDJSON line per ticker.
+    Downloads run through the worker pool, at most BATCH_DOWNLOAD_CONCURRENCY at a time and shared
+    with identical downloads of other requests; whenever downloads complete, every series that
+    has arrived is fitted and sampled together in one vectorized pass and its summary is streamed.
+    No AI recommendation is generated per ticker.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in request.tickers if t and t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required.")
+    if len(tickers) > BATCH_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TICKERS} tickers can be simulated per request.")
+    if request.distribution_name not in sip_engine.DISTRIBUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported distribution: {request.distribution_name}. Available distributions are: {', '.join(sip_engine.DISTRIBUTIONS.keys())}")
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=365 * request.years)
+    semaphore = asyncio.Semaphore(BATCH_DOWNLOAD_CONCURRENCY)
+    try:
+        # One seed for the request: each ticker's trials come from its own stream of it, whichever group it is sampled in
+        seed = random_streams.RandomStreams(request.seed).seed
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def fetch(ticker: str):
+        async with semaphore:
+            try:
+                return ticker, _close_series(await fetch_history(ticker, start_date, end_date)), None
+            except Exception as e:
+                return ticker, None, str(e)
+
+    endpoint = metrics.current_endpoint.get()
+
+    async def stream_results():
+        # The body streams after the middleware has returned, so restore the endpoint label here
+        metrics.current_endpoint.set(endpoint)
+        pending = {asyncio.create_task(fetch(ticker)) for ticker in tickers}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                series_by_ticker = {}
+                for task in done:
+                    ticker, series, error = task.result()
+                    if error is not None or series is None or series.empty:
+                        line = {"ticker": ticker, "summary_stats": None,
+                                "error": f"Could not fetch historical data for ticker {ticker}." if error is None else f"An error occurred: {error}"}
+                        yield dumps_json(line) + b"\n"
+                    else:
+                        series_by_ticker[ticker] = series
+                if series_by_ticker:
+                    batch_results = await asyncio.to_thread(profiling.run_profiled, sip_engine.run_sip_simulation_batch, series_by_ticker,
+                                                            request.distribution_name, seed=seed)
+                    for ticker, result in batch_results.items():
+                        yield dumps_json({"ticker": ticker, **result}) + b"\n"
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.post("/api/run_backtester_simulation/")
-async def run_backtester_simulation(request: BacktesterSimulationRequest, db: SessionLocal = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def run_backtester_simulation(request: BacktesterSimulationRequest, db: AsyncSession = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
     try:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365 * request.years)
         
         # Download data
-        data = yf.download(request.ticker, start=start_date, end=end_date)
+        data = await fetch_history(request.ticker, start_date, end_date)
         if 'Adj Close' in data.columns:
             historical_data = data[['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']]
             historical_data['Close'] = historical_data['Adj Close'] # Use Adj Close as primary Close
@@ -587,25 +1085,16 @@ async def run_backtester_simulation(request: BacktesterSimulationRequest, db: Se
         if historical_data.empty:
             raise HTTPException(status_code=400, detail=f"Could not fetch historical data for ticker {request.ticker}.")
 
-        # Initialize the simulator
-        simulator = BacktesterSimulator(
-            historical_data=historical_data,
-            num_trials=request.num_trials,
-            take_profit_pct=request.take_profit_pct,
-            stop_loss_pct=request.stop_loss_pct,
-            use_slurp=request.use_slurp,
-            slurp_columns=request.slurp_columns,
-            forecast_horizon=request.forecast_horizon,
-            entry_long_percentile=request.entry_long_percentile,
-            entry_short_percentile=request.entry_short_percentile,
-            exit_long_percentile=request.exit_long_percentile,
-            exit_short_percentile=request.exit_short_percentile,
-            entry_threshold_factor=request.entry_threshold_factor,
-            exit_threshold_factor=request.exit_threshold_factor
-        )
-
-        # Run the simulation
-        simulation_results = simulator.simulate_trade()
+        # Run the simulation once admitted; identical untraced requests in flight share one run
+        request, adaptive_trials = _admitted_request(request, request.forecast_horizon, len(historical_data))
+        cost = estimate_cost(adaptive_trials or request.num_trials, request.forecast_horizon, len(historical_data))
+        if request.debug_trace:
+            with trace_run() as trace:
+                simulation_results = await run_admitted(None, current_user.id, cost, _run_backtester, historical_data, request)
+        else:
+            trace = None
+            engine_key = _engine_key("backtester", _history_key(request.ticker, start_date, end_date), request, {"debug_trace"})
+            simulation_results = dict(await run_admitted(engine_key, current_user.id, cost, _run_backtester, historical_data, request))
 
         # Generate AI recommendation
         prompt = f"""Based on the following backtester simulation results for {request.ticker}, provide a comprehensive analysis and investment recommendation.
@@ -639,6 +1128,8 @@ Please provide:
 Keep the response practical and actionable for an investor."""
         ai_recommendation = await get_ai_recommendation(prompt)
         simulation_results['ai_recommendation'] = ai_recommendation
+        if trace is not None:
+            simulation_results['trace'] = trace.to_list()
 
         # Store simulation results in DB (optional, based on models.py)
         # db_simulation = models.Simulation(
@@ -651,10 +1142,12 @@ Keep the response practical and actionable for an investor."""
         # db.add(db_simulation)
         # db.commit()
 
-        return simulation_results
+        return FastJSONResponse(simulation_results)
 
     except HTTPException as e:
         raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         full_traceback = traceback.format_exc()
@@ -670,7 +1163,7 @@ Keep the response practical and actionable for an investor."""
         start_date = end_date - timedelta(days=365 * request.years)
 
         # Download data
-        data = yf.download(request.ticker, start=start_date, end=end_date)
+        data = await fetch_history(request.ticker, start_date, end_date)
         if 'Adj Close' in data.columns:
             historical_data = data[['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']]
             historical_data['Close'] = historical_data['Adj Close'] # Use Adj Close as primary Close
@@ -745,18 +1238,15 @@ Keep the response practical and actionable for an investor.
         print(f"ERROR: Full Traceback for 500 error:\n{full_traceback}") # DEBUG
         raise HTTPException(status_code=500, detail=f"An error occurred during advanced backtesting: {str(e)}")
 
-@app.get("/api/simulations/")
-async def get_simulations(db: SessionLocal = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Simulation).filter(models.User.id == current_user.id).all()
 
 @app.post("/api/optimise_strategy/")
-async def optimise_strategy(request: StrategyOptimiserRequest, db: SessionLocal = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def optimise_strategy(request: StrategyOptimiserRequest, db: AsyncSession = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
     try:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365 * request.years)
 
         # Download data
-        data = yf.download(request.ticker, start=start_date, end=end_date)
+        data = await fetch_history(request.ticker, start_date, end_date)
         if 'Adj Close' in data.columns:
             historical_data = data[['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']]
             historical_data['Close'] = historical_data['Adj Close'] # Use Adj Close as primary Close
@@ -768,17 +1258,21 @@ async def optimise_strategy(request: StrategyOptimiserRequest, db: SessionLocal
         if historical_data.empty:
             raise HTTPException(status_code=400, detail=f"Could not fetch historical data for ticker {request.ticker}.")
 
-        # Initialize the StrategyOptimiser
-        optimiser = StrategyOptimiser(
-            historical_data=historical_data,
-            num_simulations=request.num_simulations,
-            volatility_lookback_days=request.volatility_lookback_days,
-            return_distribution_percentiles=request.return_distribution_percentiles,
-            strategy_count=request.strategy_count
-        )
-
-        # Run the optimisation and get ranked strategies
-        optimisation_results = optimiser.run_optimization()
+        # Run the optimisation once admitted; identical untraced requests in flight share one run
+        # Every lookback's strategies share one set of paths over the forecast horizon
+        lookbacks = request.volatility_lookback_days if isinstance(request.volatility_lookback_days, list) else [request.volatility_lookback_days]
+        if not lookbacks:
+            raise HTTPException(status_code=400, detail="At least one volatility lookback is required.")
+        horizon = request.forecast_horizon or lookbacks[0]
+        request, adaptive_trials = _admitted_request(request, horizon, len(historical_data))
+        cost = estimate_cost(adaptive_trials or request.num_simulations, horizon, len(historical_data))
+        if request.debug_trace:
+            with trace_run() as trace:
+                optimisation_results = await run_admitted(None, current_user.id, cost, _run_optimiser, historical_data, request)
+        else:
+            trace = None
+            engine_key = _engine_key("strategy_optimiser", _history_key(request.ticker, start_date, end_date), request, {"debug_trace"})
+            optimisation_results = await run_admitted(engine_key, current_user.id, cost, _run_optimiser, historical_data, request)
 
         # Generate AI recommendation
         prompt = f"""Based on the following ranked trading strategies for {request.ticker}, provide a comprehensive analysis and investment recommendation in the format of "Example Trading Scenarios".
@@ -819,8 +1313,14 @@ Keep the response practical and actionable for an investor. Use the provided `la
         results = {
             "ranked_strategies": optimisation_results["ranked_strategies"],
             "last_close_price": optimisation_results["last_close_price"],
+            "memory": optimisation_results["memory"],
+            "seed": optimisation_results["seed"],
             "ai_recommendation": ai_recommendation
         }
+        if "lookback_summary" in optimisation_results:
+            results["lookback_summary"] = optimisation_results["lookback_summary"]
+        if trace is not None:
+            results["trace"] = trace.to_list()
 
         # Store simulation results in DB (optional, based on models.py)
         # db_simulation = models.Simulation(
@@ -833,10 +1333,12 @@ Keep the response practical and actionable for an investor. Use the provided `la
         # db.add(db_simulation)
         # db.commit()
 
-        return results
+        return FastJSONResponse(results)
 
     except HTTPException as e:
         raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         full_traceback = traceback.format_exc() 
@@ -844,8 +1346,290 @@ Keep the response practical and actionable for an investor. Use the provided `la
         raise HTTPException(status_code=500, detail=f"An error occurred during strategy optimisation: {str(e)}")
 
 
+PORTFOLIO_MAX_TICKERS = 500
+
+@app.post("/api/run_portfolio_simulation/")
+async def run_portfolio_simulation(request: PortfolioSimulationRequest, current_user: UserInDB = Depends(get_current_user)):
+    """
+    Simulates the strategy across a portfolio of tickers on a cross-asset SLURP of daily returns.
+    Prices are aligned on the dates every ticker traded; tickers that cannot be downloaded are
+    skipped and listed in the response.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in request.tickers if t and t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required.")
+    if len(tickers) > PORTFOLIO_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {PORTFOLIO_MAX_TICKERS} tickers can be simulated per portfolio.")
+    if request.allocation not in portfolio_engine.ALLOCATIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported allocation: {request.allocation}. Available allocations are: {', '.join(portfolio_engine.ALLOCATIONS)}")
+    try:
+        portfolio_engine.check_covariance_model(request.covariance_model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=365 * request.years)
+        semaphore = asyncio.Semaphore(BATCH_DOWNLOAD_CONCURRENCY)
+
+        async def fetch(ticker: str):
+            async with semaphore:
+                try:
+                    return ticker, _close_series(await fetch_history(ticker, start_date, end_date))
+                except Exception as e:
+                    _trace.warning("portfolio download failed for %s: %s", ticker, e, ticker=ticker)
+                    return ticker, None
+
+        series_by_ticker = {}
+        skipped_tickers = []
+        for ticker, series in await asyncio.gather(*(fetch(ticker) for ticker in tickers)):
+            if series is None or series.empty:
+                skipped_tickers.append(ticker)
+            else:
+                series_by_ticker[ticker] = series.astype(float)
+        if not series_by_ticker:
+            raise HTTPException(status_code=400, detail="Could not fetch historical data for any of the tickers.")
+        prices = pd.concat(series_by_ticker, axis=1, join="inner").dropna()
+        if len(prices) <= request.forecast_horizon:
+            raise HTTPException(status_code=400, detail="Not enough overlapping price history across the tickers; remove tickers with short or disjoint histories.")
+
+        # The engine's work scales with trials x horizon x assets; identical untraced runs in flight share one run
+        cost = estimate_cost(request.num_trials, request.forecast_horizon, len(prices.columns))
+        run = (_run_portfolio, prices, request)
+        if request.debug_trace:
+            with trace_run() as trace:
+                simulation_results = await run_admitted(None, current_user.id, cost, *run)
+        else:
+            trace = None
+            history_key = (tuple(prices.columns), start_date.date().isoformat(), end_date.date().isoformat())
+            engine_key = _engine_key("portfolio", history_key, request, {"tickers", "debug_trace"})
+            simulation_results = dict(await run_admitted(engine_key, current_user.id, cost, *run))
+        simulation_results["skipped_tickers"] = skipped_tickers
+
+        largest_risks = sorted(simulation_results["assets"], key=lambda asset: asset["risk_contribution"], reverse=True)[:10]
+        prompt = f"""Based on the following portfolio simulation results, provide a comprehensive analysis and investment recommendation.
+
+Simulation Parameters:
+- Tickers ({len(prices.columns)}): {', '.join(prices.columns[:50])}{' ...' if len(prices.columns) > 50 else ''}
+- Historical Period: {request.years} years ({len(prices)} aligned bars)
+- Forecast Horizon: {request.forecast_horizon} days
+- Number of Trials: {request.num_trials}
+- Allocation: {request.allocation}
+- Short Selling: {request.allow_short}
+- Take Profit: {request.take_profit_pct}
+- Stop Loss: {request.stop_loss_pct}
+
+Portfolio Results:
+{simulation_results["portfolio"]}
+
+Correlation-Adjusted Risk:
+{simulation_results["risk"]}
+
+Largest Risk Contributors:
+{largest_risks}
+
+Please provide:
+1. An evaluation of the portfolio's expected performance and drawdown risk.
+2. How diversified the portfolio is, given the correlations and risk contributions.
+3. Which positions dominate the risk and how the allocation could be improved.
+4. Risk management and position sizing recommendations.
+5. Overall recommendation for this portfolio.
+
+Keep the response practical and actionable for an investor."""
+        simulation_results["ai_recommendation"] = await get_ai_recommendation(prompt)
+        if trace is not None:
+            simulation_results["trace"] = trace.to_list()
+        return FastJSONResponse(simulation_results)
+
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        _trace.error("portfolio simulation failed:\n%s", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"An error occurred during portfolio simulation: {str(e)}")
+
+@app.post("/api/run_turtle_simulation/")
+async def run_turtle_simulation(request: TurtleSimulationRequest, current_user: UserInDB = Depends(get_current_user)):
+    """
+    Backtests the Turtle trading rules on one ticker's daily OHLC bars, then resamples the
+    resulting trade sequence to show the range of outcomes.
+    """
+    if request.system not in turtle_engine.SYSTEMS:
+        raise HTTPException(status_code=400, detail=f"Unsupported Turtle system: {request.system}. Available systems are: {', '.join(map(str, turtle_engine.SYSTEMS))}")
+    try:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=365 * request.years)
+        # Raw OHLC rather than Adj Close: breakouts and true ranges compare closes with highs and lows
+        historical_data = (await fetch_history(request.ticker, start_date, end_date)).dropna()
+        if historical_data.empty or 'Close' not in historical_data.columns:
+            raise HTTPException(status_code=400, detail=f"Could not fetch historical data for ticker {request.ticker}.")
+
+        # Resampling dominates: trials x trades, and there are fewer trades than bars
+        cost = estimate_cost(request.num_trials, 1, len(historical_data))
+        if request.debug_trace:
+            with trace_run() as trace:
+                simulation_results = await run_admitted(None, current_user.id, cost, _run_turtle, historical_data, request)
+        else:
+            trace = None
+            engine_key = _engine_key("turtle", _history_key(request.ticker, start_date, end_date), request, {"debug_trace"})
+            simulation_results = dict(await run_admitted(engine_key, current_user.id, cost, _run_turtle, historical_data, request))
+
+        prompt = f"""Based on the following Turtle trading backtest for {request.ticker}, provide a comprehensive analysis and investment recommendation.
+
+Simulation Parameters:
+- Ticker: {request.ticker}
+- Historical Period: {request.years} years
+- System: {request.system} ({simulation_results["entry_window"]}-day breakout entries, {simulation_results["exit_window"]}-day breakout exits)
+- Risk per Unit: {request.risk_per_unit_pct * 100:.1f}% of equity at a 2N stop, up to {request.max_units} units
+- Short Selling: {request.allow_short}
+
+Performance:
+{simulation_results["performance"]}
+
+Monte Carlo Resampling of the Trade Sequence ({request.num_trials} trials):
+{simulation_results["monte_carlo"]}
+
+Recent Trades:
+{simulation_results["trade_log"][-5:]}
+
+Please provide:
+1. An evaluation of the system's performance on this ticker (returns, drawdown, MAR ratio).
+2. Whether the win rate and payoff ratio fit a trend-following edge.
+3. What the resampled outcomes say about the risk of ruin and the range of results.
+4. Position sizing and parameter recommendations.
+5. Overall recommendation for trading {request.ticker} with this system.
+
+Keep the response practical and actionable for an investor."""
+        simulation_results["ai_recommendation"] = await get_ai_recommendation(prompt)
+        if trace is not None:
+            simulation_results["trace"] = trace.to_list()
+        return FastJSONResponse(simulation_results)
+
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        _trace.error("turtle simulation failed:\n%s", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"An error occurred during Turtle simulation: {str(e)}")
+
+TURTLE_SWEEP_MAX_TICKERS = 500
+TURTLE_SWEEP_MAX_WINDOWS = 20 # Per list, so at most 400 window pairs
+
+@app.post("/api/turtle_window_sweep/")
+async def turtle_window_sweep(request: TurtleSweepRequest, current_user: UserInDB = Depends(get_current_user)):
+    """
+    Runs the Turtle rules for every entry/exit window pair on every ticker, tickers in parallel,
+    and ranks the pairs by MAR ratio per ticker and across the universe. Tickers that cannot be
+    downloaded are skipped and listed in the response.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in request.tickers if t and t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required.")
+    if len(tickers) > TURTLE_SWEEP_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {TURTLE_SWEEP_MAX_TICKERS} tickers can be swept per request.")
+    if request.system not in turtle_engine.SYSTEMS:
+        raise HTTPException(status_code=400, detail=f"Unsupported Turtle system: {request.system}. Available systems are: {', '.join(map(str, turtle_engine.SYSTEMS))}")
+    if not request.entry_windows or not request.exit_windows:
+        raise HTTPException(status_code=400, detail="At least one entry window and one exit window are required.")
+    if len(request.entry_windows) > TURTLE_SWEEP_MAX_WINDOWS or len(request.exit_windows) > TURTLE_SWEEP_MAX_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"At most {TURTLE_SWEEP_MAX_WINDOWS} entry and {TURTLE_SWEEP_MAX_WINDOWS} exit windows can be swept per request.")
+
+    try:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=365 * request.years)
+        semaphore = asyncio.Semaphore(BATCH_DOWNLOAD_CONCURRENCY)
+
+        async def fetch(ticker: str):
+            async with semaphore:
+                try:
+                    return ticker, (await fetch_history(ticker, start_date, end_date)).dropna()
+                except Exception as e:
+                    _trace.warning("turtle sweep download failed for %s: %s", ticker, e, ticker=ticker)
+                    return ticker, None
+
+        histories = {}
+        skipped_tickers = []
+        for ticker, data in await asyncio.gather(*(fetch(ticker) for ticker in tickers)):
+            if data is None or data.empty or 'Close' not in data.columns:
+                skipped_tickers.append(ticker)
+            else:
+                histories[ticker] = data
+        if not histories:
+            raise HTTPException(status_code=400, detail="Could not fetch historical data for any of the tickers.")
+
+        # One backtest per window pair per ticker, each linear in the ticker's bars
+        cost = estimate_cost(len(request.entry_windows) * len(request.exit_windows), 1, sum(len(data) for data in histories.values()))
+        history_key = (tuple(histories), start_date.date().isoformat(), end_date.date().isoformat())
+        engine_key = _engine_key("turtle_sweep", history_key, request, {"tickers"})
+        sweep_results = dict(await run_admitted(engine_key, current_user.id, cost, _run_turtle_sweep, histories, request))
+        sweep_results["skipped_tickers"] = skipped_tickers
+        return FastJSONResponse(sweep_results)
+
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        _trace.error("turtle window sweep failed:\n%s", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"An error occurred during the Turtle window sweep: {str(e)}")
+
+SIMULATION_HISTORY_DEFAULT_LIMIT = 20
+SIMULATION_HISTORY_MAX_LIMIT = 100
+
+def _encode_history_cursor(created_at: datetime, simulation_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{simulation_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_history_cursor(cursor: str):
+    try:
+        created_at, simulation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(simulation_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
 @app.get("/api/simulations/")
-async def get_simulations(db: SessionLocal = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Simulation).filter(models.User.id == current_user.id).all()
+async def get_simulations(limit: int = SIMULATION_HISTORY_DEFAULT_LIMIT, cursor: Optional[str] = None, db: AsyncSession = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
+    """
+    Lists the current user's simulations newest first, one page at a time.
+    Only lightweight columns are returned; fetch /api/simulations/{id} for the full payload.
+    Pass the returned next_cursor back as `cursor` to get the following page.
+    """
+    limit = max(1, min(limit, SIMULATION_HISTORY_MAX_LIMIT))
+    query = select(
+        models.Simulation.id,
+        models.Simulation.created_at,
+        models.Simulation.simulation_mode,
+    ).where(models.Simulation.user_id == current_user.id)
+
+    if cursor:
+        cursor_created_at, cursor_id = _decode_history_cursor(cursor)
+        query = query.where(or_(
+            models.Simulation.created_at < cursor_created_at,
+            and_(models.Simulation.created_at == cursor_created_at, models.Simulation.id < cursor_id),
+        ))
+
+    result = await db.execute(query.order_by(models.Simulation.created_at.desc(), models.Simulation.id.desc()).limit(limit + 1))
+    rows = result.all()
+    next_cursor = _encode_history_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            {"id": row.id, "created_at": row.created_at, "simulation_mode": row.simulation_mode}
+            for row in rows[:limit]
+        ],
+        "next_cursor": next_cursor,
+    }
+
+@app.get("/api/simulations/{simulation_id}")
+async def get_simulation(simulation_id: int, db: AsyncSession = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
+    result = await db.execute(select(models.Simulation).where(
+        models.Simulation.id == simulation_id,
+        models.Simulation.user_id == current_user.id,
+    ))
+    simulation = result.scalars().first()
+    if simulation is None:
+        raise HTTPException(status_code=404, detail="Simulation not found.")
+    return simulation
 
 
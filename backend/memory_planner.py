@@ -0,0 +1,167 @@
+import math
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+# Working-memory budget for a single engine run; the planners pick chunk sizes to stay under it
+MEMORY_BUDGET_BYTES = int(float(os.environ.get("ENGINE_MEMORY_BUDGET_BYTES", 256 * 2**20)))
+# Set to 0 to skip the tracemalloc measurement (it slows allocation-heavy code down a little)
+MEMORY_TRACKING = os.environ.get("ENGINE_MEMORY_TRACKING", "1") != "0"
+
+FLOAT_BYTES = 8
+MIN_CHUNK_ROWS = 256 # Below this the per-chunk overhead outweighs the memory saved
+DATAFRAME_COLUMN_OVERHEAD = 4 # Pandas temporaries while deriving columns from the history
+TRADE_BYTES = 32 # A Python float plus its list slot for each recorded trade PnL
+RUN_OVERHEAD_BYTES = 256 * 2**10 # Pandas bookkeeping, trade logs and results, whatever the run size
+
+class ChunkPlan:
+    """How many trial rows an engine processes at once, and the peak working memory that implies."""
+    __slots__ = ("rows", "chunk_size", "estimated_peak_bytes", "budget_bytes")
+
+    def __init__(self, rows: int, chunk_size: int, estimated_peak_bytes: int, budget_bytes: int):
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.estimated_peak_bytes = estimated_peak_bytes
+        self.budget_bytes = budget_bytes
+
+    @property
+    def num_chunks(self) -> int:
+        return max(math.ceil(self.rows / self.chunk_size), 1)
+
+    def chunks(self):
+        """Yields (start, stop) row ranges covering all rows in order."""
+        for start in range(0, self.rows, self.chunk_size):
+            yield start, min(start + self.chunk_size, self.rows)
+
+    def as_dict(self) -> dict:
+        return {
+            "estimated_peak_bytes": self.estimated_peak_bytes,
+            "budget_bytes": self.budget_bytes,
+            "chunk_size": self.chunk_size,
+            "num_chunks": self.num_chunks,
+        }
+
+    def __repr__(self):
+        return (f"ChunkPlan(rows={self.rows}, chunk_size={self.chunk_size}, "
+                f"estimated_peak_bytes={self.estimated_peak_bytes:,}, budget_bytes={self.budget_bytes:,})")
+
+def plan_chunks(rows: int, bytes_per_row: int, fixed_bytes: int, budget_bytes: Optional[int] = None) -> ChunkPlan:
+    """
+    Picks the largest chunk of rows whose working set (chunk_size x bytes_per_row) fits next to
+    fixed_bytes, the memory held for the whole run. When even MIN_CHUNK_ROWS does not fit the
+    run still goes ahead at that size; the estimate then reports the overshoot.
+    """
+    budget_bytes = MEMORY_BUDGET_BYTES if budget_bytes is None else int(budget_bytes)
+    rows = max(int(rows), 0)
+    available = budget_bytes - fixed_bytes
+    chunk_size = max(available // max(bytes_per_row, 1), MIN_CHUNK_ROWS)
+    chunk_size = max(min(chunk_size, rows), 1)
+    return ChunkPlan(rows, int(chunk_size), int(fixed_bytes + chunk_size * bytes_per_row), budget_bytes)
+
+def plan_backtester(num_trials: int, forecast_horizon: int, bars: int, slurp_columns: int = 0,
+                    budget_bytes: Optional[int] = None) -> ChunkPlan:
+    """
+    BacktesterSimulator: for every bar the indicator build samples a (trials x horizon) block of
+    returns; the uniforms are held with the index array made from them, the index array with the
+    sampled values, and 1 + values holds two blocks again. The SIP (or the SLURP's trials x columns samples and their
+    standard-normal draws), the per-bar future prices, their percentile copies and the shuffled and
+    sorted copies behind the standard errors live for the run.
+    """
+    horizon = max(int(forecast_horizon), 1)
+    bytes_per_row = 2 * horizon * FLOAT_BYTES
+    fixed_bytes = (RUN_OVERHEAD_BYTES + num_trials * FLOAT_BYTES * (8 + 2 * slurp_columns)
+                   + bars * FLOAT_BYTES * (12 + DATAFRAME_COLUMN_OVERHEAD))
+    return plan_chunks(num_trials, bytes_per_row, fixed_bytes, budget_bytes)
+
+def plan_optimiser(num_simulations: int, forecast_horizon: int, budget_bytes: Optional[int] = None) -> ChunkPlan:
+    """
+    StrategyOptimiser: generating paths peaks while the (paths x horizon x 2) standard normals and
+    their correlated transform are both alive; the returns column copied out of the samples and
+    the (paths x horizon + 1) price paths then fit in the same space. Per-path statistics (drawdown,
+    trade totals, control variate) and the trade PnLs (typically about one trade per path) are kept
+    for the whole run.
+    """
+    horizon = max(int(forecast_horizon), 1)
+    bytes_per_row = (2 * 2 * horizon + 1) * FLOAT_BYTES
+    fixed_bytes = RUN_OVERHEAD_BYTES + num_simulations * (5 * FLOAT_BYTES + TRADE_BYTES)
+    return plan_chunks(num_simulations, bytes_per_row, fixed_bytes, budget_bytes)
+
+def plan_portfolio(num_trials: int, num_assets: int, forecast_horizon: int, bars: int,
+                   budget_bytes: Optional[int] = None, normal_dim: Optional[int] = None) -> ChunkPlan:
+    """
+    PortfolioBacktester: drawing a chunk of paths holds (paths x horizon x normal_dim) standard
+    normals and their (paths x horizon x assets) correlated transform together; evaluating it holds
+    the transform alongside about a dozen (paths x assets) sleeve, position, trade-counter and mask
+    arrays. normal_dim is the number of assets under the dense covariance model and factors plus
+    assets under the factor model. Per-path results (with each asset's realised PnL), the
+    historical returns, the covariance matrix and the covariance factor live for the run.
+    """
+    horizon = max(int(forecast_horizon), 1)
+    num_assets = max(int(num_assets), 1)
+    normal_dim = num_assets if normal_dim is None else max(int(normal_dim), 1)
+    block = num_assets * horizon
+    bytes_per_row = max((normal_dim + num_assets) * horizon, block + 12 * num_assets) * FLOAT_BYTES
+    fixed_bytes = (RUN_OVERHEAD_BYTES + num_trials * (2 + num_assets) * FLOAT_BYTES
+                   + num_assets * (2 * num_assets + normal_dim) * FLOAT_BYTES
+                   + bars * num_assets * FLOAT_BYTES * (2 + DATAFRAME_COLUMN_OVERHEAD))
+    return plan_chunks(num_trials, bytes_per_row, fixed_bytes, budget_bytes)
+
+def plan_trade_resampling(num_trials: int, num_trades: int, bars: int, budget_bytes: Optional[int] = None) -> ChunkPlan:
+    """
+    TurtleBacktester: each resampled trial compounds a sequence of num_trades trade returns in
+    place, with its running peak and the drawdown from it alongside. The OHLC history with its
+    channels and ATR, and the per-trial results, live for the run.
+    """
+    num_trades = max(int(num_trades), 1)
+    bytes_per_row = 3 * num_trades * FLOAT_BYTES
+    fixed_bytes = RUN_OVERHEAD_BYTES + num_trials * 2 * FLOAT_BYTES + bars * FLOAT_BYTES * (12 + DATAFRAME_COLUMN_OVERHEAD)
+    return plan_chunks(num_trials, bytes_per_row, fixed_bytes, budget_bytes)
+
+_tracking_lock = threading.Lock()
+_tracking_runs = 0
+_started_tracing = False # Leave tracing alone if it was already on (e.g. python -X tracemalloc)
+
+class PeakMemory:
+    """Peak bytes traced by tracemalloc while a track_peak block ran, above what was allocated at its start."""
+    __slots__ = ("baseline_bytes", "peak_bytes")
+
+    def __init__(self):
+        self.baseline_bytes = 0
+        self.peak_bytes = None
+
+    def report(self, plan: Optional[ChunkPlan]) -> dict:
+        """Run metadata comparing the plan's estimate with the measured peak (None when tracking is off)."""
+        report = plan.as_dict() if plan is not None else {}
+        report["actual_peak_bytes"] = self.peak_bytes
+        return report
+
+@contextmanager
+def track_peak():
+    """
+    Measures peak Python-heap and NumPy allocations with tracemalloc. Tracing is process-wide,
+    so when runs overlap the first one to start resets the peak and each reports the shared
+    high-water mark; a run measured alone gets an exact figure.
+    """
+    global _tracking_runs, _started_tracing
+    usage = PeakMemory()
+    if not MEMORY_TRACKING:
+        yield usage
+        return
+    with _tracking_lock:
+        if _tracking_runs == 0:
+            _started_tracing = not tracemalloc.is_tracing()
+            if _started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _tracking_runs += 1
+        usage.baseline_bytes = tracemalloc.get_traced_memory()[0]
+    try:
+        yield usage
+    finally:
+        with _tracking_lock:
+            usage.peak_bytes = max(tracemalloc.get_traced_memory()[1] - usage.baseline_bytes, 0)
+            _tracking_runs -= 1
+            if _tracking_runs == 0 and _started_tracing:
+                tracemalloc.stop()
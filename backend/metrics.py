@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+# Endpoint (route template) of the request being served; set by the metrics middleware in main.py
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="none")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+THROUGHPUT_BUCKETS = (100, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonically increasing counter, one series per label combination."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+class Gauge:
+    """A value that goes up and down, one series per label combination."""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def get(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {} # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1 # Non-cumulative here; made cumulative when rendered
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return series[-1] if series else 0
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-2]):
+                cumulative += bucket_count
+                le_label = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+_registry = []
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+REQUEST_DURATION = _register(Histogram(
+    "vantage_request_duration_seconds", "End-to-end request latency.", ("endpoint", "method", "status")))
+STAGE_DURATION = _register(Histogram(
+    "vantage_stage_duration_seconds", "Latency of each processing stage within an endpoint.", ("endpoint", "stage")))
+ENGINE_TRIALS = _register(Counter(
+    "vantage_engine_trials_total", "Monte Carlo trials evaluated by each engine.", ("engine",)))
+ENGINE_TRIALS_PER_SECOND = _register(Histogram(
+    "vantage_engine_trials_per_second", "Per-run engine throughput in trials per second.", ("engine",), THROUGHPUT_BUCKETS))
+CACHE_HITS = _register(Counter(
+    "vantage_cache_hits_total", "Cache lookups that found a live entry.", ("cache",)))
+CACHE_MISSES = _register(Counter(
+    "vantage_cache_misses_total", "Cache lookups that found no live entry.", ("cache",)))
+ADMISSION_QUEUE_DEPTH = _register(Gauge(
+    "vantage_admission_queue_depth", "Engine runs waiting for admission.", ("controller",)))
+ADMISSION_COST_IN_USE = _register(Gauge(
+    "vantage_admission_cost_in_use", "Estimated cost (trials x horizon x bars) of the engine runs currently admitted.", ("controller",)))
+ADMISSION_DECISIONS = _register(Counter(
+    "vantage_admission_decisions_total", "Admission outcomes: admitted, or rejected with the reason.", ("controller", "outcome")))
+ADMISSION_WAIT = _register(Histogram(
+    "vantage_admission_wait_seconds", "Time admitted engine runs spent queued.", ("controller",)))
+SINGLE_FLIGHT_CALLS = _register(Counter(
+    "vantage_single_flight_calls_total", "Coalescable calls that ran the work (leader) or joined one in flight (shared).", ("group", "role")))
+RESPONSE_BODY_BYTES = _register(Histogram(
+    "vantage_response_body_bytes", "Size of JSON response bodies before compression.", ("endpoint",), SIZE_BUCKETS))
+RESPONSE_WIRE_BYTES = _register(Histogram(
+    "vantage_response_wire_bytes", "Response body bytes sent to the client, by content encoding.", ("endpoint", "encoding"), SIZE_BUCKETS))
+
+@contextmanager
+def stage_timer(stage: str, endpoint: Optional[str] = None):
+    """Times the enclosed block as `stage` of the current (or given) endpoint."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, endpoint or current_endpoint.get(), stage)
+
+def record_trials(engine: str, trials: int, seconds: float) -> None:
+    ENGINE_TRIALS.inc(engine, amount=trials)
+    if seconds > 0:
+        ENGINE_TRIALS_PER_SECOND.observe(trials / seconds, engine)
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    (CACHE_HITS if hit else CACHE_MISSES).inc(cache)
+
+def record_single_flight(group: str, leader: bool) -> None:
+    SINGLE_FLIGHT_CALLS.inc(group, "leader" if leader else "shared")
+
+def render_prometheus() -> str:
+    """Renders every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,41 @@
+"""
+Creates the database schema. Deployments run this once before starting the app
+(with RUN_MIGRATIONS_ON_STARTUP=0); local development runs it from the startup hook.
+
+    cd backend && python migrate.py
+"""
+import asyncio
+
+from sqlalchemy import inspect, text
+
+import models
+from database import engine
+
+def _create_schema(connection):
+    models.Base.metadata.create_all(bind=connection)
+    # create_all skips tables that already exist, so add columns and indexes introduced since to older databases
+    table = models.Simulation.__table__
+    existing_columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing_columns:
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    for index in table.indexes:
+        index.create(bind=connection, checkfirst=True)
+    if connection.dialect.name == "sqlite":
+        # SQLite compares datetimes as text. Rows from the old CURRENT_TIMESTAMP server default have no
+        # fraction, so they sort below their own history cursor ("...:SS.000000"); give them one
+        connection.execute(text(f"UPDATE {table.name} SET created_at = created_at || '.000000' "
+                                f"WHERE length(created_at) = 19"))
+
+async def run_migrations():
+    async with engine.begin() as connection:
+        await connection.run_sync(_create_schema)
+
+async def _main():
+    await run_migrations()
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
+    print("Database schema is up to date.")
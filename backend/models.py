@@ -1,4 +1,6 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, JSON
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Boolean, Column, Integer, String, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -18,10 +20,17 @@ class Simulation(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Python-side default keeps the stored format identical to bound cursor values on SQLite
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=datetime.utcnow)
     simulation_mode = Column(String)
     simulation_params = Column(JSON)
+    seed = Column(BigInteger) # The engine's random seed; rerunning simulation_params with it reproduces the results
     summary_stats = Column(JSON)
     ai_recommendation = Column(String)
 
-    user = relationship("User", back_populates="simulations")
\ No newline at end of file
+    user = relationship("User", back_populates="simulations")
+
+    __table_args__ = (
+        # Serves the per-user, newest-first history listing
+        Index("ix_simulations_user_id_created_at", "user_id", "created_at"),
+    )
@@ -0,0 +1,282 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+import time
+
+from factor_models import CovarianceFactor, check_covariance_model, fit_covariance_factor
+from memory_planner import plan_portfolio
+from metrics import record_trials, stage_timer
+from random_streams import BlockStreams, RandomStreams, SeedLike, as_generator, fixed_blocks
+from tracing import DEBUG, get_tracer
+
+_trace = get_tracer("portfolio_backtester")
+
+TRADING_DAYS_PER_YEAR = 252
+ALLOCATIONS = ("equal", "inverse_volatility")
+
+def _correlated_returns(factor: CovarianceFactor, normals: np.ndarray) -> np.ndarray:
+    """
+    Daily returns shaped (trials, assets, bars) from (trials, bars, factor.normal_dim) standard
+    normals; every trial row is coherent across assets.
+    """
+    return factor.sample(normals).transpose(0, 2, 1)
+
+def generate_cross_asset_slurp(returns: pd.DataFrame, num_trials: int = 10000, horizon: int = 20,
+                               seed: SeedLike = None, covariance_model: str = "dense",
+                               num_factors: Optional[int] = None) -> np.ndarray:
+    """
+    Generates a cross-asset SLURP of daily returns from historical returns (bars x assets).
+    Unlike generate_correlated_slurp, which correlates columns of one ticker for one day, this
+    correlates every asset over `horizon` days: an array shaped (trials, assets, horizon).
+    Assumes the returns are stationary and jointly normal; covariance_model "factor" approximates
+    their covariance with num_factors principal components plus each asset's own variance.
+    """
+    clean_returns = returns.dropna()
+    if clean_returns.shape[1] < 1 or len(clean_returns) < 2:
+        raise ValueError("At least two bars of returns for at least one asset are required to generate a cross-asset SLURP.")
+    factor = fit_covariance_factor(clean_returns.to_numpy(), covariance_model, num_factors)
+    normals = as_generator(seed).standard_normal((num_trials, horizon, factor.normal_dim))
+    return _correlated_returns(factor, normals)
+
+class PortfolioBacktester:
+    """
+    Simulates a rules-based strategy on every asset of a portfolio at once. Each asset trades its
+    own capital sleeve (set by the allocation) with the BacktesterSimulator-style percentile rules
+    applied to simulated daily returns; positions, sleeves and trade statistics are (paths, assets)
+    arrays updated bar by bar, so the cost grows with the number of assets without Python loops over them.
+    """
+    def __init__(self,
+                 prices: pd.DataFrame, # Close prices, one column per ticker, rows aligned by date
+                 num_trials: int = 10000,
+                 forecast_horizon: int = 20, # Bars simulated per path
+                 initial_capital: float = 100000,
+                 allocation: str = "equal", # "equal" or "inverse_volatility"
+                 allow_short: bool = True,
+                 take_profit_pct: float = None, # e.g., 0.05 for 5% on a position
+                 stop_loss_pct: float = None,    # e.g., 0.02 for 2% on a position
+                 entry_long_percentile: float = 0.75, # Enter long when the day's return is above this percentile
+                 entry_short_percentile: float = 0.25, # Enter short when the day's return is below this percentile
+                 exit_long_percentile: float = 0.25,
+                 exit_short_percentile: float = 0.75,
+                 transaction_cost_bps: float = 0.0, # Charged on the sleeve at every entry and exit
+                 memory_budget_bytes: Optional[int] = None, # Defaults to ENGINE_MEMORY_BUDGET_BYTES
+                 seed: SeedLike = None, # Int or np.random.Generator; a fresh seed is drawn (and reported) when None
+                 covariance_model: str = "dense", # "dense" (Cholesky) or "factor" (principal components plus specific risk)
+                 num_factors: Optional[int] = None, # Factor model only; DEFAULT_NUM_FACTORS by default
+                 ):
+        if prices.empty or prices.shape[1] < 1:
+            raise ValueError("Portfolio prices must contain at least one ticker.")
+        if allocation not in ALLOCATIONS:
+            raise ValueError(f"Unsupported allocation: {allocation}. Available allocations are: {', '.join(ALLOCATIONS)}")
+        if num_trials < 1 or forecast_horizon < 1:
+            raise ValueError("num_trials and forecast_horizon must be at least 1.")
+
+        self.tickers = [str(ticker) for ticker in prices.columns]
+        self.num_trials = num_trials
+        self.forecast_horizon = forecast_horizon
+        self.initial_capital = float(initial_capital)
+        self.allocation = allocation
+        self.allow_short = allow_short
+        self.take_profit_pct = take_profit_pct
+        self.stop_loss_pct = stop_loss_pct
+        self.transaction_cost = transaction_cost_bps / 10000
+        self.covariance_model = check_covariance_model(covariance_model)
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+
+        with stage_timer("fit"):
+            self.returns = prices.astype(float).pct_change().iloc[1:].dropna()
+            if len(self.returns) < 2:
+                raise ValueError("At least three aligned price bars are required for a portfolio simulation.")
+            self.covariance = np.atleast_2d(self.returns.cov().to_numpy())
+            # Fitted once per distinct history and shared by every chunk and later run on it
+            self.factor = fit_covariance_factor(self.returns.to_numpy(), covariance_model, num_factors)
+            self.volatility = np.sqrt(np.diag(self.covariance))
+            self.weights = self._allocation_weights()
+
+            # Per-asset rule thresholds from each asset's historical return distribution
+            returns_array = self.returns.to_numpy()
+            self.entry_long_thresholds = np.quantile(returns_array, entry_long_percentile, axis=0)
+            self.entry_short_thresholds = np.quantile(returns_array, entry_short_percentile, axis=0)
+            self.exit_long_thresholds = np.quantile(returns_array, exit_long_percentile, axis=0)
+            self.exit_short_thresholds = np.quantile(returns_array, exit_short_percentile, axis=0)
+
+        self.memory_plan = plan_portfolio(num_trials, len(self.tickers), forecast_horizon, len(self.returns),
+                                          memory_budget_bytes, normal_dim=self.factor.normal_dim)
+        # Paths are drawn from fixed blocks of streams, so they do not depend on the memory plan's chunk size
+        self.path_streams = BlockStreams(self.streams.child("paths"), fixed_blocks(num_trials))
+        _trace.debug("portfolio of %d assets over %d bars; memory plan: %r", len(self.tickers), len(self.returns),
+                     self.memory_plan, assets=len(self.tickers), **self.memory_plan.as_dict())
+
+    def _allocation_weights(self) -> np.ndarray:
+        num_assets = len(self.tickers)
+        if self.allocation == "inverse_volatility":
+            inverse_volatility = np.divide(1.0, self.volatility, out=np.zeros(num_assets), where=self.volatility > 0)
+            if inverse_volatility.sum() > 0:
+                return inverse_volatility / inverse_volatility.sum()
+        return np.full(num_assets, 1.0 / num_assets)
+
+    @stage_timer("path_generation")
+    def _generate_paths(self, start: int, stop: int) -> np.ndarray:
+        """Paths start..stop of the run."""
+        shape = (self.forecast_horizon, self.factor.normal_dim)
+        normals = self.path_streams.draw(start, stop, lambda generator, count: generator.standard_normal((count, *shape)))
+        return _correlated_returns(self.factor, normals)
+
+    def _simulate_paths(self, returns: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Runs the strategy over a (paths, assets, bars) block of simulated returns. A position earns
+        the day's return from the bar after it is opened; exits are checked before entries, and a
+        sleeve that exits does not re-enter on the same bar. Open positions are closed on the last bar.
+        """
+        num_paths, num_assets, _ = returns.shape
+        cost = self.transaction_cost
+        sleeves = np.tile(self.weights * self.initial_capital, (num_paths, 1))
+        entry_values = np.zeros((num_paths, num_assets))
+        positions = np.zeros((num_paths, num_assets), dtype=np.int8) # 1 long, -1 short, 0 flat
+        trades = np.zeros((num_paths, num_assets), dtype=np.int32)
+        wins = np.zeros((num_paths, num_assets), dtype=np.int32)
+        realised_pnl = np.zeros((num_paths, num_assets))
+        peak_values = np.full(num_paths, self.initial_capital)
+        max_drawdowns = np.zeros(num_paths)
+
+        def close(mask: np.ndarray) -> None:
+            if cost:
+                sleeves[mask] *= 1 - cost
+            trades[mask] += 1
+            wins[mask & (sleeves > entry_values)] += 1
+            realised_pnl[mask] += sleeves[mask] - entry_values[mask]
+            positions[mask] = 0
+
+        for t in range(returns.shape[2]):
+            daily_returns = returns[:, :, t]
+            in_position = positions != 0
+            sleeves *= 1 + positions * daily_returns
+
+            # Exit and stop rules for open positions
+            exits = (((positions == 1) & (daily_returns < self.exit_long_thresholds))
+                     | ((positions == -1) & (daily_returns > self.exit_short_thresholds)))
+            if self.take_profit_pct is not None or self.stop_loss_pct is not None:
+                position_returns = np.divide(sleeves, entry_values, out=np.ones_like(sleeves), where=in_position) - 1
+                if self.take_profit_pct is not None:
+                    exits |= in_position & (position_returns >= self.take_profit_pct)
+                if self.stop_loss_pct is not None:
+                    exits |= in_position & (position_returns <= -self.stop_loss_pct)
+            close(exits)
+
+            # Entry rules for sleeves that were flat at the start of the bar
+            flat = ~in_position
+            enter_long = flat & (daily_returns > self.entry_long_thresholds)
+            enter_short = flat & (daily_returns < self.entry_short_thresholds) & ~enter_long if self.allow_short else None
+            entries = enter_long if enter_short is None else enter_long | enter_short
+            if cost:
+                sleeves[entries] *= 1 - cost
+            entry_values[entries] = sleeves[entries]
+            positions[enter_long] = 1
+            if enter_short is not None:
+                positions[enter_short] = -1
+
+            portfolio_values = sleeves.sum(axis=1)
+            np.maximum(peak_values, portfolio_values, out=peak_values)
+            np.maximum(max_drawdowns, (peak_values - portfolio_values) / peak_values, out=max_drawdowns)
+
+        close(positions != 0)
+        return {
+            "final_values": sleeves.sum(axis=1),
+            "max_drawdowns": max_drawdowns,
+            "trades": trades.sum(axis=0),
+            "wins": wins.sum(axis=0),
+            "realised_pnl": realised_pnl,
+        }
+
+    def _risk_summary(self, horizon_returns: np.ndarray):
+        """
+        Correlation-adjusted risk of the target weights, plus tail risk of the simulated portfolio.
+        Returns the summary and each asset's share of the portfolio variance.
+        """
+        covariance_weights = self.covariance @ self.weights
+        portfolio_variance = float(self.weights @ covariance_weights)
+        portfolio_volatility = float(np.sqrt(portfolio_variance * TRADING_DAYS_PER_YEAR))
+        undiversified_volatility = float(self.weights @ self.volatility * np.sqrt(TRADING_DAYS_PER_YEAR))
+        if len(self.tickers) > 1:
+            volatility_outer = np.outer(self.volatility, self.volatility)
+            correlation = np.divide(self.covariance, volatility_outer, out=np.zeros_like(self.covariance), where=volatility_outer > 0)
+            average_correlation = float(correlation[~np.eye(len(self.tickers), dtype=bool)].mean())
+        else:
+            average_correlation = 1.0
+        value_at_risk_threshold = np.percentile(horizon_returns, 5)
+        tail = horizon_returns[horizon_returns <= value_at_risk_threshold]
+        risk_contributions = (self.weights * covariance_weights / portfolio_variance
+                              if portfolio_variance > 0 else np.zeros(len(self.tickers)))
+        return {
+            "portfolio_volatility": portfolio_volatility, # Annualised, with correlations
+            "undiversified_volatility": undiversified_volatility, # Annualised, as if perfectly correlated
+            "diversification_ratio": undiversified_volatility / portfolio_volatility if portfolio_volatility > 0 else 1.0,
+            "average_correlation": average_correlation,
+            "value_at_risk_95": float(-value_at_risk_threshold), # Horizon loss not exceeded on 95% of paths
+            "conditional_value_at_risk_95": float(-tail.mean()) if len(tail) else 0.0,
+        }, risk_contributions
+
+    def simulate(self) -> dict:
+        num_assets = len(self.tickers)
+        final_values = np.empty(self.num_trials)
+        max_drawdowns = np.empty(self.num_trials)
+        trades = np.zeros(num_assets, dtype=np.int64)
+        wins = np.zeros(num_assets, dtype=np.int64)
+        # Kept per path and summed once, so the totals do not depend on the chunk size
+        realised_pnl = np.empty((self.num_trials, num_assets))
+
+        evaluation_seconds = 0.0
+        for start, stop in self.memory_plan.chunks():
+            returns = self._generate_paths(start, stop)
+            evaluation_start = time.perf_counter()
+            with stage_timer("strategy_evaluation"):
+                chunk = self._simulate_paths(returns)
+            evaluation_seconds += time.perf_counter() - evaluation_start
+            del returns # Free this chunk's paths before the next chunk is drawn
+            final_values[start:stop] = chunk["final_values"]
+            max_drawdowns[start:stop] = chunk["max_drawdowns"]
+            trades += chunk["trades"]
+            wins += chunk["wins"]
+            realised_pnl[start:stop] = chunk["realised_pnl"]
+        record_trials("portfolio_backtester", self.num_trials, evaluation_seconds)
+        realised_pnl = realised_pnl.sum(axis=0)
+
+        horizon_returns = final_values / self.initial_capital - 1
+        risk, risk_contributions = self._risk_summary(horizon_returns)
+        if _trace.is_enabled(DEBUG):
+            _trace.debug("portfolio simulated: mean horizon return %.4f", float(horizon_returns.mean()),
+                         trades=int(trades.sum()), max_drawdown=float(max_drawdowns.mean()))
+
+        pnl_percentiles = np.percentile(horizon_returns, [5, 50, 95]) * 100
+        annualisation = np.sqrt(TRADING_DAYS_PER_YEAR)
+        assets = [
+            {
+                "ticker": ticker,
+                "weight": float(self.weights[i]),
+                "volatility": float(self.volatility[i] * annualisation),
+                "risk_contribution": float(risk_contributions[i]),
+                "expected_pnl": float(realised_pnl[i] / self.num_trials),
+                "trades_per_path": float(trades[i] / self.num_trials),
+                "win_rate": float(wins[i] / trades[i] * 100) if trades[i] else 0.0,
+            }
+            for i, ticker in enumerate(self.tickers)
+        ]
+        return {
+            "tickers": self.tickers,
+            "bars": len(self.returns),
+            "seed": self.seed,
+            "covariance_model": self.covariance_model,
+            "num_factors": self.factor.num_factors if self.covariance_model == "factor" else None,
+            "initial_capital": self.initial_capital,
+            "portfolio": {
+                "expected_final_value": float(final_values.mean()),
+                "expected_pnl_pct": float(horizon_returns.mean() * 100),
+                "pnl_pct_percentiles": {"5": float(pnl_percentiles[0]), "50": float(pnl_percentiles[1]), "95": float(pnl_percentiles[2])},
+                "probability_of_loss": float((horizon_returns < 0).mean()),
+                "expected_max_drawdown": float(max_drawdowns.mean()),
+                "max_drawdown_95": float(np.percentile(max_drawdowns, 95)),
+            },
+            "risk": risk,
+            "assets": assets,
+        }
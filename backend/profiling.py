@@ -0,0 +1,198 @@
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+# Profiling is only wired into the app when an admin token is configured
+PROFILING_ADMIN_TOKEN = os.environ.get("PROFILING_ADMIN_TOKEN")
+PROFILE_HEADER = "X-Vantage-Profile"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_SECONDS", 0.005))
+PROFILE_MAX_SAMPLES = 200000
+
+# Modules whose functions get an individual call-count entry in the summary
+PROFILED_MODULES = ("sip_backtester", "backtester", "strategy_optimiser", "portfolio_backtester",
+                    "turtle_backtester", "engine_core", "variance_reduction")
+
+_REQUEST_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+# cProfile is per-interpreter-thread global state, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+# The request being profiled, if any; asyncio.to_thread and the single-flight runs copy it into worker threads
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+def is_authorized(token: Optional[str]) -> bool:
+    if not PROFILING_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), PROFILING_ADMIN_TOKEN.encode("utf-8"))
+
+def profile_path(request_id: str, suffix: str) -> Optional[str]:
+    """Returns the stored file path for a profile id, or None if the id is malformed."""
+    if not _REQUEST_ID_RE.match(request_id):
+        return None
+    return os.path.join(PROFILE_DIR, f"{request_id}.{suffix}")
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+class _StackSampler(threading.Thread):
+    """Periodically samples the watched threads' Python stacks into collapsed-stack counts."""
+    def __init__(self, target_thread_id: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.target_thread_ids = {target_thread_id}
+        self.interval = interval
+        self.stacks = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+
+    def watch(self, thread_id: int) -> None:
+        self.target_thread_ids = self.target_thread_ids | {thread_id}
+
+    def unwatch(self, thread_id: int) -> None:
+        self.target_thread_ids = self.target_thread_ids - {thread_id}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval) and self.sample_count < PROFILE_MAX_SAMPLES:
+            frames = sys._current_frames()
+            for thread_id in self.target_thread_ids:
+                frame = frames.get(thread_id)
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if labels:
+                    self.stacks[";".join(reversed(labels))] += 1
+                    self.sample_count += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def run_profiled(func, *args, **kwargs):
+    """
+    Runs func in the calling worker thread, profiled as part of the request that scheduled it
+    when that request is being profiled. Wrap the work a profiled request hands to worker threads.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return func(*args, **kwargs)
+    return profile.run_in_thread(func, args, kwargs)
+
+class RequestProfile:
+    """
+    Profiles everything the current thread runs while active, and the work it hands to worker
+    threads through run_profiled: a sampling profiler produces collapsed stacks (flamegraph.pl /
+    speedscope input) and cProfile provides call counts for the SIP/SLURP and engine functions.
+    Results are written to PROFILE_DIR.
+
+    Other requests served by the same event loop during the window are included too.
+    """
+    def __init__(self, label: str = ""):
+        self.request_id = uuid.uuid4().hex
+        self.label = label
+        self.active = False
+
+    def __enter__(self):
+        if not _profile_lock.acquire(blocking=False):
+            return self # Another request is being profiled; run this one unprofiled
+        self.active = True
+        self._closed = False
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+        self._profiler = cProfile.Profile()
+        # cProfile follows one thread, so each worker call gets its own, merged into the summary once finished
+        self._worker_profilers = []
+        self._workers_lock = threading.Lock()
+        self._sampler = _StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_SECONDS)
+        self._sampler.start()
+        self._context_token = _current_profile.set(self)
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.active:
+            return False
+        try:
+            self._profiler.disable()
+            _current_profile.reset(self._context_token)
+            with self._workers_lock:
+                self._closed = True
+            self._sampler.stop()
+            self._write(time.perf_counter() - self._start)
+        finally:
+            _profile_lock.release()
+        return False
+
+    def run_in_thread(self, func, args: tuple, kwargs: dict):
+        """Runs func in the calling thread under its own cProfile, with the sampler watching the thread."""
+        if self._closed:
+            # The request has finished (a shared run it started outlived it) and its profile is written
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles through sys.monitoring, which allows one cProfile per process, and
+            # the request's holds it; the thread runs unprofiled and only the sampler covers it
+            profiler = None
+        thread_id = threading.get_ident()
+        self._sampler.watch(thread_id)
+        # Nested run_profiled calls in this thread are already covered by this profiler
+        token = _current_profile.set(None)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_profile.reset(token)
+            self._sampler.unwatch(thread_id)
+            if profiler is not None:
+                profiler.disable()
+                with self._workers_lock:
+                    if not self._closed:
+                        self._worker_profilers.append(profiler)
+
+    def _write(self, wall_time: float):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(profile_path(self.request_id, "collapsed"), "w") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        engine_functions = []
+        top_functions = []
+        stats = pstats.Stats(self._profiler)
+        # Only finished worker calls were kept; one still running when the request ended is left out
+        for profiler in self._worker_profilers:
+            stats.add(profiler)
+        for (filename, lineno, funcname), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            module = os.path.splitext(os.path.basename(filename))[0]
+            entry = {
+                "function": f"{module}:{funcname}:{lineno}",
+                "calls": ncalls,
+                "total_time": tottime,
+                "cumulative_time": cumtime,
+            }
+            top_functions.append(entry)
+            if module in PROFILED_MODULES:
+                engine_functions.append(entry)
+
+        summary = {
+            "request_id": self.request_id,
+            "label": self.label,
+            "started_at": self._started_at,
+            "wall_time": wall_time,
+            "sample_interval": PROFILE_SAMPLE_INTERVAL_SECONDS,
+            "sample_count": self._sampler.sample_count,
+            "engine_functions": sorted(engine_functions, key=lambda e: e["cumulative_time"], reverse=True),
+            "top_functions": sorted(top_functions, key=lambda e: e["total_time"], reverse=True)[:25],
+        }
+        with open(profile_path(self.request_id, "json"), "w") as f:
+            json.dump(summary, f, indent=2)
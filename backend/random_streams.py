@@ -0,0 +1,89 @@
+"""
+Seeded random streams for the engines. A run takes a seed (or a np.random.Generator, from which it
+draws one) and makes every random draw from a child stream of that seed, named by a key such as
+("indicators", 2) or ("series", "AAPL"). Children are SeedSequence children addressed by key
+rather than by spawn order, so a stream's draws depend only on the seed and its key: not on which
+worker asks for it, in what order, or how the rows are chunked. Engines report the seed with
+their results; passing it back reproduces the run.
+"""
+import secrets
+from typing import Callable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+MAX_SEED = 2**63 - 1 # Seeds are stored in a signed 64-bit column
+STREAM_BLOCK_ROWS = 4096 # Rows per child stream for fixed_blocks; even, so pairs of rows share a stream
+
+def new_seed() -> int:
+    return secrets.randbits(63)
+
+def _key_part(part) -> int:
+    # SeedSequence keys are non-negative integers of any size; names map to one without collisions
+    return int.from_bytes(part.encode("utf-8"), "big") if isinstance(part, str) else int(part)
+
+class RandomStreams:
+    """A run's seed and the child streams keyed off it."""
+    __slots__ = ("seed", "_sequence")
+
+    def __init__(self, seed: "SeedLike" = None):
+        if isinstance(seed, RandomStreams):
+            self.seed, self._sequence = seed.seed, seed._sequence
+            return
+        if isinstance(seed, np.random.Generator):
+            # The caller's generator picks the seed, so the run still has one to report
+            seed = int(seed.integers(MAX_SEED, endpoint=True))
+        seed = new_seed() if seed is None else int(seed)
+        if not 0 <= seed <= MAX_SEED:
+            raise ValueError(f"seed must be between 0 and {MAX_SEED}.")
+        self.seed = seed
+        self._sequence = np.random.SeedSequence(seed)
+
+    def child(self, *key) -> "RandomStreams":
+        """The streams under key; a child reports its run's seed."""
+        child = object.__new__(RandomStreams)
+        child.seed = self.seed
+        child._sequence = np.random.SeedSequence(self._sequence.entropy,
+                                                 spawn_key=self._sequence.spawn_key + tuple(map(_key_part, key)))
+        return child
+
+    def generator(self, *key) -> np.random.Generator:
+        """A generator for the stream under key (this stream itself without one)."""
+        sequence = self.child(*key)._sequence if key else self._sequence
+        return np.random.Generator(np.random.PCG64(sequence))
+
+SeedLike = Union[None, int, np.random.Generator, RandomStreams]
+
+def as_generator(seed: SeedLike = None) -> np.random.Generator:
+    """A generator for the standalone SIP and SLURP helpers; a Generator is used as it is."""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return RandomStreams(seed).generator()
+
+def fixed_blocks(num_rows: int, block_rows: int = STREAM_BLOCK_ROWS) -> List[Tuple[int, int]]:
+    """(start, stop) ranges of block_rows rows covering num_rows rows."""
+    return [(start, min(start + block_rows, num_rows)) for start in range(0, num_rows, block_rows)] or [(0, 0)]
+
+class BlockStreams:
+    """
+    Draws rows 0..num_rows of a run, each block of rows from its own child stream, so the rows come
+    out the same however they are chunked. A block's rows must be drawn in order; blocks are
+    independent, so different workers can draw different blocks.
+    """
+    def __init__(self, seed: SeedLike, blocks: List[Tuple[int, int]]):
+        streams = RandomStreams(seed)
+        self.blocks = blocks
+        self.generators = [streams.generator(i) for i in range(len(blocks))]
+
+    def segments(self, start: int, stop: int) -> Iterator[Tuple[np.random.Generator, int, int]]:
+        """(generator, start, stop) of each block's share of rows start..stop, in row order."""
+        for generator, (block_start, block_stop) in zip(self.generators, self.blocks):
+            if block_start < stop and block_stop > start:
+                yield generator, max(start, block_start), min(stop, block_stop)
+
+    def draw(self, start: int, stop: int, draw: Callable[[np.random.Generator, int], np.ndarray]) -> np.ndarray:
+        """Rows start..stop, where draw(generator, count) draws count rows from a block's stream."""
+        parts = [draw(generator, segment_stop - segment_start)
+                 for generator, segment_start, segment_stop in self.segments(start, stop)]
+        if not parts:
+            return draw(self.generators[0], 0)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
@@ -0,0 +1,153 @@
+"""
+Response encoding: a numpy/pandas-aware JSON response built on orjson, and an ASGI middleware
+that compresses responses with brotli or gzip when the client accepts it. Brotli is optional
+(pip install brotli); without it clients are offered gzip only.
+"""
+import os
+import zlib
+from datetime import datetime
+from typing import Any, Optional
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; streamed bodies are always compressed when negotiated
+COMPRESSION_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+# Simulation payloads are mostly float digits: gzip -1 is a few percent larger than -6 at a sixth of the CPU
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 1))
+BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 4))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(obj: Any) -> Any:
+    """Types orjson does not serialize natively: pandas timestamps and NaT, other numpy/pandas containers, sets, models."""
+    if isinstance(obj, datetime): # pandas.Timestamp and NaT subclass datetime
+        return None if obj != obj else obj.isoformat()
+    tolist = getattr(obj, "tolist", None) # numpy scalars and arrays orjson skips, pandas Series and Index
+    if tolist is not None:
+        return tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "dict"): # Pydantic models
+        return obj.dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serializes to UTF-8 JSON. NaN and infinity become null rather than invalid JSON."""
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with orjson. Returning one from a handler skips FastAPI's
+    jsonable_encoder pass, which dominates for large payloads; encode time and body size
+    are recorded against the current endpoint.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        endpoint = metrics.current_endpoint.get()
+        with metrics.stage_timer("serialize", endpoint):
+            body = dumps(content)
+        metrics.RESPONSE_BODY_BYTES.observe(len(body), endpoint)
+        return body
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks br (when available) or gzip from an Accept-Encoding header, honouring q=0; None means identity."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+class _Compressor:
+    """Incremental br/gzip compressor; each non-final chunk is flushed so streamed lines reach the client."""
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (self._compressor.finish() if final else self._compressor.flush())
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    Compresses JSON, NDJSON and text responses with the encoding negotiated from Accept-Encoding,
+    and records the bytes sent per endpoint and encoding. Whole bodies under minimum_size are sent
+    as-is; streamed bodies are compressed chunk by chunk, flushing after each chunk.
+    """
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        endpoint = metrics.current_endpoint.get() # Captured now: streamed bodies are sent after the metrics middleware returns
+        start_message = None
+        compressor = None
+        wire_bytes = 0
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, wire_bytes
+            if message["type"] == "http.response.start":
+                start_message = message # Held until the first body chunk shows whether to compress
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    headers.add_vary_header("Accept-Encoding")
+                    if (encoding is not None and "content-encoding" not in headers
+                            and (more_body or len(body) >= self.minimum_size)):
+                        compressor = _Compressor(encoding)
+                        headers["Content-Encoding"] = encoding
+                        del headers["Content-Length"]
+                if compressor is not None:
+                    with metrics.stage_timer("compress", endpoint):
+                        body = compressor.compress(body, final=not more_body)
+                    if not more_body:
+                        headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+            elif compressor is not None:
+                with metrics.stage_timer("compress", endpoint):
+                    body = compressor.compress(body, final=not more_body)
+            wire_bytes += len(body)
+            await send({**message, "body": body})
+            if not more_body:
+                metrics.RESPONSE_WIRE_BYTES.observe(wire_bytes, endpoint, compressor.encoding if compressor else "identity")
+
+        await self.app(scope, receive, send_compressed)
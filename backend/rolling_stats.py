@@ -0,0 +1,139 @@
+"""
+Rolling mean, standard deviation, minimum and maximum for many window lengths in one pass over a
+series, in O(n) per window length however long the window is.
+
+Means and standard deviations come from prefix sums of the values and of their squares. The series
+is cut into blocks of the smallest power of two at least as long as the window, so every window
+lies within one block or spans the end of one and the start of the next, and all windows of
+lengths up to that power share one set of sums. Three corrections keep the sums accurate where plain
+running sums cancel: they restart every block, so their rounding does not grow with the series;
+each block's values are taken relative to its first value, so a sum of squares stays close to the
+sum of squared deviations however far the series has drifted; and the two parts of a window that
+spans blocks are merged with the pairwise (Chan et al.) update rather than re-expanded.
+Minimum and maximum use the van Herk/Gil-Werman scan: running extremes forward and backward within
+blocks of the window's length, so every window is one block's suffix and the next block's prefix.
+"""
+from typing import Iterable, Sequence
+
+import numpy as np
+
+STATISTICS = ("mean", "std", "min", "max")
+
+class RollingStatistics:
+    """
+    (windows x values) arrays of each statistic over the trailing window ending at each value,
+    NaN until the window is full, like pandas' rolling(window). Statistics that were not asked
+    for are None.
+    """
+    __slots__ = ("windows", "mean", "std", "min", "max")
+
+    def __init__(self, windows: Sequence[int], **statistics):
+        self.windows = tuple(windows)
+        for name in STATISTICS:
+            setattr(self, name, statistics.get(name))
+
+    def full(self, statistic: str, window: int) -> np.ndarray:
+        """The statistic over every full window of length `window`: len(values) - window + 1 values."""
+        values = getattr(self, statistic)
+        if values is None:
+            raise ValueError(f"Rolling {statistic} was not computed.")
+        return values[self.windows.index(window), window - 1:]
+
+def _blocks(values: np.ndarray, window: int, fill: float) -> np.ndarray:
+    """values cut into rows of `window`, the last one padded with fill."""
+    blocks = -(-len(values) // window)
+    grid = np.full(blocks * window, fill)
+    grid[:len(values)] = values
+    return grid.reshape(blocks, window)
+
+def _sliding_extreme(values: np.ndarray, window: int, extreme: np.ufunc, identity: float) -> np.ndarray:
+    """extreme (np.minimum or np.maximum) over every full window of values."""
+    grid = _blocks(values, window, identity)
+    forward = extreme.accumulate(grid, axis=1).ravel()
+    backward = extreme.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+    return extreme(backward[:len(values) - window + 1], forward[window - 1:len(values)])
+
+class _BlockSums:
+    """Running sums of values and their squares, restarted every `block` values and relative to each block's first value."""
+
+    def __init__(self, values: np.ndarray, block: int):
+        grid = _blocks(values, block, 0.0)
+        shifts = grid[:, 0].copy()
+        grid -= shifts[:, None]
+        grid[-1, (len(values) - 1) % block + 1:] = 0.0 # Padding contributes nothing
+        squares = grid * grid
+        sums, square_sums = np.cumsum(grid, axis=1), np.cumsum(squares, axis=1)
+        self.block = block
+        # Flattened per position: the sums up to and before it, its block's totals, offset and shifts
+        self.sums, self.squares = sums.ravel(), square_sums.ravel()
+        self.sums_before, self.squares_before = (sums - grid).ravel(), (square_sums - squares).ravel()
+        self.block_sums, self.block_squares = np.repeat(sums[:, -1], block), np.repeat(square_sums[:, -1], block)
+        self.offsets = np.tile(np.arange(block, dtype=float), len(shifts))
+        self.shifts = np.repeat(shifts, block)
+        self.next_shifts = np.repeat(np.append(shifts[1:], 0.0), block)
+
+def _sliding_moments(sums: _BlockSums, window: int, count: int):
+    """Mean and sum of squared deviations over the first count windows; sums.block must be at least window."""
+    # The head runs from the window's start to its end or its block's end, the tail on into the next block
+    head_count = np.minimum(sums.block - sums.offsets[:count], window)
+    tail_count = window - head_count
+    spans = tail_count > 0
+    end_sums, end_squares = sums.sums[window - 1:window - 1 + count], sums.squares[window - 1:window - 1 + count]
+    head_sum = np.where(spans, sums.block_sums[:count], end_sums)
+    head_sum -= sums.sums_before[:count]
+    head_squares = np.where(spans, sums.block_squares[:count], end_squares)
+    head_squares -= sums.squares_before[:count]
+    tail_sum = np.where(spans, end_sums, 0.0)
+    tail_squares = np.where(spans, end_squares, 0.0)
+    head_mean = head_sum / head_count
+    tail_mean = np.divide(tail_sum, tail_count, out=np.zeros(count), where=spans)
+    deviations = head_squares - head_sum * head_mean
+    deviations += tail_squares
+    deviations -= tail_sum * tail_mean
+    gap = (sums.next_shifts[:count] + tail_mean) - (sums.shifts[:count] + head_mean)
+    tail_share = tail_count / window
+    deviations += gap * gap * (head_count * tail_share)
+    means = sums.shifts[:count] + head_mean + gap * tail_share
+    return means, np.maximum(deviations, 0.0, out=deviations)
+
+def rolling_statistics(values, windows: Iterable[int], statistics: Sequence[str] = STATISTICS,
+                       ddof: int = 1) -> RollingStatistics:
+    """
+    Rolling statistics of a 1-D series of finite values for each window length. The standard
+    deviation uses ddof degrees of freedom (pandas' default of 1) and is NaN for windows of ddof
+    values or fewer.
+    """
+    values = np.asarray(values, dtype=float)
+    windows = tuple(int(window) for window in windows)
+    unknown = set(statistics) - set(STATISTICS)
+    if unknown:
+        raise ValueError(f"Unsupported rolling statistics: {', '.join(sorted(unknown))}. "
+                         f"Available statistics are: {', '.join(STATISTICS)}")
+    if values.ndim != 1:
+        raise ValueError("Rolling statistics need a one-dimensional series.")
+    if not np.isfinite(values).all():
+        raise ValueError("Rolling statistics need finite values; drop missing values first.")
+    if any(window < 1 for window in windows):
+        raise ValueError("Rolling windows must be at least 1 value long.")
+
+    num_values = len(values)
+    results = {name: np.full((len(windows), num_values), np.nan) for name in statistics}
+    block_sums = {}
+    for row, window in enumerate(windows):
+        if window > num_values:
+            continue
+        if "mean" in results or "std" in results:
+            # Windows up to the same power of two share one set of block sums
+            block = 1 << (window - 1).bit_length()
+            if block not in block_sums:
+                block_sums[block] = _BlockSums(values, block)
+            means, deviations = _sliding_moments(block_sums[block], window, num_values - window + 1)
+            if "mean" in results:
+                results["mean"][row, window - 1:] = means
+            if "std" in results and window > ddof:
+                results["std"][row, window - 1:] = np.sqrt(deviations / (window - ddof))
+        if "min" in results:
+            results["min"][row, window - 1:] = _sliding_extreme(values, window, np.minimum, np.inf)
+        if "max" in results:
+            results["max"][row, window - 1:] = _sliding_extreme(values, window, np.maximum, -np.inf)
+    return RollingStatistics(windows, **results)
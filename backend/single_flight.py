@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from metrics import record_single_flight
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader) runs the
+    function and every caller arriving while it is in flight gets the same result or exception.
+    Nothing is kept once the call completes, so this never serves stale data.
+
+    The in-flight table is shared by event-loop callers (run, which executes the function in the
+    default worker pool, and run_coroutine) and worker threads (run_sync), so all of them coalesce together.
+    Results are shared objects; callers that mutate them must copy first.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._leader_tasks = set() # Strong references so running leader tasks are not garbage collected
+
+    def _join(self, key: Hashable):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        record_single_flight(self.name, leader)
+        return future, leader
+
+    def _settle(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _lead(self, key: Hashable, future: Future, func: Callable, args: tuple, kwargs: dict) -> None:
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+        else:
+            self._settle(key, future, result)
+
+    async def _lead_coroutine(self, key: Hashable, future: Future, coroutine_function: Callable, args: tuple, kwargs: dict) -> None:
+        try:
+            result = await coroutine_function(*args, **kwargs)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+        else:
+            self._settle(key, future, result)
+
+    def run_sync(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Runs func in the calling thread, or waits for an identical call already in flight."""
+        future, leader = self._join(key)
+        if leader:
+            self._lead(key, future, func, args, kwargs)
+        return future.result()
+
+    async def run(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Runs blocking func in the worker pool, or awaits an identical call already in flight."""
+        future, leader = self._join(key)
+        if leader:
+            # Like asyncio.to_thread, carry the caller's context (e.g. the metrics endpoint label)
+            context = contextvars.copy_context()
+            asyncio.get_running_loop().run_in_executor(None, context.run, self._lead, key, future, func, args, kwargs)
+        # Shielded so one caller disconnecting does not cancel the work the others are waiting on
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def run_coroutine(self, key: Hashable, coroutine_function: Callable, *args, **kwargs) -> Any:
+        """Awaits coroutine_function in its own task, or awaits an identical call already in flight."""
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.get_running_loop().create_task(self._lead_coroutine(key, future, coroutine_function, args, kwargs))
+            self._leader_tasks.add(task)
+            task.add_done_callback(self._leader_tasks.discard)
+        return await asyncio.shield(asyncio.wrap_future(future))
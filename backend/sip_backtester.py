@@ -2,8 +2,14 @@
 import pandas as pd
 from scipy.stats import norm, uniform, lognorm, beta
 import numpy as np
+import time
 import traceback
 
+from convergence import ConvergenceMonitor, is_adaptive
+from metrics import record_trials, stage_timer
+from random_streams import RandomStreams, SeedLike
+from variance_reduction import mean_estimates, percentile_estimates, precision_report, standard_error
+
 DISTRIBUTIONS = {
     "Normal": norm,
     "Uniform": uniform,
@@ -13,7 +19,19 @@ DISTRIBUTIONS = {
     # Add more distributions as needed
 }
 
-def run_sip_simulation(file_path: str, column_name: str = None, distribution_name: str = "Normal"):
+def _sip_precision(simulation_data: np.ndarray):
+    """Estimates, standard errors and plain standard errors of the adaptive mode's target metrics."""
+    estimates, blocks, plain = percentile_estimates(simulation_data, [5, 50, 95])
+    mean, mean_blocks, plain_mean_blocks = mean_estimates(simulation_data[:, None])
+    names = ("percentile_5th", "percentile_50th", "percentile_95th", "mean")
+    errors = np.append(standard_error(blocks), standard_error(mean_blocks))
+    plain_errors = np.append(standard_error(plain), standard_error(plain_mean_blocks))
+    return (dict(zip(names, np.append(estimates, mean).tolist())), dict(zip(names, errors.tolist())),
+            dict(zip(names, plain_errors.tolist())))
+
+def run_sip_simulation(file_path: str, column_name: str = None, distribution_name: str = "Normal", num_trials: int = 10000,
+                       tolerance: float = None, time_budget_seconds: float = None, max_trials: int = None,
+                       abs_tolerance: float = None, seed: SeedLike = None):
     """
     Runs a SIP simulation from a given data file (CSV or Excel).
 
@@ -22,28 +40,40 @@ def run_sip_simulation(file_path: str, column_name: str = None, distribution_nam
         column_name (str, optional): The name of the column containing the data. 
                                      If None, the first column is used.
         distribution_name (str, optional): The name of the distribution to fit. Defaults to "Normal".
+        num_trials (int, optional): The number of trials to sample. Defaults to 10000.
+        tolerance (float, optional): Adaptive mode: trials are added in batches until the 95% confidence
+                                     intervals of the 5th/50th/95th percentiles and the mean are within
+                                     this fraction of their estimates. num_trials is then ignored.
+        time_budget_seconds (float, optional): Adaptive mode: stop adding batches when the next one would
+                                               overrun this budget.
+        max_trials (int, optional): Adaptive mode trial cap. Defaults to ADAPTIVE_MAX_TRIALS.
+        abs_tolerance (float, optional): Adaptive mode: a statistic near zero also counts as converged
+                                         once its confidence interval half-width is within this value.
+        seed (int or np.random.Generator, optional): Seeds the trials; a fresh seed is drawn when None.
+                                                     The seed used is returned as "seed".
 
     Returns:
         dict: A dictionary containing simulation results or an error message.
     """
     try:
-        num_trials = 10000 # Define num_trials at the beginning of the function
-        # Read the data from the file
-        if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file_path)
-        else:
-            return {"error": "Unsupported file format. Please use CSV or Excel."}
-
-        # Select the data column
-        if column_name and column_name in df.columns:
-            data_series = df[column_name]
-        else:
-            data_series = df.iloc[:, 0]
-        
-        # Ensure data is numeric and drop non-numeric values
-        data_series = pd.to_numeric(data_series, errors='coerce').dropna()
+        streams = RandomStreams(seed)
+        with stage_timer("parse"):
+            # Read the data from the file
+            if file_path.endswith('.csv'):
+                df = pd.read_csv(file_path)
+            elif file_path.endswith(('.xls', '.xlsx')):
+                df = pd.read_excel(file_path)
+            else:
+                return {"error": "Unsupported file format. Please use CSV or Excel."}
+
+            # Select the data column
+            if column_name and column_name in df.columns:
+                data_series = df[column_name]
+            else:
+                data_series = df.iloc[:, 0]
+
+            # Ensure data is numeric and drop non-numeric values
+            data_series = pd.to_numeric(data_series, errors='coerce').dropna()
 
         if data_series.empty:
             return {"error": "No valid numeric data found in the selected column."}
@@ -55,38 +85,58 @@ def run_sip_simulation(file_path: str, column_name: str = None, distribution_nam
         dist = DISTRIBUTIONS[distribution_name]
 
         # Fit the distribution
-        if distribution_name == "Empirical":
-            # For empirical, directly sample from the data_series
-            simulation_data = np.random.choice(data_series, size=num_trials, replace=True)
-        elif distribution_name == "Uniform":
-            # Uniform distribution fit requires min and max
-            loc, scale = data_series.min(), data_series.max() - data_series.min()
-            params = (loc, scale)
-            simulation_data = dist.rvs(*params, size=num_trials)
-        elif distribution_name == "Beta":
-            # Beta distribution requires data to be in [0, 1]
-            # Normalize data to [0, 1] for Beta distribution fitting
-            min_val = data_series.min()
-            max_val = data_series.max()
-            if min_val == max_val: # Handle constant data
-                normalized_data = np.full_like(data_series, 0.5)
+        with stage_timer("fit"):
+            if distribution_name == "Empirical":
+                params = None # Empirical sampling needs no fit
+            elif distribution_name == "Uniform":
+                # Uniform distribution fit requires min and max
+                loc, scale = data_series.min(), data_series.max() - data_series.min()
+                params = (loc, scale)
+            elif distribution_name == "Beta":
+                # Beta distribution requires data to be in [0, 1]
+                # Normalize data to [0, 1] for Beta distribution fitting
+                min_val = data_series.min()
+                max_val = data_series.max()
+                if min_val == max_val: # Handle constant data
+                    normalized_data = np.full_like(data_series, 0.5)
+                else:
+                    normalized_data = (data_series - min_val) / (max_val - min_val)
+
+                # Ensure no exact 0 or 1 values for beta fit
+                normalized_data = np.clip(normalized_data, 1e-10, 1 - 1e-10)
+
+                a, b, loc, scale = dist.fit(normalized_data)
+                params = (a, b, loc, scale)
             else:
-                normalized_data = (data_series - min_val) / (max_val - min_val)
-            
-            # Ensure no exact 0 or 1 values for beta fit
-            normalized_data = np.clip(normalized_data, 1e-10, 1 - 1e-10)
-            
-            a, b, loc, scale = dist.fit(normalized_data)
-            params = (a, b, loc, scale)
-            simulation_data = dist.rvs(*params, size=num_trials)
-            simulation_data = simulation_data * (max_val - min_val) + min_val
-        else:
-            # For Normal, Log-Normal, etc., use standard fit
-            params = dist.fit(data_series)
-            simulation_data = dist.rvs(*params, size=num_trials)
-        
-        
-        simulation_data = np.asarray(simulation_data) # Ensure it's a NumPy array
+                # For Normal, Log-Normal, etc., use standard fit
+                params = dist.fit(data_series)
+
+        def draw_trials(count: int, batch: int = 0) -> np.ndarray:
+            generator = streams.generator("trials", batch)
+            if distribution_name == "Empirical":
+                # For empirical, directly sample from the data_series
+                samples = generator.choice(data_series.to_numpy(), size=count, replace=True)
+            else:
+                samples = dist.rvs(*params, size=count, random_state=generator)
+                if distribution_name == "Beta":
+                    samples = samples * (max_val - min_val) + min_val
+            return np.asarray(samples) # Ensure it's a NumPy array
+
+        sampling_start = time.perf_counter()
+        monitor = None
+        with stage_timer("path_generation"):
+            if is_adaptive(tolerance, time_budget_seconds):
+                monitor = ConvergenceMonitor(tolerance, time_budget_seconds, max_trials, abs_tolerance=abs_tolerance)
+                batches = []
+                while True:
+                    batches.append(draw_trials(monitor.next_batch(), len(batches)))
+                    simulation_data = np.concatenate(batches)
+                    estimates, errors, plain_errors = _sip_precision(simulation_data)
+                    if monitor.record(len(simulation_data), estimates, errors):
+                        break
+            else:
+                simulation_data = draw_trials(num_trials)
+        record_trials("sip", len(simulation_data), time.perf_counter() - sampling_start)
 
         # Calculate summary statistics
         summary_stats = {
@@ -99,13 +149,135 @@ def run_sip_simulation(file_path: str, column_name: str = None, distribution_nam
             "percentile_95th": np.percentile(simulation_data, 95),
         }
 
-        return {
+        results = {
             "summary_stats": summary_stats,
             "simulation_data": simulation_data.tolist(), # Convert to list for JSON serialization
+            "seed": streams.seed,
             "error": None
         }
+        if monitor is not None:
+            results["adaptive"] = monitor.report()
+            results["precision"] = precision_report("none", len(simulation_data), errors, plain_errors)
+        return results
 
     except Exception as e:
         full_traceback = traceback.format_exc()
         return {"error": f"An error occurred during simulation: {str(e)}\nFull Traceback:\n{full_traceback}"}
 
+
+
+def _summarise_trials(simulation_data: np.ndarray) -> list:
+    """Computes the run_sip_simulation summary statistics row-wise for a (tickers, trials) array."""
+    percentiles = np.percentile(simulation_data, [5, 50, 95], axis=1)
+    means = simulation_data.mean(axis=1)
+    stds = simulation_data.std(axis=1)
+    mins = simulation_data.min(axis=1)
+    maxs = simulation_data.max(axis=1)
+    return [
+        {
+            "mean": float(means[i]),
+            "std_dev": float(stds[i]),
+            "min": float(mins[i]),
+            "max": float(maxs[i]),
+            "percentile_5th": float(percentiles[0, i]),
+            "percentile_50th": float(percentiles[1, i]),
+            "percentile_95th": float(percentiles[2, i]),
+        }
+        for i in range(simulation_data.shape[0])
+    ]
+
+def _draw_rows(generators: list, num_trials: int, method: str) -> np.ndarray:
+    """A (series, trials) array whose row i is filled by generators[i].<method>, e.g. "standard_normal"."""
+    rows = np.empty((len(generators), num_trials))
+    for generator, row in zip(generators, rows):
+        getattr(generator, method)(out=row)
+    return rows
+
+def run_sip_simulation_batch(series_by_name: dict, distribution_name: str = "Normal", num_trials: int = 10000,
+                             seed: SeedLike = None) -> dict:
+    """
+    Runs the SIP simulation for many data series at once.
+
+    Normal, Uniform and Empirical fits have closed forms, so every series is fitted and sampled
+    in a single (series, trials) array operation. Log-Normal and Beta have no closed-form fit and
+    are fitted per series, but still sampled and summarised together. Each series draws from its
+    own stream of the seed, keyed by its name, so its trials do not depend on which other series
+    share the batch.
+
+    Args:
+        series_by_name (dict): Mapping of name (e.g. ticker) to a pandas Series of observations.
+        distribution_name (str, optional): The name of the distribution to fit. Defaults to "Normal".
+        num_trials (int, optional): Number of trials per series. Defaults to 10000.
+        seed (int or np.random.Generator, optional): Seeds the trials; a fresh seed is drawn when None.
+
+    Returns:
+        dict: Mapping of name to {"summary_stats": ..., "seed": ..., "error": ...}, matching run_sip_simulation.
+    """
+    if distribution_name not in DISTRIBUTIONS:
+        error = f"Unsupported distribution: {distribution_name}. Available distributions are: {', '.join(DISTRIBUTIONS.keys())}"
+        return {name: {"summary_stats": None, "error": error} for name in series_by_name}
+
+    results = {}
+    names = []
+    columns = []
+    for name, series in series_by_name.items():
+        values = pd.to_numeric(pd.Series(np.asarray(series).ravel()), errors='coerce').dropna().to_numpy(dtype=float)
+        if values.size == 0:
+            results[name] = {"summary_stats": None, "error": "No valid numeric data found in the selected column."}
+            continue
+        names.append(name)
+        columns.append(values)
+
+    if not names:
+        return results
+
+    # Pad to a rectangular (series, observations) array so the closed-form fits run in one pass
+    lengths = np.array([len(values) for values in columns])
+    padded = np.full((len(columns), lengths.max()), np.nan)
+    for i, values in enumerate(columns):
+        padded[i, :lengths[i]] = values
+
+    sampling_start = time.perf_counter()
+    try:
+        streams = RandomStreams(seed)
+        generators = [streams.generator("series", str(name)) for name in names]
+        # Closed-form fits and sampling happen in the same vectorized pass, so they are timed together
+        with stage_timer("path_generation"):
+            if distribution_name == "Normal":
+                # MLE fit, identical to norm.fit: mean and population standard deviation
+                loc = np.nanmean(padded, axis=1)
+                scale = np.nanstd(padded, axis=1)
+                simulation_data = loc[:, None] + scale[:, None] * _draw_rows(generators, num_trials, "standard_normal")
+            elif distribution_name == "Uniform":
+                loc = np.nanmin(padded, axis=1)
+                scale = np.nanmax(padded, axis=1) - loc
+                simulation_data = loc[:, None] + scale[:, None] * _draw_rows(generators, num_trials, "random")
+            elif distribution_name == "Empirical":
+                # Sample with replacement from each row's own observations only
+                sample_idx = (_draw_rows(generators, num_trials, "random") * lengths[:, None]).astype(np.intp)
+                simulation_data = np.take_along_axis(padded, sample_idx, axis=1)
+            else:
+                dist = DISTRIBUTIONS[distribution_name]
+                simulation_data = np.empty((len(names), num_trials))
+                for i, values in enumerate(columns):
+                    if distribution_name == "Beta":
+                        min_val, max_val = values.min(), values.max()
+                        if min_val == max_val:
+                            normalized_data = np.full_like(values, 0.5)
+                        else:
+                            normalized_data = (values - min_val) / (max_val - min_val)
+                        normalized_data = np.clip(normalized_data, 1e-10, 1 - 1e-10)
+                        params = dist.fit(normalized_data)
+                        simulation_data[i] = dist.rvs(*params, size=num_trials, random_state=generators[i]) * (max_val - min_val) + min_val
+                    else:
+                        params = dist.fit(values)
+                        simulation_data[i] = dist.rvs(*params, size=num_trials, random_state=generators[i])
+    except Exception as e:
+        error = f"An error occurred during simulation: {str(e)}"
+        results.update({name: {"summary_stats": None, "error": error} for name in names})
+        return results
+    record_trials("sip_batch", len(names) * num_trials, time.perf_counter() - sampling_start)
+
+    for name, summary_stats in zip(names, _summarise_trials(simulation_data)):
+        results[name] = {"summary_stats": summary_stats, "seed": streams.seed, "error": None}
+    return results
@@ -1,7 +1,31 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
-from scipy.stats import norm, uniform, lognorm, beta, multivariate_normal # Import necessary distributions
+from typing import List, Dict, Any, Optional, Sequence, Union
+from scipy.stats import norm, uniform, lognorm, beta # Import necessary distributions
+import time
+
+from convergence import ADAPTIVE_MAX_TRIALS, ConvergenceMonitor, is_adaptive
+from engine_core import column, evaluate_paths, flatten_trades, max_drawdowns
+from factor_models import fit_covariance_factor
+from feature_store import FeatureWindow
+from memory_planner import plan_optimiser
+from metrics import record_trials, stage_timer
+from random_streams import RandomStreams, SeedLike, as_generator
+from rolling_stats import rolling_statistics
+from tracing import TRACE, DEBUG, get_tracer
+from variance_reduction import (TrialSampler, check_mode, mean_estimates, precision_report,
+                                replicate_blocks, standard_error)
+
+_trace = get_tracer("strategy_optimiser")
+
+STRATEGY_DIRECTIONS = {"long": 1, "short": -1}
+
+# Composite Score = (Weight_PnL * PnL) + (Weight_Sharpe * Sharpe) - (Weight_Drawdown * Drawdown)
+WEIGHT_PNL = 0.4
+WEIGHT_SHARPE = 0.3
+WEIGHT_DRAWDOWN = 0.3 # Negative weight as lower drawdown is better
+# Strategy metrics that get a standard error, in the column order of _strategy_metrics
+PRECISION_METRICS = ("total_pnl", "sharpe_ratio", "max_drawdown", "composite_score")
 
 # Assuming SIP and SLURP classes are defined elsewhere or will be defined here
 # For now, I'll include simplified versions or assume they are available.
@@ -68,7 +92,7 @@ class SLURP:
     def __repr__(self):
         return f"SLURP(num_trials={self.num_trials}, sips={list(self.sips.keys())})"
 
-def generate_sip_from_distribution(distribution_name: str, params: tuple, num_trials: int = 10000) -> SIP:
+def generate_sip_from_distribution(distribution_name: str, params: tuple, num_trials: int = 10000, seed: SeedLike = None) -> SIP:
     """Generates a SIP by sampling from a specified distribution."""
     DISTRIBUTIONS = {
         "Normal": norm,
@@ -80,20 +104,36 @@ def generate_sip_from_distribution(distribution_name: str, params: tuple, num_tr
         raise ValueError(f"Unsupported distribution: {distribution_name}")
     
     dist = DISTRIBUTIONS[distribution_name]
-    samples = dist.rvs(*params, size=num_trials)
+    samples = dist.rvs(*params, size=num_trials, random_state=as_generator(seed))
     return SIP(samples)
 
-def generate_empirical_sip(data_series: pd.Series, num_trials: int = 10000) -> SIP:
-    """Generates an empirical SIP by sampling with replacement from a given data series."""
+def generate_empirical_sip(data_series: pd.Series, num_trials: int = 10000, variance_reduction: str = "none",
+                           seed: SeedLike = None) -> SIP:
+    """
+    Generates an empirical SIP by sampling with replacement from a given data series.
+    Antithetic and Sobol sampling read the sorted data at uniform quantiles instead.
+    """
     if data_series.empty:
         raise ValueError("Data series for empirical SIP cannot be empty.")
-    samples = np.random.choice(data_series, size=num_trials, replace=True)
+    if check_mode(variance_reduction) in ("antithetic", "sobol"):
+        sorted_data = np.sort(np.asarray(data_series, dtype=float))
+        uniforms = TrialSampler(variance_reduction, num_trials, 1, seed).uniforms(0, num_trials)[:, 0]
+        samples = sorted_data[(uniforms * len(sorted_data)).astype(np.int64)]
+    else:
+        samples = as_generator(seed).choice(np.asarray(data_series), size=num_trials, replace=True)
     return SIP(samples)
 
-def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials: int = 10000) -> SLURP:
+def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials: int = 10000,
+                              variance_reduction: str = "none", normals: Optional[np.ndarray] = None,
+                              seed: SeedLike = None, covariance_model: str = "dense",
+                              num_factors: Optional[int] = None) -> SLURP:
     """
     Generates a SLURP for specified correlated columns from historical data.
-    Assumes data is stationary and can be modeled by a multivariate normal distribution.
+    Assumes data is stationary and can be modeled by a multivariate normal distribution, whose
+    covariance is factorised once per distinct data (see factor_models) under covariance_model.
+    normals, (num_trials x normal_dim) standard normals, overrides the variance_reduction draws;
+    normal_dim is len(columns) under the dense model. Callers that need coherent multi-day paths
+    pass rows from their own TrialSampler.
     """
     if not columns or len(columns) < 2:
         raise ValueError("At least two columns are required to generate a correlated SLURP.")
@@ -104,11 +144,12 @@ def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials
     if clean_data.empty:
         raise ValueError("Cleaned data for SLURP generation is empty. Check columns or NaNs.")
 
-    mean_vec = clean_data.mean().values
-    cov_mat = clean_data.cov().values
+    factor = fit_covariance_factor(clean_data.to_numpy(), covariance_model, num_factors)
 
     # Generate correlated samples
-    correlated_samples = multivariate_normal.rvs(mean=mean_vec, cov=cov_mat, size=num_trials)
+    if normals is None:
+        normals = TrialSampler(variance_reduction, num_trials, factor.normal_dim, seed).normals(0, num_trials)
+    correlated_samples = factor.sample(normals)
 
     sips = {}
     for i, col_name in enumerate(columns):
@@ -117,28 +158,99 @@ def generate_correlated_slurp(data: pd.DataFrame, columns: List[str], num_trials
     return SLURP(sips)
 # --- End SIP and SLURP Classes ---
 
+def _strategy_metrics(path_means: np.ndarray, paths: int) -> np.ndarray:
+    """
+    total_pnl, sharpe_ratio, max_drawdown and composite_score (last axis) from the per-path means
+    of [trade PnL sum, squared trade PnL sum, trade count, max drawdown] over `paths` paths. These
+    are _simulate_strategy's formulas, so they apply to a whole run or to one replicate block.
+    """
+    pnl_sums, pnl_squares, trades, drawdowns = np.moveaxis(np.asarray(path_means, dtype=float), -1, 0)
+    trade_count = trades * paths
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_pnl = np.where(trades > 0, pnl_sums / trades, 0.0)
+        variance = np.where(trade_count > 1, (pnl_squares / trades - mean_pnl ** 2) * trade_count / (trade_count - 1), 0.0)
+        std_pnl = np.sqrt(np.clip(variance, 0.0, None))
+        sharpe_ratio = np.where(std_pnl > 0, mean_pnl / std_pnl * np.sqrt(252), 0.0)
+    total_pnl = mean_pnl * 100
+    composite_score = WEIGHT_PNL * total_pnl + WEIGHT_SHARPE * sharpe_ratio - WEIGHT_DRAWDOWN * drawdowns
+    return np.stack([total_pnl, sharpe_ratio, drawdowns, composite_score], axis=-1)
+
 
 class StrategyOptimiser:
     def __init__(self, historical_data: pd.DataFrame, num_simulations: int,
-                 volatility_lookback_days: int, return_distribution_percentiles: List[float],
-                 strategy_count: int):
+                 volatility_lookback_days: Union[int, Sequence[int]], return_distribution_percentiles: List[float],
+                 strategy_count: int, memory_budget_bytes: Optional[int] = None,
+                 variance_reduction: str = "none", tolerance: Optional[float] = None,
+                 time_budget_seconds: Optional[float] = None, max_trials: Optional[int] = None,
+                 seed: SeedLike = None, features: Optional[FeatureWindow] = None,
+                 forecast_horizon: Optional[int] = None, abs_tolerance: Optional[float] = None):
         self.historical_data = historical_data
+        # historical_data's bars from the feature store; returns and volatility are derived from the prices when None
+        if features is not None and len(features) != len(historical_data):
+            features = None
+        self.features = features
         self.num_simulations = num_simulations
-        self.volatility_lookback_days = volatility_lookback_days
+        # One lookback, or several evaluated together: their volatilities come from one rolling pass, and
+        # as the lookback only sets the volatility window of the entry gate and the SLURP, every lookback's
+        # strategies are evaluated on the same price paths. volatility_lookback_days is the one in use.
+        lookbacks = [volatility_lookback_days] if np.isscalar(volatility_lookback_days) else list(volatility_lookback_days)
+        if not lookbacks or min(lookbacks) < 2:
+            raise ValueError("At least one volatility lookback, of at least 2 days each, is required.")
+        self.volatility_lookbacks = sorted({int(lookback) for lookback in lookbacks})
+        self.volatility_lookback_days = self.volatility_lookbacks[-1]
+        # Days simulated per path, the same for every lookback; defaults to the (first listed) lookback
+        self.forecast_horizon = int(lookbacks[0] if forecast_horizon is None else forecast_horizon)
+        if self.forecast_horizon < 1:
+            raise ValueError("forecast_horizon must be at least 1 day.")
+        self.memory_budget_bytes = memory_budget_bytes
         self.return_distribution_percentiles = return_distribution_percentiles
         self.strategy_count = strategy_count
-
-        # Ensure sufficient historical data
+        # "none", "antithetic", "control_variate" or "sobol"
+        self.variance_reduction = check_mode(variance_reduction)
+        # Adaptive mode: num_simulations is replaced by batches of paths, up to max_trials
+        # (ADAPTIVE_MAX_TRIALS by default), until total_pnl and composite_score meet the tolerance
+        # (or, near zero, abs_tolerance)
+        self.tolerance = tolerance
+        self.abs_tolerance = abs_tolerance
+        self.time_budget_seconds = time_budget_seconds
+        self.max_trials = max_trials
+        # Int or np.random.Generator; every draw comes from a child stream, so the run replays from self.seed
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+
+        # Ensure sufficient historical data for the longest lookback
         if len(self.historical_data) < self.volatility_lookback_days + 2: # Need at least 2 for pct_change, and then enough for rolling window
             raise ValueError(f"Insufficient historical data for the specified volatility lookback days ({self.volatility_lookback_days}). "
                              f"Need at least {self.volatility_lookback_days + 2} data points, but got {len(self.historical_data)}.")
 
-        self.returns = self._calculate_returns()
-        self.volatility = self._calculate_volatility()
+        with stage_timer("parse"):
+            self.returns = self._calculate_returns()
+            self.close_prices = column(self.historical_data, 'Close')
+            self.volatilities = self._calculate_volatilities()
+
+            self.last_volatilities = {lookback: float(volatility.iloc[-1]) for lookback, volatility in self.volatilities.items()}
+            self._use_lookback(self.volatility_lookbacks[0])
+
+        # Paths are generated and evaluated a chunk at a time so the run stays within the memory budget
+        planned_paths = self.num_simulations
+        if is_adaptive(tolerance, time_budget_seconds):
+            planned_paths = ADAPTIVE_MAX_TRIALS if max_trials is None else max_trials
+        self.memory_plan = plan_optimiser(planned_paths, self.forecast_horizon, memory_budget_bytes)
+        _trace.debug("memory plan: %r", self.memory_plan, **self.memory_plan.as_dict())
+
+    def _use_lookback(self, lookback: int) -> None:
+        """Points the volatility percentiles, entry gate and SLURP data at one lookback."""
+        self.volatility_lookback_days = lookback
+        self.volatility = self.volatilities[lookback]
         self.slurp_data = self._prepare_slurp_data()
+        self.last_volatility = self.last_volatilities[lookback]
+        # The simulated daily returns' analytic mean, for the control variate
+        self.mean_return = float(self.slurp_data['returns'].mean())
 
     def _calculate_returns(self) -> pd.Series:
         """Calculates daily returns from 'Close' prices."""
+        if self.features is not None:
+            return pd.Series(self.features.returns, index=self.historical_data.index[1:])
         close_prices = self.historical_data['Close']
         if isinstance(close_prices, pd.DataFrame):
             # If 'Close' is a DataFrame (e.g., single column DataFrame), convert to Series
@@ -151,13 +263,18 @@ class StrategyOptimiser:
         
         return close_prices.astype(float).pct_change().dropna()
 
-    def _calculate_volatility(self) -> pd.Series:
-        """Calculates rolling volatility (standard deviation of returns)."""
+    def _calculate_volatilities(self) -> Dict[int, pd.Series]:
+        """Calculates rolling volatility (standard deviation of returns) for every lookback in one pass."""
         if len(self.returns) < self.volatility_lookback_days:
             raise ValueError(f"Insufficient returns data ({len(self.returns)} points) to calculate rolling volatility "
                              f"with a lookback of {self.volatility_lookback_days} days.")
-        # Ensure we are operating on a Series, and the result is a Series
-        return self.returns.rolling(window=self.volatility_lookback_days).std().dropna().squeeze()
+        if self.features is not None:
+            volatilities = self.features.volatilities(self.volatility_lookbacks)
+        else:
+            statistics = rolling_statistics(self.returns.to_numpy(), self.volatility_lookbacks, ("std",))
+            volatilities = {lookback: statistics.full("std", lookback) for lookback in self.volatility_lookbacks}
+        return {lookback: pd.Series(values, index=self.returns.index[lookback - 1:]).dropna()
+                for lookback, values in volatilities.items()}
 
     def _prepare_slurp_data(self) -> pd.DataFrame:
         """Prepares data for SLURPS, including returns and volatility."""
@@ -168,22 +285,28 @@ class StrategyOptimiser:
         if self.volatility.empty:
             raise ValueError("Volatility data is empty. Cannot prepare SLURPS data.")
 
-        print(f"DEBUG: self.returns type: {type(self.returns)}, shape: {self.returns.shape}, head: {self.returns.head()}")
-        print(f"DEBUG: self.volatility type: {type(self.volatility)}, shape: {self.volatility.shape}, head: {self.volatility.head()}")
+        if _trace.is_enabled(DEBUG):
+            _trace.debug("returns shape %s, volatility shape %s", self.returns.shape, self.volatility.shape,
+                         returns_head=self.returns.head().tolist(), volatility_head=self.volatility.head().tolist())
 
+        # Rows start where the longest lookback's volatility does, so every lookback simulates the same returns
         df = pd.DataFrame({
             'returns': self.returns,
             'volatility': self.volatility
-        }).dropna()
+        }).loc[self.volatilities[self.volatility_lookbacks[-1]].index[0]:].dropna()
         if df.empty:
             raise ValueError("Prepared SLURPS data (returns and volatility) is empty after alignment and dropping NaNs. "
                              "This might indicate insufficient or misaligned data.")
         return df
 
-    def _run_slurp_simulation(self, initial_price: float, num_trials: int, forecast_horizon: int) -> np.ndarray:
+    @stage_timer("path_generation")
+    def _run_slurp_simulation(self, initial_price: float, num_trials: int, forecast_horizon: int,
+                              normals: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Runs a SLURPS simulation to generate correlated price paths.
         Leverages generate_correlated_slurp to get correlated returns and volatility.
+        normals, (num_trials x forecast_horizon * 2) standard normals, makes each path one row of
+        a TrialSampler (an antithetic or quasi-random point in those modes); plain draws are used when it is None.
         """
         if self.slurp_data.empty:
             raise ValueError("SLURPS data (returns and volatility) is empty. Cannot run simulation.")
@@ -192,7 +315,8 @@ class StrategyOptimiser:
         slurp_samples = generate_correlated_slurp(
             self.slurp_data,
             columns=['returns', 'volatility'],
-            num_trials=num_trials * forecast_horizon
+            num_trials=num_trials * forecast_horizon,
+            normals=None if normals is None else normals.reshape(num_trials * forecast_horizon, 2)
         )
 
         # Extract simulated returns and volatility
@@ -291,103 +415,129 @@ class StrategyOptimiser:
         
         return strategies
 
-    def _simulate_strategy(self, strategy_rules: Dict[str, Any]) -> Dict[str, Any]:
+    def _entry_allowed(self, strategy_rules: Dict[str, Any]) -> bool:
         """
-        Simulates a single strategy using the generated SLURPS data,
-        calculating key performance metrics.
+        Entries are gated on the last historical volatility over the strategy's lookback, which is
+        the same for every path and bar.
         """
-        initial_price_series = self.historical_data['Close'].iloc[-1]
-        # Ensure initial_price is a scalar float, not a Series
-        if isinstance(initial_price_series, pd.Series):
-            initial_price = initial_price_series.iloc[0]
-        else:
-            initial_price = initial_price_series
+        entry_threshold_volatility = strategy_rules.get("entry_threshold_volatility")
+        if entry_threshold_volatility is None:
+            return True
+        last_volatility = self.last_volatilities[strategy_rules.get("volatility_lookback_days") or self.volatility_lookback_days]
+        if strategy_rules.get("type") == "long":
+            return last_volatility < entry_threshold_volatility
+        return last_volatility > entry_threshold_volatility
+
+    def _evaluate_price_paths(self, price_paths: np.ndarray, initial_price: float, strategy_rules: Dict[str, Any],
+                              path_offset: int = 0):
+        """
+        Applies a strategy's entry, exit and stop rules to every simulated price path.
+        Returns the per-trade PnL percentages, per-path max drawdowns, the number of winning trades and
+        each path's (trade PnL sum, squared trade PnL sum, trade count).
+        path_offset is the index of the first path, for tracing chunks of a larger run.
+        """
+        pnls, trade_counts, wins = evaluate_paths(
+            price_paths, STRATEGY_DIRECTIONS.get(strategy_rules.get("type"), 0),
+            strategy_rules.get("entry_threshold_return"), strategy_rules.get("exit_threshold_return"),
+            strategy_rules.get("stop_threshold_return"), self._entry_allowed(strategy_rules))
+        drawdowns = max_drawdowns(price_paths, initial_price)
 
-        price_paths = self._run_slurp_simulation(initial_price, self.num_simulations, self.volatility_lookback_days) # Using volatility_lookback_days as forecast_horizon for now
+        if _trace.is_enabled(TRACE):
+            for i, (drawdown, trades) in enumerate(zip(drawdowns.tolist(), np.cumsum(trade_counts).tolist())):
+                _trace.trace("path evaluated", strategy=strategy_rules.get("name"), path=path_offset + i, max_drawdown=drawdown, trades=trades)
 
-        trial_pnls = []
-        peak_values = np.zeros(self.num_simulations)
-        drawdowns = np.zeros(self.num_simulations)
-        wins = 0
-        
-        # Extract rules for easier access
-        entry_threshold_return = strategy_rules.get("entry_threshold_return")
-        exit_threshold_return = strategy_rules.get("exit_threshold_return")
-        stop_threshold_return = strategy_rules.get("stop_threshold_return")
-        entry_threshold_volatility = strategy_rules.get("entry_threshold_volatility")
-        strategy_type = strategy_rules.get("type")
+        path_totals = np.column_stack([pnls.sum(axis=1), np.square(pnls).sum(axis=1), trade_counts])
+        return flatten_trades(pnls, trade_counts).tolist(), drawdowns, int(wins.sum()), path_totals
 
-        for i in range(self.num_simulations):
-            current_price = initial_price
-            portfolio_value = initial_price # Assuming 1 unit of asset
-            in_position = False
-            position_entry_price = 0
-            
-            trial_returns = np.diff(price_paths[i]) / price_paths[i, :-1] # Daily returns for this path
-
-            for t in range(len(trial_returns)):
-                daily_return = trial_returns[t]
-                # daily_volatility = ... (would need to be simulated or derived from simulated returns)
-                # For simplicity, we'll use the simulated daily_return for now.
-
-                # Entry Logic
-                if not in_position:
-                    if strategy_type == "long":
-                        if daily_return > entry_threshold_return: # Simplified entry condition
-                            if entry_threshold_volatility is None or self.volatility.iloc[-1] < entry_threshold_volatility: # Using last historical volatility for entry
-                                in_position = True
-                                position_entry_price = price_paths[i, t+1] # Price at which position is entered
-                    elif strategy_type == "short":
-                        if daily_return < entry_threshold_return: # Simplified entry condition
-                            if entry_threshold_volatility is None or self.volatility.iloc[-1] > entry_threshold_volatility: # Using last historical volatility for entry
-                                in_position = True
-                                position_entry_price = price_paths[i, t+1] # Price at which position is entered
-                # Exit and Stop Loss Logic
-                elif in_position:
-                    current_price = price_paths[i, t+1]
-                    
-                    # Calculate PnL for the current position
-                    if strategy_type == "long":
-                        pnl_pct = (current_price - position_entry_price) / position_entry_price
-                    else: # short
-                        pnl_pct = (position_entry_price - current_price) / position_entry_price
-
-                    # Check for exit rule
-                    if strategy_type == "long" and daily_return < exit_threshold_return:
-                        in_position = False
-                        trial_pnls.append(pnl_pct)
-                        if pnl_pct > 0: wins += 1
-                    elif strategy_type == "short" and daily_return > exit_threshold_return:
-                        in_position = False
-                        trial_pnls.append(pnl_pct)
-                        if pnl_pct > 0: wins += 1
-                    
-                    # Check for stop loss
-                    elif strategy_type == "long" and daily_return < stop_threshold_return:
-                        in_position = False
-                        trial_pnls.append(pnl_pct) # Stop loss implies a negative PnL
-                    elif strategy_type == "short" and daily_return > stop_threshold_return:
-                        in_position = False
-                        trial_pnls.append(pnl_pct) # Stop loss implies a negative PnL
-
-            # If still in position at the end of the forecast horizon, close it
-            if in_position:
-                if strategy_type == "long":
-                    pnl_pct = (price_paths[i, -1] - position_entry_price) / position_entry_price
-                else: # short
-                    pnl_pct = (position_entry_price - price_paths[i, -1]) / position_entry_price
-                trial_pnls.append(pnl_pct)
-                if pnl_pct > 0: wins += 1
-
-            # Calculate drawdown for this trial's price path
-            if len(price_paths[i]) > 0:
-                print(f"DEBUG: price_paths[i] type: {type(price_paths[i])}, shape: {price_paths[i].shape}")
-                print(f"DEBUG: initial_price type: {type(initial_price)}, value: {initial_price}")
-                cumulative_returns = price_paths[i] / initial_price
-                peak_values[i] = np.maximum.accumulate(cumulative_returns).max()
-                drawdowns[i] = ((peak_values[i] - cumulative_returns) / peak_values[i]).max()
-            else:
-                drawdowns[i] = 0 # No drawdown if no price path
+    def _simulate_paths(self, variants: List[Dict[str, Any]], initial_price: float, num_paths: int, path_offset: int = 0):
+        """
+        Generates num_paths price paths, a memory-plan chunk at a time, and evaluates each variant of
+        a strategy (its rules under each lookback) on them. Returns, per variant, the trade PnLs, the
+        per-path (trade PnL sum, squared trade PnL sum, trade count, max drawdown) and the number of
+        winning trades, with the per-path control variate (None unless that mode is on).
+        path_offset is the index of the first path, for batches of an adaptive run.
+        """
+        # One row per path: its days' (return, volatility) normals, from the strategy's stream for these paths
+        sampler = TrialSampler(self.variance_reduction, num_paths, 2 * self.forecast_horizon,
+                               self.streams.child("paths", variants[0].get("name", ""), path_offset))
+        # The control variate is each path's mean daily return
+        controls = np.empty(num_paths) if self.variance_reduction == "control_variate" else None
+
+        trial_pnls = [[] for _ in variants]
+        path_stats = [np.zeros((num_paths, 4)) for _ in variants]
+        wins = [0] * len(variants)
+        evaluation_seconds = 0.0
+        for start in range(0, num_paths, self.memory_plan.chunk_size):
+            stop = min(start + self.memory_plan.chunk_size, num_paths)
+            normals = sampler.normals(start, stop)
+            price_paths = self._run_slurp_simulation(initial_price, stop - start, self.forecast_horizon, normals)
+            del normals
+            if controls is not None:
+                controls[start:stop] = (price_paths[:, 1:] / price_paths[:, :-1]).mean(axis=1) - 1
+            evaluation_start = time.perf_counter()
+            with stage_timer("strategy_evaluation"):
+                # A strategy's variants differ only in whether the volatility gate lets them enter
+                evaluated = {}
+                for i, variant in enumerate(variants):
+                    allowed = self._entry_allowed(variant)
+                    if allowed not in evaluated:
+                        evaluated[allowed] = self._evaluate_price_paths(price_paths, initial_price, variant, path_offset + start)
+                    chunk_pnls, path_stats[i][start:stop, 3], chunk_wins, path_stats[i][start:stop, :3] = evaluated[allowed]
+                    trial_pnls[i].extend(chunk_pnls)
+                    wins[i] += chunk_wins
+            evaluation_seconds += time.perf_counter() - evaluation_start
+            del price_paths # Free this chunk's paths before the next chunk is drawn
+        record_trials("strategy_optimiser", num_paths * len(variants), evaluation_seconds)
+        return trial_pnls, path_stats, controls, wins
+
+    def _simulate_strategy(self, variants: List[Dict[str, Any]], time_budget_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Simulates a strategy's variants (its rules under each lookback) on shared SLURPS paths,
+        calculating each one's key performance metrics, and their standard errors under the variance
+        reduction mode. In adaptive mode paths are added in batches until the confidence intervals of
+        every variant's total_pnl and composite_score are within the tolerance, time_budget_seconds
+        runs out or max_trials is reached.
+        """
+        initial_price = self.close_prices[-1]
+        # Metric names carry the lookback when several variants share the monitor
+        suffixes = [f"@{variant['volatility_lookback_days']}" if len(variants) > 1 else "" for variant in variants]
+
+        monitor = None
+        if is_adaptive(self.tolerance, self.time_budget_seconds):
+            monitor = ConvergenceMonitor(self.tolerance, time_budget_seconds, self.max_trials,
+                                         abs_tolerance=self.abs_tolerance)
+            trial_pnls = [[] for _ in variants]
+            batch_stats = [[] for _ in variants]
+            batch_controls, wins = [], [0] * len(variants)
+            while True:
+                batch_pnls, stats, controls, batch_wins = self._simulate_paths(variants, initial_price,
+                                                                              monitor.next_batch(), monitor.trials)
+                batch_controls.append(controls)
+                controls = np.concatenate(batch_controls) if controls is not None else None
+                estimates, errors = {}, {}
+                for i, suffix in enumerate(suffixes):
+                    trial_pnls[i].extend(batch_pnls[i])
+                    batch_stats[i].append(stats[i])
+                    wins[i] += batch_wins[i]
+                    variant_stats = np.concatenate(batch_stats[i])
+                    means, block_means, _ = mean_estimates(variant_stats, controls, self.mean_return)
+                    metrics = _strategy_metrics(means, len(variant_stats))
+                    metric_errors = standard_error(_strategy_metrics(block_means, replicate_blocks(len(variant_stats))[0][1]))
+                    estimates.update({"total_pnl" + suffix: metrics[0], "composite_score" + suffix: metrics[3]})
+                    errors.update({"total_pnl" + suffix: metric_errors[0], "composite_score" + suffix: metric_errors[3]})
+                if monitor.record(len(variant_stats), estimates, errors):
+                    break
+            path_stats = [np.concatenate(stats) for stats in batch_stats]
+        else:
+            trial_pnls, path_stats, controls, wins = self._simulate_paths(variants, initial_price, self.num_simulations)
+        return [self._performance(initial_price, trial_pnls[i], path_stats[i], controls, wins[i], monitor)
+                for i in range(len(variants))]
+
+    def _performance(self, initial_price: float, trial_pnls: List[float], path_stats: np.ndarray,
+                     controls: Optional[np.ndarray], wins: int, monitor: Optional[ConvergenceMonitor]) -> Dict[str, Any]:
+        """A variant's performance metrics and their precision, from its trades and per-path statistics."""
+        num_paths = len(path_stats)
+        drawdowns = path_stats[:, 3]
 
         if not trial_pnls: # Handle case where no trades were made
             total_pnl = 0
@@ -417,36 +567,58 @@ class StrategyOptimiser:
             
             max_drawdown = np.mean(drawdowns) # Average max drawdown across trials
 
+        estimates, block_estimates, plain_estimates = mean_estimates(path_stats, controls, self.mean_return)
+        if controls is not None and trial_pnls:
+            total_pnl, sharpe_ratio, max_drawdown = _strategy_metrics(estimates, num_paths)[:3].tolist()
+            final_portfolio_value = initial_price * (1 + total_pnl / 100)
+        block_paths = replicate_blocks(num_paths)[0][1]
+        precision = precision_report(
+            self.variance_reduction, num_paths,
+            dict(zip(PRECISION_METRICS, standard_error(_strategy_metrics(block_estimates, block_paths)).tolist())),
+            dict(zip(PRECISION_METRICS, standard_error(_strategy_metrics(plain_estimates, block_paths)).tolist())))
+
         return {
             "final_portfolio_value": final_portfolio_value,
             "total_pnl": total_pnl,
             "max_drawdown": max_drawdown,
             "win_rate": win_rate,
             "sharpe_ratio": sharpe_ratio,
-            "sortino_ratio": sortino_ratio
+            "sortino_ratio": sortino_ratio,
+            "precision": precision,
+            **({"adaptive": monitor.report()} if monitor is not None else {})
         }
 
     def run_optimization(self) -> Dict[str, Any]:
         """
         Main method to run the advanced backtest, generate strategies, simulate, and rank them.
         """
-        last_close_price = self.historical_data['Close'].iloc[-1]
-        generated_strategies = self._generate_strategy_rules(last_close_price)
-        
+        last_close_price = float(self.close_prices[-1])
+        # Each strategy's variants: its rules under every lookback. Strategies without a volatility
+        # gate do not depend on the lookback and get a single variant, with no lookback when sweeping.
+        sweeping = len(self.volatility_lookbacks) > 1
+        strategy_variants = {}
+        for lookback in self.volatility_lookbacks:
+            self._use_lookback(lookback)
+            for strategy in self._generate_strategy_rules(last_close_price):
+                variants = strategy_variants.setdefault(strategy["name"], [])
+                gated = strategy["entry_threshold_volatility"] is not None
+                if gated or not variants:
+                    variants.append({**strategy, "volatility_lookback_days": lookback if gated or not sweeping else None})
+        self._use_lookback(self.volatility_lookbacks[0])
+
         results = []
-        for strategy in generated_strategies:
-            performance = self._simulate_strategy(strategy)
-            strategy_with_performance = {**strategy, **performance}
-            results.append(strategy_with_performance)
+        run_start = time.perf_counter()
+        for index, variants in enumerate(strategy_variants.values()):
+            # An adaptive run's time budget is shared out over the strategies still to simulate
+            time_budget_seconds = None
+            if self.time_budget_seconds is not None:
+                remaining = self.time_budget_seconds - (time.perf_counter() - run_start)
+                time_budget_seconds = max(remaining, 1e-3) / (len(strategy_variants) - index)
+            for variant, performance in zip(variants, self._simulate_strategy(variants, time_budget_seconds)):
+                results.append({**variant, "forecast_horizon": self.forecast_horizon, **performance})
             
-        # Rank strategies using a composite score
-        # Composite Score = (Weight_PnL * PnL) + (Weight_Sharpe * Sharpe) - (Weight_Drawdown * Drawdown)
+        # Rank strategies using a composite score (weights at the top of the module)
         # Higher PnL, higher Sharpe, lower Drawdown are better.
-        
-        # Define weights for the composite score
-        WEIGHT_PNL = 0.4
-        WEIGHT_SHARPE = 0.3
-        WEIGHT_DRAWDOWN = 0.3 # Negative weight as lower drawdown is better
 
         for strategy in results:
             # Normalize metrics if necessary, or use raw values if ranges are comparable
@@ -460,7 +632,20 @@ class StrategyOptimiser:
             
         ranked_strategies = sorted(results, key=lambda x: x.get('composite_score', -np.inf), reverse=True)
         
-        return {
+        output = {
             "ranked_strategies": ranked_strategies[:self.strategy_count],
-            "last_close_price": last_close_price
-        }
\ No newline at end of file
+            "last_close_price": last_close_price,
+            "seed": self.seed
+        }
+        if len(self.volatility_lookbacks) > 1:
+            # The best strategy available under each lookback (its volatility-gated strategies and those
+            # without a gate), best lookback first; all were simulated over the same horizon and paths
+            summary = []
+            for lookback in self.volatility_lookbacks:
+                strategy = next(strategy for strategy in ranked_strategies
+                                if strategy["volatility_lookback_days"] in (lookback, None))
+                summary.append({"volatility_lookback_days": lookback, "best_strategy": strategy.get("name"),
+                                "composite_score": strategy["composite_score"], "total_pnl": strategy.get("total_pnl"),
+                                "sharpe_ratio": strategy.get("sharpe_ratio"), "max_drawdown": strategy.get("max_drawdown")})
+            output["lookback_summary"] = sorted(summary, key=lambda row: row["composite_score"], reverse=True)
+        return output
\ No newline at end of file
@@ -0,0 +1,150 @@
+import csv
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Bundled symbol list; point SYMBOL_LIST_PATH at a periodically refreshed file to override it
+BUNDLED_SYMBOLS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols.csv")
+SYMBOL_LIST_PATH = os.environ.get("SYMBOL_LIST_PATH", BUNDLED_SYMBOLS_PATH)
+SYMBOL_INDEX_REFRESH_SECONDS = float(os.environ.get("SYMBOL_INDEX_REFRESH_SECONDS", 3600))
+
+MAX_COMPLETIONS_PER_NODE = 50 # Only the best-ranked completions are kept at each trie node
+FUZZY_MIN_SIMILARITY = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class _PrefixTrie:
+    """Character trie whose nodes hold the ids of the best-ranked entries below them."""
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, key: str, entry_id: int) -> None:
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+            ids = node.setdefault(None, [])
+            # Entries are inserted in rank order, so the first ones kept are the best ones
+            if len(ids) < MAX_COMPLETIONS_PER_NODE and (not ids or ids[-1] != entry_id):
+                ids.append(entry_id)
+
+    def completions(self, prefix: str) -> List[int]:
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(None, [])
+
+class SymbolIndex:
+    """
+    Local, network-free index of tradeable symbols.
+    Supports symbol prefix completion, company-name word prefix matching and
+    trigram fuzzy matching for misspelt queries. Earlier rows in the source list rank higher.
+    """
+    def __init__(self, entries: List[Dict[str, str]]):
+        self.entries = []
+        self._by_symbol = {}
+        self._symbol_trie = _PrefixTrie()
+        self._name_trie = _PrefixTrie()
+        self._trigram_index = {}
+
+        for entry in entries:
+            symbol = entry["symbol"].strip().upper()
+            if not symbol or symbol in self._by_symbol:
+                continue
+            entry_id = len(self.entries)
+            name = entry.get("name", "").strip() or symbol
+            self.entries.append({"ticker": symbol, "name": name, "type": entry.get("type", "")})
+            self._by_symbol[symbol] = entry_id
+            self._symbol_trie.insert(symbol.lower(), entry_id)
+            for token in _TOKEN_RE.findall(name.lower()):
+                self._name_trie.insert(token, entry_id)
+            for trigram in _trigrams(symbol.lower()) | _trigrams(name.lower()):
+                self._trigram_index.setdefault(trigram, []).append(entry_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.strip().upper() in self._by_symbol
+
+    def get(self, symbol: str) -> Optional[Dict[str, str]]:
+        entry_id = self._by_symbol.get(symbol.strip().upper())
+        return None if entry_id is None else self.entries[entry_id]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Returns up to `limit` entries ranked by exact match, symbol prefix, name prefix, then fuzzy similarity."""
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        lowered = query.lower()
+        scores = {}
+
+        exact_id = self._by_symbol.get(query.upper())
+        if exact_id is not None:
+            scores[exact_id] = 3.0
+
+        for entry_id in self._symbol_trie.completions(lowered):
+            scores.setdefault(entry_id, 2.0)
+
+        tokens = _TOKEN_RE.findall(lowered)
+        if tokens:
+            name_matches = set(self._name_trie.completions(tokens[0]))
+            for token in tokens[1:]:
+                name_matches &= set(self._name_trie.completions(token))
+            for entry_id in name_matches:
+                scores.setdefault(entry_id, 1.0)
+
+        if len(scores) < limit:
+            query_trigrams = _trigrams(lowered)
+            shared = {}
+            for trigram in query_trigrams:
+                for entry_id in self._trigram_index.get(trigram, ()):
+                    shared[entry_id] = shared.get(entry_id, 0) + 1
+            for entry_id, count in shared.items():
+                similarity = count / len(query_trigrams)
+                if similarity >= FUZZY_MIN_SIMILARITY and entry_id not in scores:
+                    scores[entry_id] = similarity # Always below the prefix tiers
+
+        ranked = sorted(scores, key=lambda entry_id: (-scores[entry_id], entry_id))
+        return [self.entries[entry_id] for entry_id in ranked[:limit]]
+
+def load_symbol_index(path: str) -> SymbolIndex:
+    """Builds a SymbolIndex from a CSV file with `symbol`, `name` and optional `type` columns."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return SymbolIndex(list(csv.DictReader(f)))
+
+_index = None
+_index_mtime = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+def get_symbol_index() -> SymbolIndex:
+    """
+    Returns the shared SymbolIndex, building it on first use.
+    The source file is re-checked every SYMBOL_INDEX_REFRESH_SECONDS and reloaded if it changed.
+    """
+    global _index, _index_mtime, _index_checked_at
+    now = time.monotonic()
+    if _index is not None and now - _index_checked_at < SYMBOL_INDEX_REFRESH_SECONDS:
+        return _index
+    with _index_lock:
+        if _index is not None and now - _index_checked_at < SYMBOL_INDEX_REFRESH_SECONDS:
+            return _index
+        _index_checked_at = now
+        try:
+            mtime = os.path.getmtime(SYMBOL_LIST_PATH)
+        except OSError as e:
+            if _index is not None:
+                return _index # Keep serving the last good index if the refreshed file disappears
+            raise ValueError(f"Symbol list not found at {SYMBOL_LIST_PATH}: {e}")
+        if _index is None or mtime != _index_mtime:
+            _index = load_symbol_index(SYMBOL_LIST_PATH)
+            _index_mtime = mtime
+        return _index
@@ -0,0 +1,38 @@
+"""
+Shared fixtures. The app runs in-process against a scratch SQLite database and feature store, with
+market data from benchmarks.fakes, so the tests need no network. Run from backend/: python -m pytest
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="vantage-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_SCRATCH_DIR}/test.db")
+os.environ.setdefault("FEATURE_STORE_DIR", os.path.join(_SCRATCH_DIR, "feature_store"))
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+sys.path.insert(0, BACKEND_DIR)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def client(monkeypatch):
+    """An HTTP client on the app, with the schema migrated and downloads served by FakeMarketData."""
+    import httpx
+    import main
+    from benchmarks.fakes import FakeMarketData
+
+    monkeypatch.setattr(main.yf, "download", FakeMarketData().download)
+    await main.run_migrations()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test", timeout=120) as http:
+        yield http
+
+async def auth_headers(client, email: str) -> dict:
+    """Registers email (if new) and returns its bearer-token header."""
+    await client.post("/register", json={"email": email, "password": "pw", "registration_code": "VANTAGE2025"})
+    response = await client.post("/token", data={"username": email, "password": "pw"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
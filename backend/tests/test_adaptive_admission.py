@@ -0,0 +1,14 @@
+import pytest
+
+from conftest import auth_headers
+
+pytestmark = pytest.mark.anyio
+
+async def test_adaptive_run_whose_first_batch_exceeds_the_budget_is_rejected_as_too_large(client):
+    headers = await auth_headers(client, "adaptive@example.com")
+    # 252-day horizon over ten years of bars: the cost budget allows a few hundred trials, under one batch
+    response = await client.post("/api/run_backtester_simulation/", headers=headers, json={
+        "ticker": "ADAPTIVECAP", "years": 10, "forecast_horizon": 252, "tolerance": 0.05, "seed": 1})
+    assert response.status_code == 400
+    assert "exceeds the maximum" in response.json()["detail"]
+    assert "max_trials" not in response.json()["detail"]
@@ -0,0 +1,83 @@
+"""
+The backtester's trade loop runs as an array kernel (engine_core.backtest_trades). These tests
+replay a bundled history through the per-bar pandas loop it replaced and expect the same trades.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtester import BacktesterSimulator
+from benchmarks.fakes import FakeMarketData
+
+def _per_bar_trades(simulator: BacktesterSimulator, sampled_returns: np.ndarray, initial_capital: float) -> dict:
+    """The trade loop as it ran before the array core: one pandas lookup per bar and rule."""
+    frame = simulator.historical_data
+    horizon = simulator.forecast_horizon
+    portfolio_value = initial_capital
+    position_type = None
+    entry_price = 0.0
+    position_size = 0.0
+    draws = iter(sampled_returns)
+    trade_log = []
+    for i in range(horizon, len(frame) - 1):
+        current_date = frame.index[i]
+        current_price = frame['Close'].iloc[i]
+        has_signal = i < len(frame) - horizon
+        if position_type is None:
+            if has_signal:
+                if frame['SIP_Entry_Long_Price'].iloc[i] > current_price * simulator.entry_threshold_factor:
+                    position_type = "long"
+                elif frame['SIP_Entry_Short_Price'].iloc[i] < current_price * (2 - simulator.entry_threshold_factor):
+                    position_type = "short"
+            if position_type is not None:
+                entry_price = current_price
+                position_size = initial_capital / entry_price
+                trade_log.append({"date": current_date, "event": f"ENTRY_{position_type.upper()}", "price": entry_price,
+                                  "position_size": position_size})
+            continue
+
+        simulated_next_price = current_price * (1 + next(draws))
+        long = position_type == "long"
+        trade_pnl = ((simulated_next_price - entry_price) if long else (entry_price - simulated_next_price)) * position_size
+        take_profit, stop_loss = simulator.take_profit_pct, simulator.stop_loss_pct
+        reason = None
+        if take_profit and (simulated_next_price >= entry_price * (1 + take_profit) if long
+                            else simulated_next_price <= entry_price * (1 - take_profit)):
+            reason = "TAKE_PROFIT"
+        elif stop_loss and (simulated_next_price <= entry_price * (1 - stop_loss) if long
+                            else simulated_next_price >= entry_price * (1 + stop_loss)):
+            reason = "STOP_LOSS"
+        elif has_signal and (frame['SIP_Exit_Long_Price'].iloc[i] < current_price * simulator.exit_threshold_factor if long
+                             else frame['SIP_Exit_Short_Price'].iloc[i] > current_price * (2 - simulator.exit_threshold_factor)):
+            reason = "EXIT_RULE"
+        if reason is None:
+            portfolio_value = initial_capital + trade_pnl
+        else:
+            portfolio_value += trade_pnl
+            position_type = None
+            trade_log.append({"date": current_date, "event": reason, "price": simulated_next_price, "pnl": trade_pnl})
+    return {"final_portfolio_value": portfolio_value, "trade_log": trade_log}
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"take_profit_pct": 0.03, "stop_loss_pct": 0.02},
+    {"entry_threshold_factor": 1.0, "exit_threshold_factor": 1.0, "forecast_horizon": 10},
+    # Low entry percentiles never clear the long threshold, so every position is short
+    {"entry_long_percentile": 0.1, "entry_short_percentile": 0.1, "take_profit_pct": 0.03, "stop_loss_pct": 0.02},
+    {"entry_long_percentile": 0.1, "entry_short_percentile": 0.1, "exit_short_percentile": 0.55},
+])
+def test_array_trade_loop_matches_the_per_bar_loop(params):
+    history = FakeMarketData().download("AAPL")
+    simulator = BacktesterSimulator(history, num_trials=2000, seed=42, **params)
+    results = simulator.simulate_trade(initial_capital=100000)
+
+    # The same simulated next-bar returns the kernel consumed, one per bar spent in a position
+    start = simulator.forecast_horizon
+    trial_indices = simulator.streams.generator("trades").integers(
+        0, simulator.num_trials, size=max(len(simulator.close_prices) - 1 - start, 0))
+    expected = _per_bar_trades(simulator, simulator.daily_returns_sip.trials[trial_indices], 100000)
+
+    assert len(expected["trade_log"]) > 0
+    assert results["trade_log"] == expected["trade_log"]
+    assert results["final_portfolio_value"] == expected["final_portfolio_value"]
+    assert isinstance(results["trade_log"][0]["date"], pd.Timestamp)
@@ -0,0 +1,22 @@
+import pytest
+
+import main
+from conftest import auth_headers
+
+pytestmark = pytest.mark.anyio
+
+async def _no_recommendation(prompt: str) -> str:
+    return ""
+
+async def test_portfolio_run_validates_the_covariance_model_and_simulates(client, monkeypatch):
+    monkeypatch.setattr(main, "get_ai_recommendation", _no_recommendation)
+    headers = await auth_headers(client, "portfolio@example.com")
+    response = await client.post("/api/run_portfolio_simulation/", headers=headers, json={
+        "tickers": ["AAPL", "MSFT"], "num_trials": 500, "seed": 2, "covariance_model": "sparse"})
+    assert response.status_code == 400
+    assert "Unsupported covariance model: sparse" in response.json()["detail"]
+
+    response = await client.post("/api/run_portfolio_simulation/", headers=headers, json={
+        "tickers": ["AAPL", "MSFT"], "num_trials": 500, "seed": 2, "covariance_model": "factor"})
+    assert response.status_code == 200, response.text
+    assert response.json()["seed"] == 2
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import text
+
+import main
+from conftest import auth_headers
+from database import engine
+
+pytestmark = pytest.mark.anyio
+
+async def test_pagination_over_rows_without_fractional_seconds(client):
+    headers = await auth_headers(client, "history@example.com")
+    user_id = (await client.post("/users/me/", headers=headers)).json()["id"]
+    # As the old CURRENT_TIMESTAMP server default wrote them: no fractional seconds, two in the same second
+    async with engine.begin() as connection:
+        for created_at in ("2024-01-01 09:00:00", "2024-01-02 09:00:00", "2024-01-02 09:00:00"):
+            await connection.execute(text("INSERT INTO simulations (user_id, created_at, simulation_mode) "
+                                          "VALUES (:user_id, :created_at, 'ticker')"),
+                                     {"user_id": user_id, "created_at": created_at})
+    await main.run_migrations()
+
+    seen, cursor = [], None
+    for _ in range(5):
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/api/simulations/", params=params, headers=headers)).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert cursor is None
+    assert len(seen) == 3 and len(set(seen)) == 3
+    assert seen == sorted(seen, reverse=True)
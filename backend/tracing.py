@@ -0,0 +1,146 @@
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+TRACE = 5
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+logging.addLevelName(TRACE, "TRACE")
+
+_LEVEL_NAMES = {"TRACE": TRACE, "DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+def _parse_module_settings(raw: str) -> Dict[str, str]:
+    """Parses "backtester=DEBUG,strategy_optimiser=INFO" style settings."""
+    settings = {}
+    for part in raw.split(","):
+        if "=" in part:
+            module, value = part.split("=", 1)
+            settings[module.strip()] = value.strip()
+    return settings
+
+def _parse_level(level) -> int:
+    if isinstance(level, int):
+        return level
+    return _LEVEL_NAMES[level.upper()]
+
+# Per-module levels, e.g. VANTAGE_TRACE_LEVELS="backtester=DEBUG,strategy_optimiser=TRACE"
+DEFAULT_TRACE_LEVEL = _parse_level(os.environ.get("VANTAGE_TRACE_LEVEL", "WARNING"))
+_configured_levels = _parse_module_settings(os.environ.get("VANTAGE_TRACE_LEVELS", ""))
+# Keep only every Nth below-INFO event per module, e.g. VANTAGE_TRACE_SAMPLE="backtester=100"
+_configured_sampling = _parse_module_settings(os.environ.get("VANTAGE_TRACE_SAMPLE", ""))
+
+def _json_safe(value):
+    # NaN/inf (e.g. indicators on warm-up bars) are not valid JSON
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    return value
+
+class TraceBuffer:
+    """Collects the trace events of one run so they can be attached to its result."""
+    def __init__(self, level: int = DEBUG, max_events: int = 10000):
+        self.level = level
+        self.max_events = max_events
+        self.dropped = 0
+        self._events = []
+
+    def append(self, event: tuple) -> None:
+        if len(self._events) < self.max_events:
+            self._events.append(event)
+        else:
+            self.dropped += 1
+
+    def to_list(self) -> List[dict]:
+        """Formats the buffered events; messages are only rendered here, not when recorded."""
+        events = []
+        for timestamp, module, level, message, args, fields in self._events:
+            event = {
+                "time": timestamp,
+                "module": module,
+                "level": logging.getLevelName(level),
+                "message": message % args if args else message,
+            }
+            for key, value in fields.items():
+                event[key] = _json_safe(value)
+            events.append(event)
+        return events
+
+_current_buffer: ContextVar[Optional[TraceBuffer]] = ContextVar("trace_buffer", default=None)
+
+@contextmanager
+def trace_run(level=DEBUG, max_events: int = 10000):
+    """Buffers every trace event at or above `level` emitted inside the block, whatever the module levels are."""
+    buffer = TraceBuffer(_parse_level(level), max_events)
+    token = _current_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _current_buffer.reset(token)
+
+class Tracer:
+    """
+    Levelled, sampled trace events for one engine module.
+    Hot loops should check is_enabled() once and skip all trace work when it is False;
+    messages use %-style arguments so nothing is formatted unless an event is actually kept.
+    """
+    def __init__(self, module: str):
+        self.module = module
+        self.level = _parse_level(_configured_levels.get(module, DEFAULT_TRACE_LEVEL))
+        self.sample_every = max(int(_configured_sampling.get(module, 1)), 1)
+        self._sample_counter = 0
+        self._logger = logging.getLogger(f"vantage.{module}")
+
+    def is_enabled(self, level: int) -> bool:
+        if level >= self.level:
+            return True
+        buffer = _current_buffer.get()
+        return buffer is not None and level >= buffer.level
+
+    def log(self, level: int, message: str, *args, **fields) -> None:
+        buffer = _current_buffer.get()
+        to_logger = level >= self.level
+        to_buffer = buffer is not None and level >= buffer.level
+        if not (to_logger or to_buffer):
+            return
+        if level < INFO and self.sample_every > 1:
+            self._sample_counter += 1
+            if self._sample_counter % self.sample_every:
+                return
+        if to_logger:
+            self._logger.log(level, message, *args)
+        if to_buffer:
+            buffer.append((time.time(), self.module, level, message, args, fields))
+
+    def trace(self, message: str, *args, **fields) -> None:
+        self.log(TRACE, message, *args, **fields)
+
+    def debug(self, message: str, *args, **fields) -> None:
+        self.log(DEBUG, message, *args, **fields)
+
+    def info(self, message: str, *args, **fields) -> None:
+        self.log(INFO, message, *args, **fields)
+
+    def warning(self, message: str, *args, **fields) -> None:
+        self.log(WARNING, message, *args, **fields)
+
+    def error(self, message: str, *args, **fields) -> None:
+        self.log(ERROR, message, *args, **fields)
+
+_tracers: Dict[str, Tracer] = {}
+
+def get_tracer(module: str) -> Tracer:
+    tracer = _tracers.get(module)
+    if tracer is None:
+        tracer = _tracers[module] = Tracer(module)
+    return tracer
+
+def set_trace_level(module: str, level) -> None:
+    """Changes a module's level at runtime, e.g. set_trace_level("backtester", "DEBUG")."""
+    get_tracer(module).level = _parse_level(level)
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from metrics import record_cache_lookup
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    A small thread-safe in-process cache whose entries expire after a time-to-live.
+    The oldest entries are evicted first once max_size is reached.
+    Lookups are counted in the cache hit/miss metrics when a name is given.
+    """
+    def __init__(self, ttl_seconds: float, max_size: int = 10000, name: Optional[str] = None):
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive.")
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.name = name
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = _MISSING
+        if self.name is not None:
+            record_cache_lookup(self.name, entry is not _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
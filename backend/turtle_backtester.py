@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+import multiprocessing
+import os
+import threading
+import time
+
+from engine_core import EXIT_REASONS, column, donchian_channel, turtle_trades, wilder_atr
+from memory_planner import plan_trade_resampling
+from metrics import record_trials, stage_timer
+from random_streams import BlockStreams, RandomStreams, SeedLike, fixed_blocks
+from tracing import DEBUG, get_tracer
+
+_trace = get_tracer("turtle_backtester")
+
+TRADING_DAYS_PER_YEAR = 252
+# Entry and exit breakout windows of the two Turtle systems
+SYSTEMS = {1: (20, 10), 2: (55, 20)}
+FAILSAFE_WINDOW = 55 # System 1 always takes a breakout of this window, even after a winner
+# Shorter histories are not swept: annualising a few weeks' return inflates CAGR, and the MAR ratio with it
+SWEEP_MIN_BARS = int(os.environ.get("TURTLE_SWEEP_MIN_BARS", TRADING_DAYS_PER_YEAR))
+# Worker processes shared by every sweep, so concurrent sweeps queue for them rather than each
+# taking its own; processes rather than threads, as the plain Python kernels hold the GIL
+SWEEP_WORKERS = int(os.environ.get("TURTLE_SWEEP_WORKERS", min(8, os.cpu_count() or 1)))
+_sweep_executor: Optional[ProcessPoolExecutor] = None
+_sweep_executor_lock = threading.Lock()
+
+def _ohlc_arrays(historical_data: pd.DataFrame):
+    """Open, high, low and close arrays; a close-only history stands in for the missing columns."""
+    if 'Close' not in historical_data.columns:
+        raise ValueError("Historical data must contain a 'Close' column.")
+    close = column(historical_data, 'Close')
+    return tuple(column(historical_data, name) if name in historical_data.columns else close
+                 for name in ('Open', 'High', 'Low')) + (close,)
+
+def _max_drawdown(equity: np.ndarray) -> float:
+    peaks = np.maximum.accumulate(equity)
+    return float(((peaks - equity) / peaks).max()) if len(equity) else 0.0
+
+class TurtleBacktester:
+    """
+    The Turtle trading rules on one ticker's daily bars. System 1 enters on a 20-day breakout
+    (skipping one that follows a winning breakout, unless it is also a 55-day breakout) and exits
+    on a 10-day breakout the other way; System 2 enters on 55-day and exits on 20-day breakouts.
+    Positions are sized in units that lose risk_per_unit_pct of equity at a 2N stop (N is the
+    20-day Wilder ATR), pyramided every N/2 up to four units, with the stop trailing the last unit.
+    The realised trade sequence is then resampled to show the spread of outcomes its order hides.
+    """
+    def __init__(self,
+                 historical_data: pd.DataFrame, # Daily bars with Close, and Open/High/Low where available
+                 system: int = 1, # 1 or 2
+                 entry_window: Optional[int] = None, # Overrides the system's breakout windows
+                 exit_window: Optional[int] = None,
+                 atr_window: int = 20,
+                 initial_capital: float = 100000,
+                 risk_per_unit_pct: float = 0.02, # Equity lost when a unit's stop is hit, as in the Turtle Calculator
+                 stop_n: float = 2.0, # Stop distance in N
+                 add_interval_n: float = 0.5, # Pyramid spacing in N
+                 max_units: int = 4,
+                 allow_short: bool = True,
+                 num_trials: int = 10000, # Monte Carlo resamples of the trade sequence
+                 memory_budget_bytes: Optional[int] = None, # Defaults to ENGINE_MEMORY_BUDGET_BYTES
+                 seed: SeedLike = None, # Int or np.random.Generator for the resampling; a fresh seed is drawn when None
+                 ):
+        if system not in SYSTEMS:
+            raise ValueError(f"Unsupported Turtle system: {system}. Available systems are: {', '.join(map(str, SYSTEMS))}")
+        default_entry, default_exit = SYSTEMS[system]
+        self.system = system
+        self.entry_window = int(entry_window or default_entry)
+        self.exit_window = int(exit_window or default_exit)
+        if min(self.entry_window, self.exit_window, atr_window) < 2:
+            raise ValueError("Breakout and ATR windows must be at least 2 bars.")
+        if max_units < 1 or stop_n <= 0 or add_interval_n <= 0:
+            raise ValueError("max_units, stop_n and add_interval_n must be positive.")
+        self.atr_window = atr_window
+        self.initial_capital = float(initial_capital)
+        self.risk_per_unit_pct = risk_per_unit_pct
+        self.stop_n = stop_n
+        self.add_interval_n = add_interval_n
+        self.max_units = max_units
+        self.allow_short = allow_short
+        self.num_trials = num_trials
+        self.memory_budget_bytes = memory_budget_bytes
+        self.memory_plan = None # Set once the number of trades to resample is known
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+
+        self.dates = historical_data.index
+        self.open, self.high, self.low, self.close = _ohlc_arrays(historical_data)
+        if len(self.close) <= max(self.entry_window, self.atr_window):
+            raise ValueError(f"At least {max(self.entry_window, self.atr_window) + 1} bars are required for a "
+                             f"{self.entry_window}-day breakout with a {self.atr_window}-day N; got {len(self.close)}.")
+
+        with stage_timer("indicator_build"):
+            self.atr = wilder_atr(self.high, self.low, self.close, atr_window)
+            self.entry_channel = donchian_channel(self.high, self.low, self.entry_window)
+            self.exit_channel = donchian_channel(self.high, self.low, self.exit_window)
+            # The System 1 filter only applies with System 1's default entry window below the failsafe's
+            self.failsafe_channel = (donchian_channel(self.high, self.low, FAILSAFE_WINDOW)
+                                     if system == 1 and self.entry_window < FAILSAFE_WINDOW else None)
+        _trace.debug("system %d: %d/%d-day breakouts over %d bars", system, self.entry_window, self.exit_window,
+                     len(self.close), bars=len(self.close), filter=self.failsafe_channel is not None)
+
+    @stage_timer("strategy_evaluation")
+    def run(self):
+        """Runs the rules over the history and returns the engine_core.TurtleRun."""
+        return turtle_trades(self.open, self.high, self.low, self.close, self.atr, self.entry_channel,
+                             self.exit_channel, self.failsafe_channel, self.allow_short, self.initial_capital,
+                             self.risk_per_unit_pct, self.stop_n, self.add_interval_n, self.max_units)
+
+    def performance(self, run) -> dict:
+        """Headline statistics of a run: returns, drawdown, MAR ratio and trade statistics."""
+        pnls = run.pnls
+        winners = pnls[pnls > 0]
+        losers = pnls[pnls <= 0]
+        years = max(len(self.close) / TRADING_DAYS_PER_YEAR, 1 / TRADING_DAYS_PER_YEAR)
+        growth = run.final_equity / self.initial_capital
+        cagr = float(growth ** (1 / years) - 1) if growth > 0 else -1.0
+        max_drawdown = _max_drawdown(run.equity_curve)
+        daily_returns = np.diff(run.equity_curve) / run.equity_curve[:-1]
+        daily_std = float(daily_returns.std()) if len(daily_returns) > 1 else 0.0
+        return {
+            "final_equity": run.final_equity,
+            "total_pnl": run.final_equity - self.initial_capital,
+            "total_return_pct": (growth - 1) * 100,
+            "cagr_pct": cagr * 100,
+            "max_drawdown": max_drawdown,
+            "mar_ratio": cagr / max_drawdown if max_drawdown > 0 else 0.0, # CAGR over max drawdown
+            "sharpe_ratio": float(daily_returns.mean() / daily_std * np.sqrt(TRADING_DAYS_PER_YEAR)) if daily_std > 0 else 0.0,
+            "trades": len(pnls),
+            "win_rate": len(winners) / len(pnls) * 100 if len(pnls) else 0.0,
+            "average_win": float(winners.mean()) if len(winners) else 0.0,
+            "average_loss": float(losers.mean()) if len(losers) else 0.0,
+            "payoff_ratio": float(winners.mean() / -losers.mean()) if len(winners) and len(losers) and losers.mean() < 0 else 0.0,
+        }
+
+    def resample_trades(self, trade_returns: np.ndarray) -> Optional[dict]:
+        """
+        Monte Carlo over the trade sequence: each trial draws the same number of trades with
+        replacement from the realised per-trade returns and compounds them, so the distribution
+        of final equity and drawdown reflects luck in the order and mix of trades.
+        """
+        num_trades = len(trade_returns)
+        if num_trades == 0 or self.num_trials < 1:
+            return None
+        self.memory_plan = plan = plan_trade_resampling(self.num_trials, num_trades, len(self.close), self.memory_budget_bytes)
+        _trace.debug("resampling %d trades: memory plan: %r", num_trades, plan, **plan.as_dict())
+        final_equity = np.empty(self.num_trials)
+        max_drawdowns = np.empty(self.num_trials)
+        # Trials are drawn from fixed blocks of streams, so they do not depend on the chunk size
+        trial_streams = BlockStreams(self.streams.child("resampling"), fixed_blocks(self.num_trials))
+        draw_trades = lambda generator, count: generator.integers(0, num_trades, size=(count, num_trades))
+        resampling_start = time.perf_counter()
+        with stage_timer("path_generation"):
+            for start, stop in plan.chunks():
+                growth = 1 + trade_returns[trial_streams.draw(start, stop, draw_trades)]
+                equity = np.cumprod(growth, axis=1, out=growth)
+                equity *= self.initial_capital
+                peaks = np.maximum(equity, self.initial_capital)
+                np.maximum.accumulate(peaks, axis=1, out=peaks)
+                drawdowns = peaks - equity
+                drawdowns /= peaks
+                final_equity[start:stop] = equity[:, -1]
+                max_drawdowns[start:stop] = drawdowns.max(axis=1)
+                del growth, equity, peaks, drawdowns
+        record_trials("turtle_backtester", self.num_trials, time.perf_counter() - resampling_start)
+
+        equity_percentiles = np.percentile(final_equity, [5, 25, 50, 75, 95])
+        drawdown_percentiles = np.percentile(max_drawdowns, [50, 95])
+        return {
+            "num_trials": self.num_trials,
+            "seed": self.seed,
+            "final_equity_percentiles": dict(zip(("p5", "p25", "p50", "p75", "p95"), equity_percentiles.tolist())),
+            "expected_final_equity": float(final_equity.mean()),
+            "probability_of_loss": float((final_equity < self.initial_capital).mean()),
+            "median_max_drawdown": float(drawdown_percentiles[0]),
+            "max_drawdown_95": float(drawdown_percentiles[1]), # Drawdown not exceeded on 95% of trials
+        }
+
+    def simulate(self) -> dict:
+        run = self.run()
+        trade_returns = run.trade_returns
+        trade_log = [
+            {
+                "entry_date": self.dates[entry_bar],
+                "exit_date": self.dates[exit_bar],
+                "direction": "long" if direction == 1 else "short",
+                "units": units,
+                "entry_price": entry_price,
+                "exit_price": exit_price,
+                "pnl": pnl,
+                "return_pct": trade_return * 100,
+                "exit_reason": EXIT_REASONS[reason],
+            }
+            for entry_bar, exit_bar, direction, units, entry_price, exit_price, pnl, trade_return, reason in zip(
+                run.entry_bars.tolist(), run.exit_bars.tolist(), run.directions.tolist(), run.units.tolist(),
+                run.entry_prices.tolist(), run.exit_prices.tolist(), run.pnls.tolist(), trade_returns.tolist(),
+                run.exit_reasons.tolist())
+        ]
+        performance = self.performance(run)
+        if _trace.is_enabled(DEBUG):
+            _trace.debug("turtle run: %d trades, final equity %.2f", len(trade_log), run.final_equity,
+                         exit_reasons={name: int((run.exit_reasons == i).sum()) for i, name in enumerate(EXIT_REASONS)})
+        return {
+            "system": self.system,
+            "entry_window": self.entry_window,
+            "exit_window": self.exit_window,
+            "initial_capital": self.initial_capital,
+            "performance": performance,
+            "monte_carlo": self.resample_trades(trade_returns),
+            "trade_log": trade_log,
+        }
+
+def _sweep_pool() -> ProcessPoolExecutor:
+    """The shared sweep pool, started on first use. Workers are spawned, not forked from the threaded server."""
+    global _sweep_executor
+    with _sweep_executor_lock:
+        if _sweep_executor is None:
+            _sweep_executor = ProcessPoolExecutor(max_workers=SWEEP_WORKERS,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+        return _sweep_executor
+
+def _sweep_ticker(ticker: str, historical_data: pd.DataFrame, windows: List[tuple], params: dict) -> List[dict]:
+    rows = []
+    for entry_window, exit_window in windows:
+        row = {"ticker": ticker, "entry_window": entry_window, "exit_window": exit_window}
+        if len(historical_data) < SWEEP_MIN_BARS:
+            row["error"] = f"At least {SWEEP_MIN_BARS} bars are required for a window sweep; got {len(historical_data)}."
+            rows.append(row)
+            continue
+        try:
+            backtester = TurtleBacktester(historical_data, entry_window=entry_window, exit_window=exit_window, **params)
+            row.update(backtester.performance(backtester.run()))
+        except ValueError as e:
+            row["error"] = str(e)
+        rows.append(row)
+    return rows
+
+def sweep_windows(histories: Dict[str, pd.DataFrame], entry_windows: Iterable[int], exit_windows: Iterable[int],
+                  **params) -> List[dict]:
+    """
+    Runs every (entry window, exit window) pair with exit < entry on every ticker, tickers in
+    parallel on the shared worker processes, and returns the performance of each combination,
+    ticker by ticker, each ticker's pairs ranked by MAR ratio. params are passed to
+    TurtleBacktester; trade resampling is skipped. A ticker whose history is shorter than
+    SWEEP_MIN_BARS, or too short for a combination, gets error entries instead.
+    """
+    windows = [(entry, exit_) for entry in sorted(set(entry_windows)) for exit_ in sorted(set(exit_windows)) if exit_ < entry]
+    if not windows:
+        raise ValueError("No valid breakout windows: every exit window must be shorter than an entry window.")
+    params = {**params, "num_trials": 0}
+
+    sweep_start = time.perf_counter()
+    if len(histories) == 1 or SWEEP_WORKERS <= 1:
+        # Nothing to spread out: the ticker runs here rather than paying to ship it to a worker
+        results = [row for ticker, data in histories.items() for row in _sweep_ticker(ticker, data, windows, params)]
+    else:
+        executor = _sweep_pool()
+        futures = [executor.submit(_sweep_ticker, ticker, data, windows, params) for ticker, data in histories.items()]
+        results = [row for future in futures for row in future.result()]
+    record_trials("turtle_sweep", len(results), time.perf_counter() - sweep_start)
+    _trace.debug("swept %d window pairs over %d tickers", len(windows), len(histories), combinations=len(results))
+    # MAR ratios of different histories are not comparable; summarise_sweep compares pairs across tickers
+    ticker_order = {ticker: i for i, ticker in enumerate(histories)}
+    return sorted(results, key=lambda row: (ticker_order[row["ticker"]], -row.get("mar_ratio", -np.inf)))
+
+def summarise_sweep(rows: List[dict]) -> List[dict]:
+    """Per window pair across the tickers it ran on: median MAR ratio and drawdown, mean return; best first."""
+    by_window: Dict[tuple, List[dict]] = {}
+    for row in rows:
+        if "error" not in row:
+            by_window.setdefault((row["entry_window"], row["exit_window"]), []).append(row)
+    summary = [
+        {
+            "entry_window": entry_window,
+            "exit_window": exit_window,
+            "tickers": len(window_rows),
+            "median_mar_ratio": float(np.median([row["mar_ratio"] for row in window_rows])),
+            "mean_total_return_pct": float(np.mean([row["total_return_pct"] for row in window_rows])),
+            "median_max_drawdown": float(np.median([row["max_drawdown"] for row in window_rows])),
+        }
+        for (entry_window, exit_window), window_rows in by_window.items()
+    ]
+    return sorted(summary, key=lambda window: window["median_mar_ratio"], reverse=True)
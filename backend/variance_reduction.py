@@ -0,0 +1,223 @@
+"""
+Variance reduction for the Monte Carlo engines, and the standard errors that show what it bought.
+
+A TrialSampler draws a run's uniforms or standard normals in REPLICATES equal blocks of rows
+(the last block takes the remainder), from child streams of the run's seed. Every block is an
+independent replicate, so the spread of an estimate across the blocks gives its standard error
+whatever the mode:
+
+- "none": plain pseudo-random draws.
+- "antithetic": rows come in pairs, the second mirroring the first (u and 1 - u, z and -z).
+  Pairs never straddle a block.
+- "control_variate": plain draws; the engine corrects its estimates with a control whose
+  analytic mean is known (the mean return the draws were taken from).
+- "sobol": scrambled Sobol points, one independently scrambled sequence per block, so each
+  block is a randomised quasi-Monte Carlo replicate.
+
+The same estimates taken over shuffled blocks, which break up pairs and Sobol sequences and skip
+the control-variate correction, give the plain Monte Carlo standard error at the same trial count.
+The squared ratio of the two is how many plain trials each trial is worth.
+"""
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.special import ndtri
+from scipy.stats import qmc
+
+from random_streams import BlockStreams, RandomStreams, SeedLike, fixed_blocks
+
+VARIANCE_REDUCTION_MODES = ("none", "antithetic", "control_variate", "sobol")
+REPLICATES = 32 # Blocks per run; more gives steadier standard errors, fewer keeps each Sobol block balanced
+
+def check_mode(mode: str) -> str:
+    if mode not in VARIANCE_REDUCTION_MODES:
+        raise ValueError(f"Unsupported variance reduction mode: {mode}. "
+                         f"Available modes are: {', '.join(VARIANCE_REDUCTION_MODES)}")
+    return mode
+
+def replicate_blocks(num_rows: int, replicates: int = REPLICATES) -> List[Tuple[int, int]]:
+    """(start, stop) row ranges of the replicate blocks: equal even-sized blocks, the last one taking the remainder."""
+    size = num_rows // replicates
+    size -= size % 2
+    if size == 0:
+        return [(0, num_rows)]
+    bounds = [i * size for i in range(replicates)] + [num_rows]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+class TrialSampler:
+    """
+    Draws a run's (num_rows x dim) uniforms or standard normals in order, a chunk of rows at a time.
+    Pseudo-random rows come from fixed blocks of child streams of seed and each Sobol sequence is
+    scrambled by its own child stream, so the rows do not depend on the chunking.
+    """
+
+    def __init__(self, mode: str, num_rows: int, dim: int, seed: SeedLike = None):
+        self.mode = check_mode(mode)
+        self.num_rows = num_rows
+        self.dim = dim
+        self.blocks = replicate_blocks(num_rows)
+        streams = RandomStreams(seed)
+        # Stream blocks have an even number of rows, so antithetic pairs never straddle two of them
+        self._streams = BlockStreams(streams, fixed_blocks(num_rows))
+        self._engines = None
+        if mode == "sobol":
+            self._engines = [qmc.Sobol(d=dim, scramble=True, seed=streams.generator("sobol", i)) for i in range(len(self.blocks))]
+            self._sobol_surplus = [None] * len(self.blocks)
+        self._pair = None # First row of a pair whose mirror starts the next chunk
+
+    def uniforms(self, start: int, stop: int) -> np.ndarray:
+        """Rows start..stop of the run's uniforms on [0, 1)."""
+        if self.mode == "sobol":
+            return self._sobol(start, stop)
+        draw = lambda generator, count: generator.random((count, self.dim))
+        if self.mode == "antithetic":
+            return self._antithetic(start, stop, draw, lambda u: 1.0 - u)
+        return self._streams.draw(start, stop, draw)
+
+    def normals(self, start: int, stop: int) -> np.ndarray:
+        """Rows start..stop of the run's standard normals."""
+        if self.mode == "sobol":
+            uniforms = self._sobol(start, stop)
+            # A scrambled point can land on exactly 0
+            np.clip(uniforms, np.finfo(float).tiny, None, out=uniforms)
+            return ndtri(uniforms)
+        draw = lambda generator, count: generator.standard_normal((count, self.dim))
+        if self.mode == "antithetic":
+            return self._antithetic(start, stop, draw, np.negative)
+        return self._streams.draw(start, stop, draw)
+
+    def _sobol(self, start: int, stop: int) -> np.ndarray:
+        # Each block's rows continue its own scrambled sequence; a later pass over the rows gets fresh points
+        parts = [self._sobol_points(block, min(stop, block_stop) - max(start, block_start))
+                 for block, (block_start, block_stop) in enumerate(self.blocks)
+                 if block_start < stop and block_stop > start]
+        return np.concatenate(parts) if parts else np.empty((0, self.dim))
+
+    def _sobol_points(self, block: int, count: int) -> np.ndarray:
+        """The next count points of a block's sequence."""
+        engine = self._engines[block]
+        if engine.num_generated == 0:
+            # scipy warns when a sequence starts on anything but a power of two points; start on the next
+            # one up and keep the surplus for the following calls, which may then take any count
+            self._sobol_surplus[block] = engine.random_base2(math.ceil(math.log2(count)))
+        surplus = self._sobol_surplus[block]
+        if surplus is None:
+            return engine.random(count)
+        points, surplus = surplus[:count], surplus[count:]
+        self._sobol_surplus[block] = surplus if len(surplus) else None
+        if len(points) < count:
+            points = np.concatenate((points, engine.random(count - len(points))))
+        return points
+
+    def _antithetic(self, start: int, stop: int, draw, mirror) -> np.ndarray:
+        # Rows 2k and 2k + 1 of the run are a pair, whose first row is drawn from its stream block
+        rows = np.empty((stop - start, self.dim))
+        for generator, segment_start, segment_stop in self._streams.segments(start, stop):
+            first = segment_start
+            if first % 2:
+                rows[first - start] = mirror(self._pair)
+                first += 1
+            count = segment_stop - first
+            base = draw(generator, (count + 1) // 2)
+            rows[first - start:segment_stop - start:2] = base
+            rows[first - start + 1:segment_stop - start:2] = mirror(base[:count // 2])
+            self._pair = base[-1] if count % 2 else None
+        return rows
+
+@lru_cache(maxsize=16)
+def _shuffled_rows(num_rows: int) -> np.ndarray:
+    # A fixed shuffle: it only decides which rows the plain-Monte-Carlo baseline groups together
+    return np.random.default_rng(num_rows).permutation(num_rows)
+
+def _block_rows(values: np.ndarray, shuffled: bool) -> np.ndarray:
+    """values (rows, ...) regrouped as (blocks, block_size, ...), dropping the last block's remainder."""
+    size = replicate_blocks(len(values))[0][1]
+    replicates = len(values) // size
+    if shuffled:
+        values = values[_shuffled_rows(len(values))]
+    return values[:replicates * size].reshape(replicates, size, *values.shape[1:])
+
+def control_variate_betas(columns: np.ndarray, control: np.ndarray) -> np.ndarray:
+    """Regression coefficient of each (rows x k) column on the control."""
+    centred = control - control.mean()
+    variance = centred @ centred
+    if variance == 0:
+        return np.zeros(columns.shape[1])
+    return (centred @ columns) / variance
+
+def mean_estimates(columns: np.ndarray, control: Optional[np.ndarray] = None, control_mean: float = 0.0):
+    """
+    Means of (rows x k) columns, corrected by the control when one is given. Returns the estimate,
+    the (blocks x k) estimates from the replicate blocks and those from shuffled blocks, uncorrected.
+    """
+    estimate = columns.mean(axis=0)
+    blocks = _block_rows(columns, False).mean(axis=1)
+    if control is not None:
+        betas = control_variate_betas(columns, control)
+        estimate = estimate - betas * (control.mean() - control_mean)
+        blocks -= betas * (_block_rows(control, False).mean(axis=1)[:, None] - control_mean)
+    return estimate, blocks, _block_rows(columns, True).mean(axis=1)
+
+def _row_percentiles(rows: np.ndarray, percentiles: np.ndarray) -> np.ndarray:
+    """np.percentile's linear interpolation along each row of rows, at a row of percentiles per row."""
+    rows = np.sort(rows, axis=1)
+    position = np.clip(percentiles, 0.0, 100.0) * ((rows.shape[1] - 1) / 100.0)
+    lower = position.astype(np.int64)
+    upper = np.minimum(lower + 1, rows.shape[1] - 1)
+    row_index = np.arange(len(rows))[:, None]
+    lower_values = rows[row_index, lower]
+    return lower_values + (rows[row_index, upper] - lower_values) * (position - lower)
+
+def percentile_estimates(values: np.ndarray, percentiles, control: Optional[np.ndarray] = None, control_mean: float = 0.0,
+                         with_blocks: bool = True):
+    """
+    Percentiles of values, with the same block estimates as mean_estimates (None without
+    with_blocks). The control-variate correction estimates the CDF at each percentile as the share
+    of values below it regressed on the control, then reads the percentile at the level that
+    correction shifts it to.
+    """
+    percentiles = np.asarray(percentiles, dtype=float)
+    estimate = np.percentile(values, percentiles)
+    if control is not None:
+        betas = control_variate_betas(values[:, None] <= estimate, control)
+        estimate = np.percentile(values, np.clip(percentiles + 100.0 * betas * (control.mean() - control_mean), 0.0, 100.0))
+    if not with_blocks:
+        return estimate, None, None
+    blocks = _block_rows(values, False)
+    plain_levels = np.broadcast_to(percentiles, (len(blocks), len(percentiles)))
+    levels = plain_levels
+    if control is not None:
+        levels = percentiles + 100.0 * betas * (_block_rows(control, False).mean(axis=1)[:, None] - control_mean)
+    return estimate, _row_percentiles(blocks, levels), _row_percentiles(_block_rows(values, True), plain_levels)
+
+def standard_error(block_estimates: np.ndarray) -> np.ndarray:
+    """Standard error of an estimate from its values on the (blocks x k) replicate blocks; NaN with one block."""
+    block_estimates = np.asarray(block_estimates, dtype=float)
+    if len(block_estimates) < 2:
+        return np.full(block_estimates.shape[1:], np.nan)
+    return block_estimates.std(axis=0, ddof=1) / math.sqrt(len(block_estimates))
+
+def precision_report(mode: str, trials: int, standard_errors: Dict[str, float], plain_standard_errors: Dict[str, float]) -> dict:
+    """
+    Run metadata: each metric's standard error, the plain Monte Carlo standard error at the same
+    trial count, and the plain trials the run was worth for its least-improved metric.
+    """
+    effective = []
+    for name, error in standard_errors.items():
+        plain = plain_standard_errors[name]
+        if error > 0 and math.isfinite(error) and math.isfinite(plain):
+            effective.append(trials * (plain / error) ** 2)
+    return {
+        "variance_reduction": mode,
+        "trials": trials,
+        "replicates": len(replicate_blocks(trials)),
+        "standard_errors": {name: _finite_or_none(error) for name, error in standard_errors.items()},
+        "plain_standard_errors": {name: _finite_or_none(error) for name, error in plain_standard_errors.items()},
+        "effective_trials": int(min(effective)) if effective else None,
+    }
+
+def _finite_or_none(value: float) -> Optional[float]:
+    value = float(value)
+    return value if math.isfinite(value) else None
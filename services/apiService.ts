@@ -196,9 +196,14 @@ export const runSimpleTickerSimulation = async (ticker: string, years: number, d
 };
 
 
-export const getSimulations = async (): Promise<any[]> => {
+export const getSimulations = async (cursor?: string, limit: number = 20): Promise<{ items: any[]; next_cursor: string | null }> => {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+
     try {
-        const response = await fetch(`${getApiBaseUrl()}/api/simulations/`, {
+        const response = await fetch(`${getApiBaseUrl()}/api/simulations/?${params.toString()}`, {
             method: 'GET',
             headers: getAuthHeaders(),
         });
@@ -216,6 +221,26 @@ export const getSimulations = async (): Promise<any[]> => {
     }
 };
 
+export const getSimulation = async (simulationId: number): Promise<any> => {
+    try {
+        const response = await fetch(`${getApiBaseUrl()}/api/simulations/${simulationId}`, {
+            method: 'GET',
+            headers: getAuthHeaders(),
+        });
+
+        if (!response.ok) {
+            const errorBody = await response.text();
+            throw new Error(`Failed to fetch simulation: ${response.status} ${errorBody}`);
+        }
+
+        return await response.json();
+
+    } catch (error) {
+        console.error("Error fetching simulation:", error);
+        throw new Error("Failed to fetch simulation.");
+    }
+};
+
 export const runChatCompletion = async (prompt: string): Promise<any> => {
     const payload = {
         prompt